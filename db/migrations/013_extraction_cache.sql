@@ -0,0 +1,23 @@
+-- Migration: Create Extraction Cache Table
+-- Purpose: Shared content-addressed cache of extracted text used by the worker
+-- File: db/migrations/013_extraction_cache.sql
+--
+-- Keys are "<sha256 of file>-<extractor route>-v<extractor version>", so the
+-- same file uploaded under several projects is only parsed once.
+-- Enable in the worker with EXTRACTION_CACHE_TABLE=extraction_cache.
+
+-- Step 1: Create the extraction_cache table
+CREATE TABLE IF NOT EXISTS public.extraction_cache (
+  cache_key TEXT PRIMARY KEY,
+  extracted_text TEXT NOT NULL,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Step 2: Index for age-based cleanup
+CREATE INDEX IF NOT EXISTS idx_extraction_cache_created_at ON public.extraction_cache(created_at);
+
+-- Step 3: Enable Row Level Security with no policies
+-- Only the worker (service role, which bypasses RLS) reads or writes this table.
+ALTER TABLE public.extraction_cache ENABLE ROW LEVEL SECURITY;
+
+COMMENT ON TABLE public.extraction_cache IS 'Worker cache of extracted document text keyed on file hash, route and extractor version';
@@ -0,0 +1,25 @@
+-- Migration: Create Embedding Cache Table
+-- Purpose: Shared chunk-hash -> embedding cache used by the worker
+-- File: db/migrations/014_embedding_cache.sql
+--
+-- Keys are sha256(model || input_type || chunk text), so boilerplate chunks
+-- (title pages, disclaimers, repeated headers) are embedded once across all
+-- documents. Enable in the worker with EMBEDDING_CACHE_TABLE=embedding_cache.
+
+-- Step 1: Create the embedding_cache table
+CREATE TABLE IF NOT EXISTS public.embedding_cache (
+  cache_key TEXT PRIMARY KEY,
+  model TEXT NOT NULL,
+  input_type TEXT NOT NULL,
+  embedding REAL[] NOT NULL,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Step 2: Index for age-based cleanup
+CREATE INDEX IF NOT EXISTS idx_embedding_cache_created_at ON public.embedding_cache(created_at);
+
+-- Step 3: Enable Row Level Security with no policies
+-- Only the worker (service role, which bypasses RLS) reads or writes this table.
+ALTER TABLE public.embedding_cache ENABLE ROW LEVEL SECURITY;
+
+COMMENT ON TABLE public.embedding_cache IS 'Worker cache of chunk embeddings keyed on model, input type and chunk text hash';
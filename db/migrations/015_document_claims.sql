@@ -0,0 +1,124 @@
+-- Migration: Document Claiming for Pull-Mode Workers
+-- Purpose: Let worker nodes atomically claim pending documents with expiring leases
+-- File: db/migrations/015_document_claims.sql
+--
+-- Workers started with `python consumer.py` call claim_documents() to take a
+-- batch of pending documents. FOR UPDATE SKIP LOCKED means concurrent nodes
+-- never claim the same row, and a claim is a lease: if a node dies, its
+-- documents become claimable again once lease_expires_at passes.
+--
+-- Documents meant for pull-mode workers are inserted with processing_status
+-- 'QUEUED'. 'UPLOADED' documents are left to the push path (the app calling
+-- /extract or /process), so the two never process the same document.
+
+-- Step 1: Lease columns on documents
+ALTER TABLE public.documents
+  ADD COLUMN IF NOT EXISTS claimed_by TEXT,
+  ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMPTZ,
+  ADD COLUMN IF NOT EXISTS claim_attempts INTEGER NOT NULL DEFAULT 0,
+  ADD COLUMN IF NOT EXISTS error_message TEXT;
+
+-- Step 2: Partial index so polling only touches claimable rows
+CREATE INDEX IF NOT EXISTS idx_documents_claimable
+  ON public.documents(created_at)
+  WHERE processing_status IN ('QUEUED', 'UPLOADED', 'PENDING', 'EXTRACTING', 'EMBEDDING');
+
+-- Step 3: Claim a batch of pending (or lease-expired) documents
+CREATE OR REPLACE FUNCTION public.claim_documents(
+  p_worker_id text,
+  p_batch_size int DEFAULT 4,
+  p_lease_seconds int DEFAULT 300,
+  p_statuses text[] DEFAULT ARRAY['QUEUED'],
+  p_max_attempts int DEFAULT 3
+)
+RETURNS TABLE (
+  id uuid,
+  storage_url text,
+  mime_type text,
+  title text,
+  file_size_bytes bigint,
+  claim_attempts int
+)
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+BEGIN
+  -- Documents whose lease keeps expiring (they crash or hang every node) stop being retried
+  UPDATE public.documents d
+  SET processing_status = CASE WHEN d.processing_status = 'EMBEDDING' THEN 'EMBEDDING_FAILED' ELSE 'EXTRACTION_FAILED' END,
+      error_message = 'Processing lease expired ' || d.claim_attempts || ' times',
+      claimed_by = NULL,
+      lease_expires_at = NULL
+  WHERE d.lease_expires_at < now()
+    AND d.claim_attempts >= p_max_attempts
+    AND d.processing_status IN ('QUEUED', 'UPLOADED', 'PENDING', 'EXTRACTING', 'EMBEDDING');
+
+  RETURN QUERY
+  WITH candidates AS (
+    SELECT d.id
+    FROM public.documents d
+    WHERE (
+        -- Never claimed and still waiting
+        (d.processing_status::text = ANY(p_statuses) AND d.lease_expires_at IS NULL)
+        -- Claimed by a node that stopped renewing its lease
+        OR d.lease_expires_at < now()
+      )
+      AND d.processing_status IN ('QUEUED', 'UPLOADED', 'PENDING', 'EXTRACTING', 'EMBEDDING')
+    ORDER BY d.created_at
+    LIMIT p_batch_size
+    FOR UPDATE SKIP LOCKED
+  )
+  UPDATE public.documents d
+  SET claimed_by = p_worker_id,
+      lease_expires_at = now() + make_interval(secs => p_lease_seconds),
+      claim_attempts = d.claim_attempts + 1
+  FROM candidates c
+  WHERE d.id = c.id
+  RETURNING d.id, d.storage_url, d.mime_type, d.title, d.file_size_bytes, d.claim_attempts;
+END;
+$$;
+
+-- Step 4: Extend leases for documents a worker is still processing
+CREATE OR REPLACE FUNCTION public.renew_document_leases(
+  p_worker_id text,
+  p_document_ids uuid[],
+  p_lease_seconds int DEFAULT 300
+)
+RETURNS SETOF uuid
+LANGUAGE sql
+SECURITY DEFINER
+AS $$
+  UPDATE public.documents
+  SET lease_expires_at = now() + make_interval(secs => p_lease_seconds)
+  WHERE id = ANY(p_document_ids)
+    AND claimed_by = p_worker_id
+  RETURNING id;
+$$;
+
+-- Step 5: Drop the lease once a document reaches a final status, whoever processed it
+CREATE OR REPLACE FUNCTION public.clear_document_lease()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  IF NEW.processing_status NOT IN ('QUEUED', 'UPLOADED', 'PENDING', 'EXTRACTING', 'EMBEDDING') THEN
+    NEW.claimed_by := NULL;
+    NEW.lease_expires_at := NULL;
+  END IF;
+  RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS documents_clear_lease ON public.documents;
+CREATE TRIGGER documents_clear_lease
+  BEFORE UPDATE OF processing_status ON public.documents
+  FOR EACH ROW
+  WHEN (NEW.lease_expires_at IS NOT NULL)
+  EXECUTE FUNCTION public.clear_document_lease();
+
+-- Step 6: Worker-only access; the service role bypasses these grants
+REVOKE EXECUTE ON FUNCTION public.claim_documents(text, int, int, text[], int) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION public.renew_document_leases(text, uuid[], int) FROM PUBLIC, anon, authenticated;
+
+COMMENT ON FUNCTION public.claim_documents(text, int, int, text[], int) IS 'Atomically lease a batch of pending documents to a pull-mode worker (FOR UPDATE SKIP LOCKED)';
+COMMENT ON FUNCTION public.renew_document_leases(text, uuid[], int) IS 'Extend the leases a pull-mode worker holds; returns the ids it still owns';
@@ -0,0 +1,209 @@
+"""Admission control: per-endpoint cost budgets with a short bounded wait queue."""
+import os
+import math
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from metrics import ADMISSION_REJECTIONS, ADMISSION_WAIT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Cost units each endpoint may have in flight per worker process ("endpoint:units,...");
+# async jobs hold their units from submission until they finish
+ADMISSION_LIMITS = os.getenv("ADMISSION_LIMITS", "extract:8,embed:8,process:8,search:32")
+# Requests that don't fit wait up to this long, at most ADMISSION_QUEUE_DEPTH per endpoint
+ADMISSION_QUEUE_DEPTH = int(os.getenv("ADMISSION_QUEUE_DEPTH", "8"))
+ADMISSION_MAX_WAIT_SECONDS = float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "2"))
+# Every this many MB of input adds one cost unit on top of the route's base cost
+ADMISSION_MB_PER_UNIT = float(os.getenv("ADMISSION_MB_PER_UNIT", "25"))
+ADMISSION_MAX_RETRY_AFTER = 120
+
+# Relative cost of a typical file per extractor route; unknown sizes use this alone
+ROUTE_COSTS = {
+    "pdf": 2.0,
+    "docx": 1.0,
+    "pptx": 1.5,
+    "image": 2.0,
+    "text": 0.5,
+    "fallback": 1.0,
+}
+
+
+class Overloaded(Exception):
+    """Raised when a request can't be admitted; carries the suggested Retry-After."""
+
+    def __init__(self, endpoint: str, retry_after: int, reason: str):
+        super().__init__(f"{endpoint} is at capacity ({reason}); retry after {retry_after}s")
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+def _parse_limits(spec: str) -> Dict[str, float]:
+    limits = {}
+    for item in spec.split(","):
+        name, _, units = item.partition(":")
+        if name.strip() and units.strip():
+            limits[name.strip()] = float(units)
+    return limits
+
+
+def estimate_cost(route: Optional[str] = None, size_bytes: Optional[int] = None) -> float:
+    """Cost units for a request: the route's base cost plus one unit per ADMISSION_MB_PER_UNIT of input."""
+    cost = ROUTE_COSTS.get(route, 1.0)
+    if size_bytes and ADMISSION_MB_PER_UNIT > 0:
+        cost += size_bytes / (1024 * 1024) / ADMISSION_MB_PER_UNIT
+    return cost
+
+
+class _Waiter:
+    def __init__(self, cost: float):
+        self.cost = cost
+        self.event = threading.Event()
+
+
+class _EndpointGate:
+    """Cost budget for one endpoint; waiters are admitted strictly in arrival order."""
+
+    def __init__(self, name: str, capacity: float):
+        self.name = name
+        self.capacity = capacity
+        self.in_use = 0.0
+        self.running = 0
+        self.waiters: "deque[_Waiter]" = deque()
+        # EWMA of seconds per cost unit, used to compute Retry-After
+        self.seconds_per_unit = 1.0
+        self.admitted = 0
+        self.rejected = 0
+
+    def fits(self, cost: float) -> bool:
+        # A request costlier than the whole budget still runs, but only on its own
+        return self.in_use + cost <= self.capacity or self.running == 0
+
+    def retry_after(self, cost: float) -> int:
+        """Seconds until enough of the current backlog drains for this request to fit."""
+        backlog = self.in_use + sum(waiter.cost for waiter in self.waiters) + cost - self.capacity
+        seconds = max(backlog, cost) * self.seconds_per_unit / max(self.capacity, 1.0)
+        return max(1, min(ADMISSION_MAX_RETRY_AFTER, math.ceil(seconds)))
+
+
+class AdmissionController:
+    """Per-process admission control for the worker's HTTP endpoints."""
+
+    def __init__(self, limits: Optional[Dict[str, float]] = None):
+        self._lock = threading.Lock()
+        self._gates = {
+            name: _EndpointGate(name, capacity)
+            for name, capacity in (limits if limits is not None else _parse_limits(ADMISSION_LIMITS)).items()
+        }
+
+    def _wake(self, gate: _EndpointGate) -> None:
+        while gate.waiters and gate.fits(gate.waiters[0].cost):
+            waiter = gate.waiters.popleft()
+            gate.in_use += waiter.cost
+            gate.running += 1
+            waiter.event.set()
+
+    @contextmanager
+    def admit(self, endpoint: str, cost: float = 1.0) -> Iterator[None]:
+        """
+        Hold cost units of the endpoint's budget for the duration of the block.
+
+        Raises:
+            Overloaded: If the wait queue is full or the request waited too long
+        """
+        release = self.reserve(endpoint, cost)
+        try:
+            yield
+        finally:
+            release()
+
+    def reserve(self, endpoint: str, cost: float = 1.0) -> Callable[[], None]:
+        """
+        Take cost units of the endpoint's budget, waiting like admit(); call the
+        returned function to give them back. For work that outlives the request,
+        such as async jobs, which hold their units until the job finishes.
+
+        Raises:
+            Overloaded: If the wait queue is full or the request waited too long
+        """
+        gate = self._gates.get(endpoint)
+        if gate is None or gate.capacity <= 0:
+            return lambda: None
+
+        started = time.perf_counter()
+        with self._lock:
+            if not gate.waiters and gate.fits(cost):
+                gate.in_use += cost
+                gate.running += 1
+                waiter = None
+            elif len(gate.waiters) >= ADMISSION_QUEUE_DEPTH:
+                raise self._reject(gate, cost, "queue full")
+            else:
+                waiter = _Waiter(cost)
+                gate.waiters.append(waiter)
+
+        if waiter is not None and not waiter.event.wait(ADMISSION_MAX_WAIT_SECONDS):
+            with self._lock:
+                # Admitted between the timeout and taking the lock; go ahead
+                if not waiter.event.is_set():
+                    gate.waiters.remove(waiter)
+                    self._wake(gate)
+                    raise self._reject(gate, cost, "wait timed out")
+
+        waited = time.perf_counter() - started
+        ADMISSION_WAIT_SECONDS.observe(waited, endpoint=endpoint)
+        run_started = time.perf_counter()
+        released = threading.Event()
+
+        def release() -> None:
+            elapsed = time.perf_counter() - run_started
+            with self._lock:
+                if released.is_set():
+                    return
+                released.set()
+                gate.in_use -= cost
+                gate.running -= 1
+                gate.admitted += 1
+                gate.seconds_per_unit = 0.8 * gate.seconds_per_unit + 0.2 * (elapsed / max(cost, 0.1))
+                self._wake(gate)
+        return release
+
+    def _reject(self, gate: _EndpointGate, cost: float, reason: str) -> Overloaded:
+        gate.rejected += 1
+        ADMISSION_REJECTIONS.inc(endpoint=gate.name, reason=reason)
+        error = Overloaded(gate.name, gate.retry_after(cost), reason)
+        logger.warning(f"Rejected {gate.name} request (cost {cost:.1f}): {str(error)}")
+        return error
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                name: {
+                    "capacity": gate.capacity,
+                    "inUse": round(gate.in_use, 2),
+                    "running": gate.running,
+                    "queued": len(gate.waiters),
+                    "admitted": gate.admitted,
+                    "rejected": gate.rejected,
+                    "secondsPerUnit": round(gate.seconds_per_unit, 3),
+                }
+                for name, gate in self._gates.items()
+            }
+
+
+_controller: Optional[AdmissionController] = None
+_controller_lock = threading.Lock()
+
+
+def get_admission_controller() -> AdmissionController:
+    """Get the process-wide admission controller, creating it on first use."""
+    global _controller
+    with _controller_lock:
+        if _controller is None:
+            _controller = AdmissionController()
+        return _controller
@@ -0,0 +1,291 @@
+"""Deterministic synthetic corpus covering every route in main.route_extraction."""
+import io
+import os
+import json
+import random
+import logging
+import zipfile
+from datetime import datetime
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+# Corpus profiles: (kind, size) pairs. PDF size = pages, DOCX = paragraphs,
+# PPTX = slides, text = KB, image = edge px.
+PROFILES = {
+    "smoke": [
+        ("pdf", 10), ("pdf_indic", 10), ("docx", 200), ("pptx", 10), ("text", 64), ("image", 800),
+    ],
+    "small": [
+        ("pdf", 10), ("pdf", 100), ("pdf_indic", 50), ("docx", 2000), ("pptx", 40),
+        ("text", 1024), ("image", 2000),
+    ],
+    "full": [
+        ("pdf", 10), ("pdf", 100), ("pdf", 300), ("pdf", 1000), ("pdf_indic", 100), ("pdf_indic", 300),
+        ("docx", 2000), ("docx", 10000), ("pptx", 50), ("pptx", 200),
+        ("text", 1024), ("text", 8192), ("image", 1200), ("image", 4000),
+    ],
+}
+
+CHARACTERS = ["RAJ", "MEERA", "ANIL", "PRIYA", "INSPECTOR DAS", "DADI"]
+LOCATIONS = ["CHAWL - NIGHT", "MUMBAI LOCAL - DAY", "POLICE STATION - DAY", "ROOFTOP - DUSK", "TEMPLE - DAWN"]
+WORDS = (
+    "the city never sleeps and neither does she rain hammers tin roofs while the train "
+    "screams past a promise made long ago returns with interest every choice has a price "
+    "he counts the coins twice before pocketing them the lamp flickers and goes out"
+).split()
+HINDI_WORDS = (
+    "शहर कभी नहीं सोता और न ही वह बारिश छत पर गिरती है ट्रेन चीखती हुई गुज़रती है "
+    "पुराना वादा ब्याज के साथ लौटता है हर फ़ैसले की एक कीमत होती है दीया टिमटिमाता है"
+).split()
+TAMIL_WORDS = "நகரம் ஒருபோதும் தூங்குவதில்லை மழை கூரையில் விழுகிறது ரயில் கத்துகிறது வாக்குறுதி திரும்புகிறது".split()
+
+
+def _sentence(rng: random.Random, words: List[str], n: int) -> str:
+    return " ".join(rng.choice(words) for _ in range(n))
+
+
+def _script_lines(rng: random.Random, words: List[str], count: int) -> List[str]:
+    """Screenplay-ish lines: scene headings, action and dialogue."""
+    lines = []
+    while len(lines) < count:
+        roll = rng.random()
+        if roll < 0.1:
+            lines.append(f"INT. {rng.choice(LOCATIONS)}")
+        elif roll < 0.4:
+            lines.append(rng.choice(CHARACTERS))
+            lines.append(_sentence(rng, words, rng.randint(4, 10)))
+        else:
+            lines.append(_sentence(rng, words, rng.randint(6, 12)))
+    return lines[:count]
+
+
+# --- PDF --------------------------------------------------------------------
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _pdf_document(objects: List[bytes]) -> bytes:
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(out.tell())
+        out.write(f"{number} 0 obj\n".encode() + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+    for offset in offsets:
+        out.write(f"{offset:010d} 00000 n \n".encode())
+    out.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+    return out.getvalue()
+
+
+def _stream(data: bytes) -> bytes:
+    return f"<< /Length {len(data)} >>\nstream\n".encode() + data + b"\nendstream"
+
+
+def build_pdf(pages: List[List[str]], indic: bool = False) -> bytes:
+    """
+    Build a text-layer PDF without external dependencies.
+
+    Latin pages use the standard Helvetica font. Indic pages use a Type0 font
+    whose ToUnicode CMap maps 2-byte CIDs straight to Unicode code points, so
+    pdfminer recovers the original text without an embedded font program.
+    """
+    objects: List[bytes] = [b"", b""]  # catalog, page tree
+
+    if indic:
+        codepoints = sorted({ord(ch) for page in pages for line in page for ch in line})
+        cids = {cp: i + 1 for i, cp in enumerate(codepoints)}
+        cmap_lines = [
+            "/CIDInit /ProcSet findresource begin", "12 dict begin", "begincmap",
+            "/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) /Supplement 0 >> def",
+            "/CMapName /Synthetic-UCS def", "/CMapType 2 def",
+            "1 begincodespacerange", "<0000> <FFFF>", "endcodespacerange",
+        ]
+        items = list(cids.items())
+        for i in range(0, len(items), 100):
+            block = items[i:i + 100]
+            cmap_lines.append(f"{len(block)} beginbfchar")
+            cmap_lines.extend(f"<{cid:04X}> <{cp:04X}>" for cp, cid in block)
+            cmap_lines.append("endbfchar")
+        cmap_lines += ["endcmap", "CMapName currentdict /CMap defineresource pop", "end", "end"]
+        objects.append(_stream("\n".join(cmap_lines).encode()))
+        cmap_ref = len(objects)
+        objects.append(
+            b"<< /Type /Font /Subtype /CIDFontType2 /BaseFont /SyntheticIndic "
+            b"/CIDSystemInfo << /Registry (Adobe) /Ordering (Identity) /Supplement 0 >> "
+            b"/FontDescriptor " + f"{len(objects) + 2}".encode() + b" 0 R /DW 500 >>"
+        )
+        descendant_ref = len(objects)
+        objects.append(
+            b"<< /Type /FontDescriptor /FontName /SyntheticIndic /Flags 4 /FontBBox [0 -200 1000 900] "
+            b"/ItalicAngle 0 /Ascent 900 /Descent -200 /CapHeight 700 /StemV 80 >>"
+        )
+        objects.append(
+            f"<< /Type /Font /Subtype /Type0 /BaseFont /SyntheticIndic /Encoding /Identity-H "
+            f"/DescendantFonts [{descendant_ref} 0 R] /ToUnicode {cmap_ref} 0 R >>".encode()
+        )
+    else:
+        objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+    font_ref = len(objects)
+
+    page_refs = []
+    for lines in pages:
+        ops = ["BT", "/F1 11 Tf", "13 TL", "72 740 Td"]
+        for line in lines:
+            if indic:
+                ops.append("<" + "".join(f"{cids[ord(ch)]:04X}" for ch in line) + "> Tj T*")
+            else:
+                ops.append(f"({_pdf_escape(line)}) Tj T*")
+        ops.append("ET")
+        content = "\n".join(ops).encode("latin-1")
+        objects.append(_stream(content))
+        content_ref = len(objects)
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {content_ref} 0 R "
+            f"/Resources << /Font << /F1 {font_ref} 0 R >> >> >>".encode()
+        )
+        page_refs.append(len(objects))
+
+    objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(f'{ref} 0 R' for ref in page_refs)}] /Count {len(page_refs)} >>".encode()
+    return _pdf_document(objects)
+
+
+def make_pdf(rng: random.Random, pages: int, indic: bool = False) -> bytes:
+    words = (HINDI_WORDS if rng.random() < 0.7 else TAMIL_WORDS) if indic else WORDS
+    return build_pdf([_script_lines(rng, words, 48) for _ in range(pages)], indic=indic)
+
+
+# --- Office formats -----------------------------------------------------------
+
+FIXED_TIMESTAMP = datetime(2024, 1, 1)
+
+
+def _stable_zip(data: bytes) -> bytes:
+    """Rewrite an OOXML package with fixed entry timestamps so builds are byte-identical."""
+    out = io.BytesIO()
+    with zipfile.ZipFile(io.BytesIO(data)) as source, zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as target:
+        for info in source.infolist():
+            target.writestr(zipfile.ZipInfo(info.filename, FIXED_TIMESTAMP.timetuple()[:6]), source.read(info))
+    return out.getvalue()
+
+
+def make_docx(rng: random.Random, paragraphs: int) -> bytes:
+    from docx import Document
+
+    doc = Document()
+    doc.core_properties.created = doc.core_properties.modified = FIXED_TIMESTAMP
+    written = 0
+    scene = 0
+    while written < paragraphs:
+        scene += 1
+        doc.add_heading(f"Scene {scene}: {rng.choice(LOCATIONS)}", level=2)
+        for line in _script_lines(rng, WORDS, rng.randint(10, 30)):
+            doc.add_paragraph(line)
+            written += 1
+        if scene % 5 == 0:
+            table = doc.add_table(rows=6, cols=4)
+            for row in table.rows:
+                for cell in row.cells:
+                    cell.text = _sentence(rng, WORDS, 3)
+            # A merged cell, as writers' breakdown sheets often have
+            table.cell(0, 0).merge(table.cell(0, 1))
+    out = io.BytesIO()
+    doc.save(out)
+    return _stable_zip(out.getvalue())
+
+
+def make_image(rng: random.Random, edge: int) -> bytes:
+    from PIL import Image, ImageDraw
+
+    image = Image.new("RGB", (edge, int(edge * 0.75)), (rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    draw = ImageDraw.Draw(image)
+    for _ in range(40):
+        x, y = rng.randrange(image.width), rng.randrange(image.height)
+        draw.rectangle([x, y, x + edge // 8, y + edge // 10], fill=(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    out = io.BytesIO()
+    image.save(out, format="JPEG", quality=92)
+    return out.getvalue()
+
+
+def make_pptx(rng: random.Random, slides: int) -> bytes:
+    from pptx import Presentation
+    from pptx.util import Inches
+
+    prs = Presentation()
+    prs.core_properties.created = prs.core_properties.modified = FIXED_TIMESTAMP
+    picture = io.BytesIO(make_image(rng, 1600))
+    for i in range(slides):
+        slide = prs.slides.add_slide(prs.slide_layouts[1])
+        slide.shapes.title.text = f"Slide {i + 1}: {_sentence(rng, WORDS, 4).title()}"
+        slide.placeholders[1].text = "\n".join(_sentence(rng, WORDS, 8) for _ in range(4))
+        slide.notes_slide.notes_text_frame.text = _sentence(rng, WORDS, 30)
+        if i % 3 == 0:
+            table = slide.shapes.add_table(3, 3, Inches(1), Inches(4.5), Inches(6), Inches(1.5)).table
+            for row in table.rows:
+                for cell in row.cells:
+                    cell.text = _sentence(rng, WORDS, 2)
+        if i % 4 == 0:
+            group = slide.shapes.add_group_shape()
+            box = group.shapes.add_textbox(Inches(6), Inches(1), Inches(2), Inches(1))
+            box.text_frame.text = _sentence(rng, WORDS, 5)
+        if i % 10 == 0:
+            picture.seek(0)
+            slide.shapes.add_picture(picture, Inches(7), Inches(5), Inches(2))
+    out = io.BytesIO()
+    prs.save(out)
+    return _stable_zip(out.getvalue())
+
+
+def make_text(rng: random.Random, kilobytes: int) -> bytes:
+    lines = []
+    size = 0
+    while size < kilobytes * 1024:
+        line = _sentence(rng, WORDS if rng.random() < 0.8 else HINDI_WORDS, rng.randint(6, 14))
+        lines.append(line)
+        size += len(line.encode("utf-8")) + 1
+    return "\n".join(lines).encode("utf-8")
+
+
+BUILDERS = {
+    "pdf": (lambda rng, n: make_pdf(rng, n), "pdf", "application/pdf"),
+    "pdf_indic": (lambda rng, n: make_pdf(rng, n, indic=True), "pdf", "application/pdf"),
+    "docx": (make_docx, "docx", "application/vnd.openxmlformats-officedocument.wordprocessingml.document"),
+    "pptx": (make_pptx, "pptx", "application/vnd.openxmlformats-officedocument.presentationml.presentation"),
+    "text": (make_text, "txt", "text/plain"),
+    "image": (make_image, "jpg", "image/jpeg"),
+}
+
+
+def build_corpus(directory: str, profile: str = "small", seed: int = 1234) -> List[Dict]:
+    """Generate (or reuse) the corpus for a profile; returns its manifest."""
+    os.makedirs(directory, exist_ok=True)
+    manifest_path = os.path.join(directory, f"manifest-{profile}-{seed}.json")
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            return json.load(f)
+
+    manifest = []
+    for index, (kind, size) in enumerate(PROFILES[profile]):
+        builder, ext, mime_type = BUILDERS[kind]
+        filename = f"{kind}-{size}-{seed}.{ext}"
+        path = os.path.join(directory, filename)
+        if not os.path.exists(path):
+            logger.info(f"Generating {filename}")
+            data = builder(random.Random(seed * 1000 + index), size)
+            with open(path, "wb") as f:
+                f.write(data)
+        manifest.append({
+            "name": f"{kind}-{size}",
+            "kind": kind,
+            "filename": filename,
+            "mimeType": mime_type,
+            "bytes": os.path.getsize(path),
+        })
+
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
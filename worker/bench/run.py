@@ -0,0 +1,372 @@
+"""
+Benchmark extract_document_text and generate_document_embeddings against local stubs.
+
+Usage (from worker/):
+    python -m bench.run --profile small --iterations 3 --save bench/baseline.json
+    python -m bench.run --profile small --compare bench/baseline.json
+"""
+import os
+import sys
+import json
+import math
+import time
+import uuid
+import argparse
+import platform
+import resource
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from bench.corpus import PROFILES, build_corpus
+from bench.stubs import Latency, StubConfig, StubServer
+
+RSS_SAMPLE_INTERVAL = 0.01
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def current_rss() -> int:
+    """Resident set size of this process in bytes."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except OSError:
+        # ru_maxrss is KB on Linux, bytes on macOS; only the peak is available
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class RSSSampler:
+    """Background sampler tracking peak RSS for each open measurement window."""
+
+    def __init__(self, interval: float = RSS_SAMPLE_INTERVAL):
+        self.interval = interval
+        self._windows: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._next = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="rss-sampler", daemon=True)
+
+    def start(self) -> "RSSSampler":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            rss = current_rss()
+            with self._lock:
+                for window, peak in self._windows.items():
+                    if rss > peak:
+                        self._windows[window] = rss
+
+    def open(self) -> int:
+        with self._lock:
+            self._next += 1
+            self._windows[self._next] = current_rss()
+            return self._next
+
+    def close(self, window: int) -> int:
+        rss = current_rss()
+        with self._lock:
+            return max(self._windows.pop(window), rss)
+
+
+class StageRecorder:
+    """Collects wall time, CPU time and peak RSS for each pipeline stage."""
+
+    def __init__(self, sampler: RSSSampler):
+        self.sampler = sampler
+        self.samples: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def wrap(self, original_stage):
+        @contextmanager
+        def recording_stage(name: str, route: str = ""):
+            window = self.sampler.open()
+            wall = time.perf_counter()
+            # Process-wide CPU: includes helper threads (embed/insert pools), not child processes
+            cpu = time.process_time()
+            try:
+                with original_stage(name, route):
+                    yield
+            finally:
+                sample = {
+                    "stage": f"{name}[{route}]" if route else name,
+                    "wall": time.perf_counter() - wall,
+                    "cpu": time.process_time() - cpu,
+                    "peakRss": self.sampler.close(window),
+                }
+                with self._lock:
+                    self.samples.append(sample)
+
+        return recording_stage
+
+    def drain(self) -> List[Dict]:
+        with self._lock:
+            samples, self.samples = self.samples, []
+        return samples
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def summarize(walls: List[float], cpus: List[float], rss: List[int]) -> Dict:
+    return {
+        "count": len(walls),
+        "p50": round(percentile(walls, 50), 4),
+        "p99": round(percentile(walls, 99), 4),
+        "mean": round(sum(walls) / len(walls), 4) if walls else 0.0,
+        "cpuMean": round(sum(cpus) / len(cpus), 4) if cpus else 0.0,
+        "peakRssMb": round(max(rss) / (1024 * 1024), 1) if rss else 0.0,
+    }
+
+
+def inner_stage_totals() -> Dict[str, List[float]]:
+    """Per-stage [count, seconds] from the metrics registry (covers embed_call / insert)."""
+    from metrics import STAGE_SECONDS
+
+    totals: Dict[str, List[float]] = {}
+    for labels, value in STAGE_SECONDS.snapshot():
+        stage_name = labels[0]
+        entry = totals.setdefault(stage_name, [0, 0.0])
+        entry[0] += sum(value[:-1])
+        entry[1] += value[-1]
+    return totals
+
+
+def run_benchmark(args) -> Dict:
+    corpus_dir = args.corpus_dir
+    manifest = build_corpus(corpus_dir, args.profile, args.seed)
+    if args.only:
+        manifest = [item for item in manifest if item["kind"] in args.only.split(",")]
+
+    stubs = StubServer(corpus_dir, StubConfig(
+        supabase=Latency(args.supabase_ms),
+        storage=Latency(args.storage_ms),
+        voyage=Latency(args.voyage_ms, args.voyage_item_ms, tail_ms=args.voyage_tail_ms, tail_rate=args.voyage_tail_rate),
+        anthropic=Latency(args.anthropic_ms),
+        error_rate=args.error_rate,
+        provider_error_rate=args.provider_error_rate,
+    )).start()
+
+    # The worker reads its configuration at import time, so set it up first
+    os.environ.update(stubs.environment())
+    os.environ.setdefault("WORKER_METRICS_DIR", tempfile.mkdtemp(prefix="bench-metrics-"))
+    if not args.warm_caches:
+        os.environ["EXTRACTION_CACHE_MAX_MB"] = "0"
+        os.environ["EMBEDDING_CACHE_SIZE"] = "0"
+        os.environ["IMAGE_HASH_CACHE_SIZE"] = "0"
+
+    import main
+
+    stubs.point_voyage_client()
+    sampler = RSSSampler().start()
+    recorder = StageRecorder(sampler)
+    main.stage = recorder.wrap(main.stage)
+
+    operations = {
+        "extract": lambda doc_id, item: main.extract_document_text(
+            doc_id, stubs.storage_url(item["filename"]), item["mimeType"], item["filename"]
+        ),
+        "embed": lambda doc_id, item: main.generate_document_embeddings(doc_id),
+    }
+
+    documents: Dict[str, Dict] = {}
+    stage_samples: Dict[str, Dict[str, list]] = {}
+    started = time.perf_counter()
+    cpu_started = time.process_time()
+    total_bytes = 0
+    total_chars = 0
+    total_chunks = 0
+
+    for item in manifest:
+        per_op: Dict[str, Dict[str, list]] = {}
+        inner_before = inner_stage_totals()
+        for iteration in range(args.warmup + args.iterations):
+            document_id = str(uuid.uuid4())
+            with stubs.state.lock:
+                stubs.state.documents[document_id] = {"id": document_id, "mime_type": item["mimeType"], "title": item["filename"]}
+            measured = iteration >= args.warmup
+            for op_name in args.ops.split(","):
+                window = sampler.open()
+                wall = time.perf_counter()
+                cpu = time.process_time()
+                result = operations[op_name](document_id, item)
+                wall = time.perf_counter() - wall
+                cpu = time.process_time() - cpu
+                peak = sampler.close(window)
+                samples = recorder.drain()
+
+                if not result.get("success"):
+                    raise RuntimeError(f"{op_name} failed for {item['name']}: {result.get('error')}")
+                if not measured:
+                    continue
+
+                op = per_op.setdefault(op_name, {"wall": [], "cpu": [], "rss": []})
+                op["wall"].append(wall)
+                op["cpu"].append(cpu)
+                op["rss"].append(peak)
+                for sample in samples:
+                    entry = stage_samples.setdefault(sample["stage"], {"wall": [], "cpu": [], "rss": []})
+                    entry["wall"].append(sample["wall"])
+                    entry["cpu"].append(sample["cpu"])
+                    entry["rss"].append(sample["peakRss"])
+
+                if op_name == "extract":
+                    total_bytes += item["bytes"]
+                    total_chars += result.get("textLength", 0)
+                elif op_name == "embed":
+                    total_chunks += result.get("numChunks", 0)
+
+        inner_after = inner_stage_totals()
+        documents[item["name"]] = {
+            "bytes": item["bytes"],
+            "operations": {name: summarize(op["wall"], op["cpu"], op["rss"]) for name, op in per_op.items()},
+            "innerStageSeconds": {
+                name: round(inner_after[name][1] - inner_before.get(name, [0, 0.0])[1], 4)
+                for name in ("embed_call", "insert", "chunking")
+                if name in inner_after
+            },
+        }
+        print(f"  {item['name']:<20} " + "  ".join(
+            f"{name} p50={summary['p50']:.3f}s p99={summary['p99']:.3f}s rss={summary['peakRssMb']}MB"
+            for name, summary in documents[item["name"]]["operations"].items()
+        ), flush=True)
+
+    elapsed = time.perf_counter() - started
+    sampler.stop()
+    stubs.stop()
+
+    return {
+        "meta": {
+            "profile": args.profile,
+            "seed": args.seed,
+            "iterations": args.iterations,
+            "ops": args.ops,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "latencyMs": {
+                "supabase": args.supabase_ms,
+                "storage": args.storage_ms,
+                "voyage": args.voyage_ms,
+                "voyagePerItem": args.voyage_item_ms,
+                "anthropic": args.anthropic_ms,
+                "voyageTail": args.voyage_tail_ms,
+                "voyageTailRate": args.voyage_tail_rate,
+            },
+            "errorRate": args.error_rate,
+            "providerErrorRate": args.provider_error_rate,
+            "warmCaches": args.warm_caches,
+            "createdAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        },
+        "totals": {
+            "seconds": round(elapsed, 3),
+            "cpuSeconds": round(time.process_time() - cpu_started, 3),
+            "mbPerSecond": round(total_bytes / (1024 * 1024) / elapsed, 3) if elapsed else 0.0,
+            "charsPerSecond": round(total_chars / elapsed) if elapsed else 0,
+            "chunksPerSecond": round(total_chunks / elapsed, 2) if elapsed else 0.0,
+            "peakRssMb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 if sys.platform != "darwin" else 1024 * 1024), 1),
+            "stubRequests": stubs.state.reset_counters(),
+        },
+        "documents": documents,
+        "stages": {name: summarize(s["wall"], s["cpu"], s["rss"]) for name, s in sorted(stage_samples.items())},
+    }
+
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """Return human-readable regressions where p50/p99/peak RSS grew by more than threshold."""
+    regressions = []
+
+    def check(label: str, now: Dict, before: Dict) -> None:
+        for key in ("p50", "p99", "peakRssMb"):
+            old, new = before.get(key), now.get(key)
+            # Ignore sub-10ms timings; they are dominated by noise
+            if not old or new is None or (key != "peakRssMb" and old < 0.01):
+                continue
+            change = (new - old) / old
+            if change > threshold:
+                regressions.append(f"{label} {key}: {old} -> {new} (+{change:.0%})")
+
+    for name, stats in current["stages"].items():
+        if name in baseline.get("stages", {}):
+            check(f"stage {name}", stats, baseline["stages"][name])
+    for name, doc in current["documents"].items():
+        for op_name, stats in doc["operations"].items():
+            before = baseline.get("documents", {}).get(name, {}).get("operations", {}).get(op_name)
+            if before:
+                check(f"{name} {op_name}", stats, before)
+    return regressions
+
+
+def print_report(report: Dict) -> None:
+    totals = report["totals"]
+    print(f"\nTotal {totals['seconds']}s wall, {totals['cpuSeconds']}s CPU, peak RSS {totals['peakRssMb']} MB")
+    print(f"Throughput: {totals['mbPerSecond']} MB/s, {totals['charsPerSecond']} chars/s, {totals['chunksPerSecond']} chunks/s")
+    print(f"\n{'stage':<24}{'n':>5}{'p50 s':>10}{'p99 s':>10}{'cpu s':>10}{'rss MB':>10}")
+    for name, stats in report["stages"].items():
+        print(f"{name:<24}{stats['count']:>5}{stats['p50']:>10.3f}{stats['p99']:>10.3f}{stats['cpuMean']:>10.3f}{stats['peakRssMb']:>10.1f}")
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark the worker pipeline against local service stubs")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="small")
+    parser.add_argument("--corpus-dir", default=os.path.join(tempfile.gettempdir(), "manthan-bench-corpus"))
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--only", default="", help="Comma-separated corpus kinds to run (pdf,pdf_indic,docx,pptx,text,image)")
+    parser.add_argument("--ops", default="extract,embed", help="Operations to run, in order")
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--supabase-ms", type=float, default=5)
+    parser.add_argument("--storage-ms", type=float, default=20)
+    parser.add_argument("--voyage-ms", type=float, default=150)
+    parser.add_argument("--voyage-item-ms", type=float, default=1)
+    parser.add_argument("--anthropic-ms", type=float, default=2000)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of stub calls that fail (503/429/529)")
+    parser.add_argument("--provider-error-rate", type=float, default=None, help="Failure rate for Voyage/Anthropic only (defaults to --error-rate)")
+    parser.add_argument("--voyage-tail-ms", type=float, default=0, help="Extra delay for slow Voyage calls")
+    parser.add_argument("--voyage-tail-rate", type=float, default=0, help="Fraction of Voyage calls that get --voyage-tail-ms")
+    parser.add_argument("--warm-caches", action="store_true", help="Keep extraction/embedding caches enabled")
+    parser.add_argument("--save", help="Write the JSON report here")
+    parser.add_argument("--compare", help="Baseline JSON report to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Relative slowdown that counts as a regression")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    print(f"Running '{args.profile}' profile, {args.iterations} iteration(s) per document", flush=True)
+    report = run_benchmark(args)
+    print_report(report)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved report to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against {args.compare}:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"\nNo regressions against {args.compare} (threshold {args.threshold:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
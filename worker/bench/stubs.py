@@ -0,0 +1,377 @@
+"""Local stand-ins for Supabase (REST + storage), Voyage and Anthropic with configurable latency."""
+import os
+import re
+import gzip
+import json
+import time
+import random
+import hashlib
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import unquote
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_DIMENSIONS = 512  # voyage-3-lite
+# processing_status values claim_documents may lease (db/migrations/015_document_claims.sql)
+CLAIMABLE_STATUSES = ("QUEUED", "UPLOADED", "PENDING", "EXTRACTING", "EMBEDDING")
+
+
+class Latency:
+    """Per-call delay: fixed + per-item milliseconds, with uniform jitter and an optional slow tail."""
+
+    def __init__(self, base_ms: float = 0.0, per_item_ms: float = 0.0, jitter: float = 0.2, tail_ms: float = 0.0, tail_rate: float = 0.0):
+        self.base_ms = base_ms
+        self.per_item_ms = per_item_ms
+        self.jitter = jitter
+        # A tail_rate fraction of calls stall for an extra tail_ms (what hedged requests are for)
+        self.tail_ms = tail_ms
+        self.tail_rate = tail_rate
+
+    def sleep(self, items: int = 1) -> None:
+        delay = (self.base_ms + self.per_item_ms * items) / 1000.0
+        if self.tail_rate and random.random() < self.tail_rate:
+            delay += self.tail_ms / 1000.0
+        if delay > 0:
+            time.sleep(delay * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+
+class StubConfig:
+    """Latency and error injection for each stubbed service."""
+
+    def __init__(
+        self,
+        supabase: Optional[Latency] = None,
+        storage: Optional[Latency] = None,
+        voyage: Optional[Latency] = None,
+        anthropic: Optional[Latency] = None,
+        error_rate: float = 0.0,
+        provider_error_rate: Optional[float] = None,
+    ):
+        self.supabase = supabase or Latency(5)
+        self.storage = storage or Latency(20)
+        self.voyage = voyage or Latency(150, 1)
+        self.anthropic = anthropic or Latency(2000)
+        self.error_rate = error_rate
+        # Failure rate for Voyage and Anthropic only (defaults to error_rate)
+        self.provider_error_rate = error_rate if provider_error_rate is None else provider_error_rate
+
+
+class StubState:
+    """In-memory documents / document_sections tables plus request counters."""
+
+    def __init__(self):
+        self.documents: Dict[str, Dict] = {}
+        self.sections: Dict[str, Dict] = {}
+        self.requests: Dict[str, int] = {}
+        self.bytes_in = 0
+        self._seq = 0
+        self.lock = threading.Lock()
+
+    def count(self, name: str, size: int = 0) -> None:
+        with self.lock:
+            self.requests[name] = self.requests.get(name, 0) + 1
+            self.bytes_in += size
+
+    def next_id(self) -> str:
+        with self.lock:
+            self._seq += 1
+            return f"s{self._seq}"
+
+    def reset_counters(self) -> Dict:
+        with self.lock:
+            snapshot = {"requests": dict(self.requests), "bytesIn": self.bytes_in}
+            self.requests.clear()
+            self.bytes_in = 0
+            return snapshot
+
+
+def fake_embedding(text: str) -> List[float]:
+    """Deterministic unit-ish vector derived from the text hash."""
+    rng = random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+    return [round(rng.uniform(-1, 1), 6) for _ in range(EMBEDDING_DIMENSIONS)]
+
+
+def _id_filter(query: str, column: str = "id") -> List[str]:
+    match = re.search(rf"(?:^|&){column}=(eq\.([^&]+)|in\.\(([^)]*)\))", query)
+    if not match:
+        return []
+    if match.group(2) is not None:
+        return [unquote(match.group(2))]
+    return [unquote(value) for value in match.group(3).split(",") if value]
+
+
+def make_handler(state: StubState, config: StubConfig, files_dir: str):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _read_body(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b""
+            size = len(raw)
+            if self.headers.get("Content-Encoding") == "gzip":
+                raw = gzip.decompress(raw)
+            return (json.loads(raw) if raw else None), size
+
+        def _send(self, code: int, payload=None, headers: Optional[Dict[str, str]] = None) -> None:
+            body = json.dumps(payload, separators=(",", ":")).encode("utf-8") if payload is not None else b""
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _inject_error(self, status: int = 503, rate: Optional[float] = None) -> bool:
+            rate = config.error_rate if rate is None else rate
+            if rate and random.random() < rate:
+                self._send(status, {"message": "injected failure"}, {"Retry-After": "0"})
+                return True
+            return False
+
+        def _split(self):
+            path, _, query = self.path.partition("?")
+            return path, query
+
+        # --- Routing -------------------------------------------------------
+
+        def do_GET(self):
+            path, query = self._split()
+            if path.startswith("/storage/"):
+                return self._storage(path[len("/storage/"):])
+            if path.startswith("/rest/v1/"):
+                return self._rest("GET", path[len("/rest/v1/"):], query, None, 0)
+            self._send(404, {"message": f"no route {path}"})
+
+        def do_POST(self):
+            path, query = self._split()
+            body, size = self._read_body()
+            if path == "/voyage/v1/embeddings":
+                return self._voyage(body, size)
+            if path == "/anthropic/v1/messages":
+                return self._anthropic(body, size)
+            if path.startswith("/rest/v1/"):
+                return self._rest("POST", path[len("/rest/v1/"):], query, body, size)
+            self._send(404, {"message": f"no route {path}"})
+
+        def do_PATCH(self):
+            path, query = self._split()
+            body, size = self._read_body()
+            self._rest("PATCH", path[len("/rest/v1/"):], query, body, size)
+
+        def do_DELETE(self):
+            path, query = self._split()
+            self._rest("DELETE", path[len("/rest/v1/"):], query, None, 0)
+
+        # --- Services ------------------------------------------------------
+
+        def _storage(self, name: str) -> None:
+            state.count("storage")
+            config.storage.sleep()
+            path = os.path.join(files_dir, os.path.basename(unquote(name)))
+            if not os.path.exists(path):
+                return self._send(404, {"message": "object not found"})
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(os.path.getsize(path)))
+            self.end_headers()
+            with open(path, "rb") as f:
+                while True:
+                    block = f.read(1024 * 1024)
+                    if not block:
+                        break
+                    self.wfile.write(block)
+
+        def _rest(self, method: str, table: str, query: str, body, size: int) -> None:
+            state.count(f"{method} {table}", size)
+            config.supabase.sleep(len(body) if isinstance(body, list) else 1)
+            if self._inject_error():
+                return
+
+            if table == "rpc/claim_documents":
+                return self._send(200, self._claim(body))
+            if table == "rpc/renew_document_leases":
+                return self._send(200, self._renew(body))
+            if table.startswith("rpc/"):
+                return self._send(200, [])
+
+            if table == "documents":
+                ids = _id_filter(query)
+                if method == "GET":
+                    with state.lock:
+                        return self._send(200, [dict(state.documents[i]) for i in ids if i in state.documents])
+                if method == "PATCH":
+                    claimed_by = _id_filter(query, "claimed_by")
+                    with state.lock:
+                        for document_id in ids:
+                            document = state.documents.setdefault(document_id, {"id": document_id})
+                            # Conditional update, as PostgREST applies every filter
+                            if claimed_by and document.get("claimed_by") not in claimed_by:
+                                continue
+                            document.update(body or {})
+                            # The documents_clear_lease trigger
+                            if document.get("processing_status") not in CLAIMABLE_STATUSES:
+                                document.update(claimed_by=None, lease_expires_at=None)
+                    return self._send(204)
+
+            if table == "document_sections":
+                if method == "GET":
+                    document_ids = _id_filter(query, "document_id")
+                    limit = int((re.search(r"limit=(\d+)", query) or [0, 1000])[1])
+                    offset = int((re.search(r"offset=(\d+)", query) or [0, 0])[1])
+                    with state.lock:
+                        rows = [
+                            {"id": row["id"], "document_id": row["document_id"], "metadata": row["metadata"]}
+                            for row in state.sections.values()
+                            if row["document_id"] in document_ids
+                        ]
+                    return self._send(200, rows[offset:offset + limit])
+                if method == "POST":
+                    rows = body if isinstance(body, list) else [body]
+                    for row in rows:
+                        row_id = row.get("id") or state.next_id()
+                        with state.lock:
+                            # Embeddings are not kept; only what incremental re-embedding reads back
+                            existing = state.sections.setdefault(row_id, {"id": row_id})
+                            existing["document_id"] = row.get("document_id", existing.get("document_id"))
+                            existing["metadata"] = row.get("metadata", existing.get("metadata"))
+                    return self._send(201)
+                if method == "DELETE":
+                    with state.lock:
+                        for row_id in _id_filter(query):
+                            state.sections.pop(row_id, None)
+                    return self._send(204)
+
+            # Cache tables and anything else: accept writes, return no rows
+            self._send(200 if method == "GET" else 201, [] if method == "GET" else None)
+
+        def _claim(self, body) -> List[Dict]:
+            """claim_documents: the same lease rules as the SQL function, under one lock instead of SKIP LOCKED."""
+            now = time.time()
+            statuses = body.get("p_statuses") or ["QUEUED"]
+            claimed = []
+            with state.lock:
+                for document in state.documents.values():
+                    lease = document.get("lease_expires_at")
+                    if (
+                        lease is not None and lease < now
+                        and document.get("claim_attempts", 0) >= body.get("p_max_attempts", 3)
+                        and document.get("processing_status") in CLAIMABLE_STATUSES
+                    ):
+                        document.update(
+                            processing_status="EMBEDDING_FAILED" if document.get("processing_status") == "EMBEDDING" else "EXTRACTION_FAILED",
+                            error_message=f"Processing lease expired {document.get('claim_attempts', 0)} times",
+                            claimed_by=None,
+                            lease_expires_at=None,
+                        )
+                for document in sorted(state.documents.values(), key=lambda row: row.get("created_at", 0)):
+                    if len(claimed) >= body.get("p_batch_size", 4):
+                        break
+                    lease = document.get("lease_expires_at")
+                    pending = document.get("processing_status") in statuses and lease is None
+                    if not (pending or (lease is not None and lease < now)):
+                        continue
+                    if document.get("processing_status") not in CLAIMABLE_STATUSES:
+                        continue
+                    document.update(
+                        claimed_by=body["p_worker_id"],
+                        lease_expires_at=now + body.get("p_lease_seconds", 300),
+                        claim_attempts=document.get("claim_attempts", 0) + 1,
+                    )
+                    claimed.append({
+                        key: document.get(key)
+                        for key in ("id", "storage_url", "mime_type", "title", "file_size_bytes", "claim_attempts")
+                    })
+            return claimed
+
+        def _renew(self, body) -> List[str]:
+            renewed = []
+            with state.lock:
+                for document_id in body.get("p_document_ids") or []:
+                    document = state.documents.get(document_id)
+                    if document and document.get("claimed_by") == body["p_worker_id"]:
+                        document["lease_expires_at"] = time.time() + body.get("p_lease_seconds", 300)
+                        renewed.append(document_id)
+            return renewed
+
+        def _voyage(self, body, size: int) -> None:
+            texts = body.get("input") or []
+            state.count("voyage", size)
+            config.voyage.sleep(len(texts))
+            if self._inject_error(429, config.provider_error_rate):
+                return
+            self._send(200, {
+                "object": "list",
+                "data": [{"object": "embedding", "embedding": fake_embedding(text), "index": i} for i, text in enumerate(texts)],
+                "model": body.get("model"),
+                "usage": {"total_tokens": sum(len(text) // 4 + 1 for text in texts)},
+            })
+
+        def _anthropic(self, body, size: int) -> None:
+            state.count("anthropic", size)
+            config.anthropic.sleep()
+            if self._inject_error(529, config.provider_error_rate):
+                return
+            self._send(200, {
+                "id": "msg_bench",
+                "type": "message",
+                "role": "assistant",
+                "model": body.get("model"),
+                "content": [{"type": "text", "text": "Visible text: none. Mood: tense, rain-soaked night. " * 20}],
+                "stop_reason": "end_turn",
+                "stop_sequence": None,
+                "usage": {"input_tokens": size // 4, "output_tokens": 300},
+            })
+
+    return Handler
+
+
+class StubServer:
+    """One HTTP server hosting all stubbed services under path prefixes."""
+
+    def __init__(self, files_dir: str, config: Optional[StubConfig] = None, port: int = 0):
+        self.files_dir = files_dir
+        self.state = StubState()
+        self.config = config or StubConfig()
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(self.state, self.config, files_dir))
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name="bench-stubs", daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def storage_url(self, filename: str) -> str:
+        return f"{self.base_url}/storage/{filename}"
+
+    def start(self) -> "StubServer":
+        self.thread.start()
+        logger.info(f"Stub services listening on {self.base_url}")
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def environment(self) -> Dict[str, str]:
+        """Environment that points the worker's clients at this server."""
+        return {
+            "SUPABASE_URL": self.base_url,
+            "SUPABASE_SERVICE_ROLE_KEY": "bench-service-role-key",
+            "VOYAGE_API_KEY": "bench-voyage-key",
+            "ANTHROPIC_API_KEY": "bench-anthropic-key",
+            "ANTHROPIC_BASE_URL": f"{self.base_url}/anthropic",
+        }
+
+    def point_voyage_client(self) -> None:
+        # voyageai 0.2.x reads its endpoint from a module global, not the environment
+        import voyageai
+
+        voyageai.api_base = f"{self.base_url}/voyage/v1"
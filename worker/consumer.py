@@ -0,0 +1,200 @@
+"""
+Pull-mode worker: claims pending documents from Postgres and processes them locally.
+
+Run with `python consumer.py` (the Procfile's `worker` process) alongside or
+instead of the HTTP server. Each node claims only as many documents as it
+has free slots, through the claim_documents RPC (FOR UPDATE SKIP LOCKED), so
+adding nodes adds throughput without two nodes ever taking the same
+document. Claims are leases renewed by a heartbeat; if a node dies its
+documents are re-claimed by another once the lease expires.
+
+By default only QUEUED documents are claimed. UPLOADED documents belong to
+the push path (/extract, /process), which takes no lease; claiming them too
+would process a document twice. Set CONSUMER_STATUSES=UPLOADED,PENDING only
+when nothing calls the HTTP endpoints for new uploads.
+"""
+import os
+import sys
+import signal
+import socket
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+import startup
+from jobs import JOB_DEADLINE_SECONDS
+from main import process_document
+from outbound import deadline
+from supabase_client import rest_request
+
+CONSUMER_CONCURRENCY = int(os.getenv("CONSUMER_CONCURRENCY", "2"))
+CONSUMER_POLL_SECONDS = float(os.getenv("CONSUMER_POLL_SECONDS", "5"))
+CONSUMER_LEASE_SECONDS = int(os.getenv("CONSUMER_LEASE_SECONDS", "300"))
+# processing_status values that mean "waiting for a pull-mode worker"
+CONSUMER_STATUSES = [status.strip() for status in os.getenv("CONSUMER_STATUSES", "QUEUED").split(",") if status.strip()]
+# Claims (i.e. lease expiries) before a document is marked EXTRACTION_FAILED (EMBEDDING_FAILED once embedding)
+CONSUMER_MAX_ATTEMPTS = int(os.getenv("CONSUMER_MAX_ATTEMPTS", "3"))
+CONSUMER_WORKER_ID = os.getenv("CONSUMER_WORKER_ID") or f"{socket.gethostname()}:{os.getpid()}"
+
+REQUIRED_VARS = ["SUPABASE_URL", "SUPABASE_SERVICE_ROLE_KEY", "VOYAGE_API_KEY"]
+
+
+class Consumer:
+    """Claims documents in batches and runs process_document on a local thread pool."""
+
+    def __init__(self, worker_id: str = CONSUMER_WORKER_ID, concurrency: int = CONSUMER_CONCURRENCY):
+        self.worker_id = worker_id
+        self.concurrency = concurrency
+        self._pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="consumer")
+        self._active: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._slot_free = threading.Event()
+        self._drained = threading.Event()
+        self._counters = {"claimed": 0, "succeeded": 0, "failed": 0, "deferred": 0, "leasesLost": 0}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._counters, active=len(self._active))
+
+    def claim(self, count: int) -> List[Dict[str, Any]]:
+        """Lease up to count pending (or abandoned) documents to this worker."""
+        return rest_request(
+            "POST",
+            "rpc/claim_documents",
+            {
+                "p_worker_id": self.worker_id,
+                "p_batch_size": count,
+                "p_lease_seconds": CONSUMER_LEASE_SECONDS,
+                "p_statuses": CONSUMER_STATUSES,
+                "p_max_attempts": CONSUMER_MAX_ATTEMPTS,
+            },
+        ).json()
+
+    def renew(self) -> None:
+        """Extend the leases on every document still being processed here."""
+        with self._lock:
+            document_ids = list(self._active)
+        if not document_ids:
+            return
+
+        renewed = set(rest_request(
+            "POST",
+            "rpc/renew_document_leases",
+            {"p_worker_id": self.worker_id, "p_document_ids": document_ids, "p_lease_seconds": CONSUMER_LEASE_SECONDS},
+            retry_unsafe=True,
+        ).json())
+        lost = [document_id for document_id in document_ids if document_id not in renewed]
+        if lost:
+            # Another node has re-claimed these after our lease lapsed; its result will win
+            with self._lock:
+                self._counters["leasesLost"] += len(lost)
+            logger.warning(f"Lost leases on {len(lost)} documents: {lost}")
+
+    def release(self, document_id: str) -> None:
+        """Drop the lease once the document has reached a final status."""
+        rest_request(
+            "PATCH",
+            f"documents?id=eq.{document_id}&claimed_by=eq.{self.worker_id}",
+            {"claimed_by": None, "lease_expires_at": None},
+        )
+
+    def _process(self, document: Dict[str, Any]) -> None:
+        document_id = document["id"]
+        try:
+            logger.info(f"Processing claimed document {document_id} (attempt {document.get('claim_attempts')})")
+            with deadline(JOB_DEADLINE_SECONDS):
+                result = process_document(document_id, document["storage_url"], document.get("mime_type"), document.get("title"))
+            if "retryAfter" in result:
+                # A provider's circuit is open; let the lease lapse so the document is claimed again later
+                with self._lock:
+                    self._counters["deferred"] += 1
+                return
+            with self._lock:
+                self._counters["succeeded" if result.get("success") else "failed"] += 1
+            # Success or failure, process_document has written a final status
+            self.release(document_id)
+        except Exception as e:
+            # Keep the lease so the document is retried after it expires
+            logger.error(f"Claimed document {document_id} failed: {str(e)}", exc_info=True)
+            with self._lock:
+                self._counters["failed"] += 1
+        finally:
+            with self._lock:
+                self._active.pop(document_id, None)
+            self._slot_free.set()
+
+    def _heartbeat(self) -> None:
+        interval = max(1.0, CONSUMER_LEASE_SECONDS / 3)
+        # Keeps renewing after stop() until the documents already claimed have drained
+        while not self._drained.wait(interval):
+            try:
+                self.renew()
+            except Exception as e:
+                logger.warning(f"Lease renewal failed: {str(e)}")
+
+    def poll_once(self) -> int:
+        """Claim and start as many documents as there are free slots; returns how many were claimed."""
+        with self._lock:
+            free = self.concurrency - len(self._active)
+        if free <= 0:
+            return 0
+
+        documents = self.claim(free)
+        for document in documents:
+            with self._lock:
+                self._active[document["id"]] = self._pool.submit(self._process, document)
+                self._counters["claimed"] += 1
+        if documents:
+            logger.info(f"Claimed {len(documents)} documents ({len(self._active)}/{self.concurrency} slots busy)")
+        return len(documents)
+
+    def run(self) -> None:
+        """Poll until stop(); then finish the documents already claimed."""
+        heartbeat = threading.Thread(target=self._heartbeat, name="consumer-heartbeat", daemon=True)
+        heartbeat.start()
+        logger.info(f"Consumer {self.worker_id} polling for {CONSUMER_STATUSES} with {self.concurrency} slots")
+
+        while not self._stopping.is_set():
+            self._slot_free.clear()
+            try:
+                self.poll_once()
+            except Exception as e:
+                logger.warning(f"Claiming documents failed: {str(e)}")
+            with self._lock:
+                full = len(self._active) >= self.concurrency
+            if full:
+                # Claim again as soon as a slot frees up rather than on the next poll
+                self._slot_free.wait(CONSUMER_POLL_SECONDS)
+            else:
+                self._stopping.wait(CONSUMER_POLL_SECONDS)
+
+        logger.info(f"Consumer {self.worker_id} stopping; waiting for {len(self._active)} documents")
+        self._pool.shutdown(wait=True)
+        self._drained.set()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        self._slot_free.set()
+
+
+def main() -> None:
+    startup.log_diagnostics(REQUIRED_VARS)
+    if any(not os.getenv(var) for var in REQUIRED_VARS):
+        logger.error("Consumer is missing required configuration")
+        sys.exit(1)
+    startup.init_clients()
+
+    consumer = Consumer()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: consumer.stop())
+    consumer.run()
+    logger.info(f"Consumer exited: {consumer.stats()}")
+
+
+if __name__ == "__main__":
+    main()
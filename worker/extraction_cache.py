@@ -0,0 +1,209 @@
+"""Content-addressed cache of extracted text, keyed on file hash + route + extractor version."""
+import os
+import gzip
+import time
+import logging
+import tempfile
+import threading
+from typing import Callable, Dict, Optional
+
+from processors import EXTRACTOR_VERSIONS
+from processors.sources import FileSource, sha256_hex
+from supabase_client import rest_request
+
+logger = logging.getLogger(__name__)
+
+# Local on-disk LRU (shared by all worker processes on the host); 0 MB disables it
+EXTRACTION_CACHE_DIR = os.getenv("EXTRACTION_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "manthan-extraction-cache")
+EXTRACTION_CACHE_MAX_BYTES = int(os.getenv("EXTRACTION_CACHE_MAX_MB", "512")) * 1024 * 1024
+# Optional shared Supabase table (see db/migrations/013_extraction_cache.sql)
+EXTRACTION_CACHE_TABLE = os.getenv("EXTRACTION_CACHE_TABLE", "")
+
+
+class DiskLRU:
+    """Gzipped text files in one directory, evicted least-recently-used first."""
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._size: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.txt.gz")
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                text = f.read()
+        except (OSError, EOFError):
+            return None
+        # mtime doubles as last-access time for LRU ordering
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return text
+
+    def put(self, key: str, text: str) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=5) as f:
+            f.write(text)
+        size = os.path.getsize(tmp_path)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += size
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _scan_size(self) -> int:
+        total = 0
+        for entry in os.scandir(self.directory):
+            try:
+                total += entry.stat().st_size
+            except OSError:
+                pass
+        return total
+
+    def _evict(self) -> None:
+        """Delete oldest entries until the cache is under 90% of its cap."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        entries.sort()
+
+        total = sum(size for _, size, _ in entries)
+        target = int(self.max_bytes * 0.9)
+        removed = 0
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                removed += 1
+            except OSError:
+                pass
+        self._size = total
+        logger.info(f"Extraction cache evicted {removed} entries ({total} bytes remain)")
+
+
+class ExtractionCache:
+    """Local disk LRU in front of an optional shared table, with hit/miss counters."""
+
+    def __init__(self):
+        self.disk = DiskLRU(EXTRACTION_CACHE_DIR, EXTRACTION_CACHE_MAX_BYTES) if EXTRACTION_CACHE_MAX_BYTES > 0 else None
+        self.table = EXTRACTION_CACHE_TABLE
+        self._counters = {"hits": 0, "diskHits": 0, "sharedHits": 0, "misses": 0, "errors": 0}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.disk is not None or bool(self.table)
+
+    def _count(self, *names: str) -> None:
+        with self._lock:
+            for name in names:
+                self._counters[name] += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counters)
+
+    @staticmethod
+    def make_key(digest: str, route: str) -> str:
+        base_route = route.split(":", 1)[0]
+        version = EXTRACTOR_VERSIONS.get(base_route, 1)
+        # Routes may carry a qualifier (e.g. image mime type); keep keys filename-safe
+        safe_route = route.replace("/", "_").replace(":", "-")
+        return f"{digest}-{safe_route}-v{version}"
+
+    def get(self, key: str) -> Optional[str]:
+        if self.disk is not None:
+            text = self.disk.get(key)
+            if text is not None:
+                self._count("hits", "diskHits")
+                return text
+
+        if self.table:
+            try:
+                rows = rest_request("GET", f"{self.table}?cache_key=eq.{key}&select=extracted_text").json()
+                if rows:
+                    text = rows[0]["extracted_text"]
+                    self._count("hits", "sharedHits")
+                    if self.disk is not None:
+                        self.disk.put(key, text)
+                    return text
+            except Exception as e:
+                self._count("errors")
+                logger.warning(f"Shared extraction cache lookup failed: {str(e)}")
+
+        self._count("misses")
+        return None
+
+    def put(self, key: str, text: str) -> None:
+        if self.disk is not None:
+            try:
+                self.disk.put(key, text)
+            except OSError as e:
+                self._count("errors")
+                logger.warning(f"Failed to write extraction cache entry: {str(e)}")
+
+        if self.table:
+            try:
+                rest_request(
+                    "POST",
+                    self.table,
+                    {"cache_key": key, "extracted_text": text},
+                    headers={"Prefer": "resolution=merge-duplicates,return=minimal"},
+                    retry_unsafe=True,
+                )
+            except Exception as e:
+                self._count("errors")
+                logger.warning(f"Failed to write shared extraction cache entry: {str(e)}")
+
+    def key_for(self, file_data: FileSource, route: str) -> Optional[str]:
+        """Cache key for this file + route, or None when caching is disabled."""
+        if not self.enabled:
+            return None
+        return self.make_key(sha256_hex(file_data), route)
+
+    def get_or_extract(self, file_data: FileSource, route: str, extract: Callable[[], str]) -> str:
+        """Return cached text for this file + route, or run extract() and cache its result."""
+        if not self.enabled:
+            return extract()
+
+        started = time.perf_counter()
+        key = self.key_for(file_data, route)
+        cached = self.get(key)
+        if cached is not None:
+            logger.info(f"Extraction cache hit for {key} ({(time.perf_counter() - started) * 1000:.1f} ms)")
+            return cached
+
+        text = extract()
+        self.put(key, text)
+        return text
+
+
+_cache: Optional[ExtractionCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_extraction_cache() -> ExtractionCache:
+    """Get the process-wide extraction cache, creating it on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ExtractionCache()
+        return _cache
@@ -0,0 +1,32 @@
+"""Gunicorn settings; WORKER_PRELOAD=true imports the app and heavy modules once in the master."""
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+# Threaded workers serve several requests per process, which is what the
+# per-process admission budgets (admission.py) and job pool are sized for
+worker_class = "gthread"
+threads = int(os.getenv("WEB_THREADS", "8"))
+timeout = 300
+
+preload_app = os.getenv("WORKER_PRELOAD", "false").lower() in ("1", "true", "yes")
+
+
+def on_starting(server):
+    # Runs once in the master, so diagnostics aren't repeated for every worker
+    import logging
+    import startup
+
+    logging.basicConfig(level=logging.INFO)
+
+    startup.log_diagnostics()
+    if preload_app:
+        startup.preload_modules()
+
+
+def post_worker_init(worker):
+    # Clients hold sockets, so each forked worker builds its own before taking traffic
+    if preload_app:
+        import startup
+
+        startup.init_clients()
@@ -0,0 +1,249 @@
+"""Background job execution for the worker's async (202 + polling) mode."""
+import os
+import json
+import time
+import uuid
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from metrics import STAGE_INFLIGHT, STAGE_SECONDS
+from outbound import deadline
+
+logger = logging.getLogger(__name__)
+
+# Job pool configuration
+JOB_WORKERS = int(os.getenv("WORKER_JOB_WORKERS", "4"))
+JOB_QUEUE_DEPTH = int(os.getenv("WORKER_JOB_QUEUE_DEPTH", "16"))
+JOB_TTL_SECONDS = int(os.getenv("WORKER_JOB_TTL_SECONDS", "3600"))
+# Budget for the provider calls (Voyage, Anthropic) one job may make
+JOB_DEADLINE_SECONDS = float(os.getenv("WORKER_JOB_DEADLINE_SECONDS", "900"))
+# Job snapshots are written here so any gunicorn worker can answer /jobs/<id>
+JOB_STATE_DIR = os.getenv("WORKER_JOB_STATE_DIR") or os.path.join(tempfile.gettempdir(), "manthan-worker-jobs")
+PROGRESS_FLUSH_INTERVAL = 0.5
+
+_current_job: ContextVar[Optional["Job"]] = ContextVar("current_job", default=None)
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue has no free slots."""
+
+
+class Job:
+    """State of one queued/running extraction or embedding job."""
+
+    def __init__(self, kind: str, document_id: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.document_id = document_id
+        self.status = "queued"
+        self.stage = None
+        self.progress: Dict[str, Any] = {}
+        self.timings: Dict[str, float] = {}
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.time()
+            started = self.started_at or now
+            return {
+                "jobId": self.id,
+                "kind": self.kind,
+                "documentId": self.document_id,
+                "status": self.status,
+                "stage": self.stage,
+                "progress": dict(self.progress),
+                "timings": {name: round(secs, 3) for name, secs in self.timings.items()},
+                "queuedSeconds": round(started - self.created_at, 3),
+                "runSeconds": round((self.finished_at or now) - started, 3) if self.started_at else 0.0,
+                "createdAt": self.created_at,
+                "finishedAt": self.finished_at,
+                "result": self.result,
+                "error": self.error,
+            }
+
+    def flush(self, force: bool = True) -> None:
+        """Persist a snapshot so other worker processes can report this job."""
+        now = time.time()
+        if not force and now - self._last_flush < PROGRESS_FLUSH_INTERVAL:
+            return
+        self._last_flush = now
+        try:
+            os.makedirs(JOB_STATE_DIR, exist_ok=True)
+            path = os.path.join(JOB_STATE_DIR, f"{self.id}.json")
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self.to_dict(), f)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Failed to persist job {self.id}: {str(e)}")
+
+
+def current_job() -> Optional[Job]:
+    """Job running on this thread, if any."""
+    return _current_job.get()
+
+
+@contextmanager
+def stage(name: str, route: str = ""):
+    """Record a named pipeline stage in the stage metrics and on the current job."""
+    job = _current_job.get()
+    if job is not None:
+        with job._lock:
+            job.stage = name
+        job.flush()
+
+    STAGE_INFLIGHT.inc(stage=name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_INFLIGHT.dec(stage=name)
+        STAGE_SECONDS.observe(elapsed, stage=name, route=route)
+        if job is not None:
+            with job._lock:
+                job.timings[name] = job.timings.get(name, 0.0) + elapsed
+
+
+def report_progress(done: int, total: int, unit: str) -> None:
+    """Report progress of the current stage (e.g. pages or chunks)."""
+    job = _current_job.get()
+    if job is None:
+        return
+    with job._lock:
+        job.progress = {"done": done, "total": total, "unit": unit}
+    job.flush(force=False)
+
+
+class JobManager:
+    """Bounded thread pool plus registry of submitted jobs."""
+
+    def __init__(self, workers: int = JOB_WORKERS, queue_depth: int = JOB_QUEUE_DEPTH):
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        # Running + waiting jobs may not exceed pool size plus queue depth
+        self._slots = threading.BoundedSemaphore(workers + queue_depth)
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, document_id: str, fn: Callable[..., Dict[str, Any]], *args, **kwargs) -> Job:
+        if not self._slots.acquire(blocking=False):
+            raise QueueFullError(f"Job queue is full ({self.workers} running, {self.queue_depth} queued)")
+
+        job = Job(kind, document_id)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        job.flush()
+
+        try:
+            self._executor.submit(self._run, job, fn, args, kwargs)
+        except Exception:
+            # e.g. the executor is shutting down; don't leave a job that will never run
+            self._slots.release()
+            self._discard(job)
+            raise
+
+        logger.info(f"Queued {kind} job {job.id} for document {document_id}")
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+
+        # Job may have been accepted by another gunicorn worker
+        try:
+            with open(os.path.join(JOB_STATE_DIR, f"{os.path.basename(job_id)}.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return {
+            "workers": self.workers,
+            "queueDepth": self.queue_depth,
+            "queued": sum(1 for j in jobs if j.status == "queued"),
+            "running": sum(1 for j in jobs if j.status == "running"),
+        }
+
+    def _run(self, job: Job, fn: Callable[..., Dict[str, Any]], args, kwargs) -> None:
+        token = _current_job.set(job)
+        try:
+            with job._lock:
+                job.status = "running"
+                job.started_at = time.time()
+            job.flush()
+
+            try:
+                with deadline(JOB_DEADLINE_SECONDS):
+                    result = fn(*args, **kwargs)
+                with job._lock:
+                    job.result = result
+                    job.status = "succeeded" if result.get("success") else "failed"
+                    job.error = result.get("error")
+            except Exception as e:
+                logger.error(f"Job {job.id} crashed: {str(e)}", exc_info=True)
+                with job._lock:
+                    job.status = "failed"
+                    job.error = str(e)
+
+            with job._lock:
+                job.stage = None
+                job.finished_at = time.time()
+            job.flush()
+            logger.info(f"Job {job.id} finished with status {job.status}")
+        finally:
+            _current_job.reset(token)
+            self._slots.release()
+
+    def _discard(self, job: Job) -> None:
+        """Forget a job that was never started, in memory and on disk."""
+        with self._lock:
+            self._jobs.pop(job.id, None)
+        try:
+            os.remove(os.path.join(JOB_STATE_DIR, f"{job.id}.json"))
+        except OSError:
+            pass
+
+    def _prune(self) -> None:
+        """Drop finished jobs older than the TTL from memory and disk."""
+        cutoff = time.time() - JOB_TTL_SECONDS
+        for job_id, job in list(self._jobs.items()):
+            if job.finished_at and job.finished_at < cutoff:
+                del self._jobs[job_id]
+        try:
+            for name in os.listdir(JOB_STATE_DIR):
+                path = os.path.join(JOB_STATE_DIR, name)
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+        except OSError:
+            pass
+
+
+_manager: Optional[JobManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> JobManager:
+    """Get the process-wide job manager, creating it on first use."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager()
+        return _manager
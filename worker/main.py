@@ -2,8 +2,10 @@ import os
 import sys
 import logging
 import requests
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from urllib.parse import urlparse
-from typing import Dict, Any
+from typing import Dict, Any, BinaryIO, Callable, Iterator, List
 
 logging.basicConfig(
     level=logging.INFO,
@@ -13,71 +15,210 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-from processors.pdf_extractor import extract_text_from_pdf
+from processors.pdf_extractor import PDF_EXTRACTION_MODE, PDF_TEXT_SPOOL_BYTES, extract_text_from_pdf, iter_text_from_pdf
 from processors.docx_extractor import extract as extract_docx
 from processors.pptx_extractor import extract as extract_pptx
 from processors.image_extractor import extract as extract_image
 from processors.text_extractor import extract as extract_text
-from processors.embeddings import generate_embeddings
-
-# Supabase configuration
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+from processors.embeddings import generate_embeddings, embed_chunks, embed_documents, chunk_text, iter_chunks
+from processors.search import get_search_index
+from processors.sources import FileSource, TextSpool
+from supabase_client import rest_request
+from extraction_cache import get_extraction_cache
+from jobs import report_progress, stage
+from outbound import CircuitOpen, propagate
+from metrics import CHARACTERS, DOWNLOADED_BYTES
+
+# Download configuration
+DOWNLOAD_SPOOL_THRESHOLD = int(os.getenv("DOWNLOAD_SPOOL_THRESHOLD_MB", "16")) * 1024 * 1024
+DOWNLOAD_MAX_BYTES = int(os.getenv("DOWNLOAD_MAX_MB", "250")) * 1024 * 1024
+DOWNLOAD_CONNECT_TIMEOUT = float(os.getenv("DOWNLOAD_CONNECT_TIMEOUT", "10"))
+DOWNLOAD_READ_TIMEOUT = float(os.getenv("DOWNLOAD_READ_TIMEOUT", "60"))
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Status for documents whose provider is temporarily unavailable; they are
+# retried (by the caller on 503, or by the consumer once its lease lapses)
+DEFERRED_STATUS = "QUEUED"
+
+# Batch endpoints: documents per request, and how many of them download/extract at once
+BATCH_MAX_DOCUMENTS = int(os.getenv("BATCH_MAX_DOCUMENTS", "100"))
+BATCH_EXTRACT_CONCURRENCY = int(os.getenv("BATCH_EXTRACT_CONCURRENCY", "4"))
+# Ids per in.(...) filter
+BATCH_FILTER_IDS = 100
 
 def supabase_request(method: str, endpoint: str, json_data: Dict = None) -> Dict:
     """Make authenticated request to Supabase REST API"""
-    headers = {
-        "apikey": SUPABASE_KEY,
-        "Authorization": f"Bearer {SUPABASE_KEY}",
-        "Content-Type": "application/json"
-    }
-
-    url = f"{SUPABASE_URL}/rest/v1/{endpoint}"
-    response = requests.request(method, url, headers=headers, json=json_data)
-    response.raise_for_status()
+    response = rest_request(method, endpoint, json_data)
 
     if response.text:
         return response.json()
     return {}
 
-def download_from_signed_url(storage_url: str) -> bytes:
-    """Download file from signed URL"""
-    response = requests.get(storage_url)
-    response.raise_for_status()
-    return response.content
+def set_status(document_id: str, status: str) -> None:
+    """Update a document's processing_status"""
+    with stage("status"):
+        supabase_request(
+            "PATCH",
+            f"documents?id=eq.{document_id}",
+            {"processing_status": status}
+        )
+
+def set_statuses(document_ids: List[str], status: str) -> None:
+    """Update processing_status of many documents with bulk in.(...) PATCHes"""
+    with stage("status"):
+        for i in range(0, len(document_ids), BATCH_FILTER_IDS):
+            batch = document_ids[i:i + BATCH_FILTER_IDS]
+            supabase_request(
+                "PATCH",
+                f"documents?id=in.({','.join(batch)})",
+                {"processing_status": status}
+            )
+
+def download_from_signed_url(storage_url: str, route: str = "") -> BinaryIO:
+    """
+    Stream file from signed URL into a spooled temporary file.
+
+    Small files stay in memory; anything past DOWNLOAD_SPOOL_THRESHOLD is
+    rolled over to disk so RSS stays flat regardless of file size.
+    The caller owns (and must close) the returned file.
+    """
+    with requests.get(
+        storage_url,
+        stream=True,
+        timeout=(DOWNLOAD_CONNECT_TIMEOUT, DOWNLOAD_READ_TIMEOUT),
+    ) as response:
+        response.raise_for_status()
+
+        content_length = int(response.headers.get("Content-Length") or 0)
+        if content_length > DOWNLOAD_MAX_BYTES:
+            raise ValueError(f"File is too large ({content_length} bytes, limit {DOWNLOAD_MAX_BYTES})")
+
+        spool = tempfile.SpooledTemporaryFile(max_size=DOWNLOAD_SPOOL_THRESHOLD)
+        try:
+            total = 0
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                total += len(chunk)
+                if total > DOWNLOAD_MAX_BYTES:
+                    raise ValueError(f"File exceeds download limit of {DOWNLOAD_MAX_BYTES} bytes")
+                spool.write(chunk)
+        except Exception:
+            spool.close()
+            raise
 
-def route_extraction(file_bytes: bytes, mime_type: str = None, filename: str = "") -> str:
+    logger.info(f"Downloaded {total} bytes")
+    DOWNLOADED_BYTES.inc(total, route=route)
+    spool.seek(0)
+    return spool
+
+def resolve_route(mime_type: str = None, filename: str = "") -> str:
+    """Pick the extractor route for a file from its mime type and extension."""
     mime = (mime_type or "").lower()
     ext = filename.rsplit(".", 1)[-1].lower() if filename and "." in filename else ""
 
     logger.info(f"Extractor routing: mime_type={mime or 'unknown'}, filename={filename or 'unknown'}, extension={ext or 'unknown'}")
 
     if mime == "application/pdf" or ext == "pdf":
-        return extract_text_from_pdf(file_bytes)
+        return "pdf"
 
     elif mime in (
         "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
         "application/msword",
     ) or ext in ("docx", "doc"):
-        return extract_docx(file_bytes)
+        return "docx"
 
     elif mime in (
         "application/vnd.openxmlformats-officedocument.presentationml.presentation",
         "application/vnd.ms-powerpoint",
     ) or ext in ("pptx", "ppt"):
-        return extract_pptx(file_bytes)
+        return "pptx"
 
     elif mime.startswith("image/") or ext in ("jpg", "jpeg", "png", "webp", "gif"):
-        return extract_image(file_bytes, mime_type or "image/jpeg")
+        return "image"
 
     elif mime in ("text/plain", "text/markdown") or ext in ("txt", "md"):
-        return extract_text(file_bytes)
+        return "text"
+
+    return "fallback"
+
+def route_extraction(file_data: FileSource, mime_type: str = None, filename: str = "", route: str = None) -> str:
+    route = route or resolve_route(mime_type, filename)
+
+    if route == "pdf":
+        return extract_text_from_pdf(file_data)
+
+    elif route == "docx":
+        return extract_docx(file_data)
+
+    elif route == "pptx":
+        return extract_pptx(file_data)
+
+    elif route == "image":
+        return extract_image(file_data, mime_type or "image/jpeg")
+
+    elif route == "text":
+        return extract_text(file_data)
 
     else:
         try:
-            return extract_text_from_pdf(file_bytes)
+            return extract_text_from_pdf(file_data)
         except Exception:
-            return extract_text(file_bytes)
+            return extract_text(file_data)
+
+def _cache_route(route: str, mime_type: str = None) -> str:
+    """Extraction cache route; image analysis also depends on the declared mime type, PDF text on the mode."""
+    if route == "image":
+        return f"{route}:{(mime_type or 'image/jpeg').lower()}"
+    if route == "pdf":
+        return f"{route}:{PDF_EXTRACTION_MODE}"
+    return route
+
+def _resolve_filename(storage_url: str, filename: str = None) -> str:
+    if filename:
+        return filename
+    parsed_path = urlparse(storage_url).path
+    return parsed_path.rsplit("/", 1)[-1] if parsed_path else ""
+
+def _document_route(row: Dict[str, Any]) -> str:
+    """Extractor route of a stored document, for labelling embed-side metrics ("" when unknown)."""
+    if not row.get("mime_type") and not row.get("title"):
+        return ""
+    return resolve_route(row.get("mime_type"), row.get("title") or "")
+
+def _store_extracted_text(document_id: str, extracted_text: str) -> None:
+    """Save extracted text and mark the document EXTRACTED."""
+    try:
+        supabase_request(
+            "PATCH",
+            f"documents?id=eq.{document_id}",
+            {
+                "extracted_text": extracted_text,
+                "processing_status": "EXTRACTED",
+                "error_message": None,
+            }
+        )
+    except Exception:
+        supabase_request(
+            "PATCH",
+            f"documents?id=eq.{document_id}",
+            {
+                "extracted_text": extracted_text,
+                "processing_status": "EXTRACTED"
+            }
+        )
+
+def _defer(document_id: str, e: CircuitOpen) -> Dict[str, Any]:
+    """A provider's breaker is open: put the document back in the queue instead of failing it."""
+    logger.warning(f"Deferring document {document_id}: {str(e)}")
+    try:
+        set_status(document_id, DEFERRED_STATUS)
+    except Exception:
+        pass
+
+    return {
+        "success": False,
+        "error": str(e),
+        "retryAfter": e.retry_after
+    }
 
 def _update_extraction_failed(document_id: str, error_message: str) -> None:
     # Try storing descriptive error message if supported by DB schema.
@@ -98,6 +239,38 @@ def _update_extraction_failed(document_id: str, error_message: str) -> None:
         {"processing_status": "EXTRACTION_FAILED"},
     )
 
+def _refresh_search_index(document_id: str) -> None:
+    """Fold a newly embedded document into this process's search index, if its owner is loaded."""
+    try:
+        get_search_index().refresh_document(document_id)
+    except Exception as e:
+        logger.warning(f"Search index refresh failed for {document_id}: {str(e)}")
+
+def _extract_and_store(document_id: str, storage_url: str, mime_type: str = None, filename: str = None) -> int:
+    """Download, extract and store one document's text; returns its length."""
+    resolved_filename = _resolve_filename(storage_url, filename)
+    route = resolve_route(mime_type, resolved_filename)
+
+    # Download file from signed URL
+    logger.info(f"Downloading file from signed URL")
+    with stage("download", route):
+        file_data = download_from_signed_url(storage_url, route)
+
+    # Extract text using format router, skipping files we've already parsed
+    with stage("extract", route), file_data:
+        extracted_text = get_extraction_cache().get_or_extract(
+            file_data,
+            _cache_route(route, mime_type),
+            lambda: route_extraction(file_data, mime_type=mime_type, filename=resolved_filename, route=route),
+        )
+    logger.info(f"Extracted {len(extracted_text)} characters")
+    CHARACTERS.inc(len(extracted_text), route=route)
+
+    # Update document with extracted text
+    with stage("store"):
+        _store_extracted_text(document_id, extracted_text)
+    return len(extracted_text)
+
 def extract_document_text(document_id: str, storage_url: str, mime_type: str = None, filename: str = None) -> Dict[str, Any]:
     """Extract text from uploaded files (PDF/DOCX/PPTX/image/text)."""
     try:
@@ -111,53 +284,18 @@ def extract_document_text(document_id: str, storage_url: str, mime_type: str = N
         logger.info(f"Starting text extraction for document {document_id}")
 
         # Update status to EXTRACTING
-        supabase_request(
-            "PATCH",
-            f"documents?id=eq.{document_id}",
-            {"processing_status": "EXTRACTING"}
-        )
-
-        # Download file from signed URL
-        logger.info(f"Downloading file from signed URL")
-        file_data = download_from_signed_url(storage_url)
-
-        resolved_filename = filename
-        if not resolved_filename:
-            parsed_path = urlparse(storage_url).path
-            resolved_filename = parsed_path.rsplit("/", 1)[-1] if parsed_path else ""
-
-        # Extract text using format router
-        extracted_text = route_extraction(file_data, mime_type=mime_type, filename=resolved_filename)
-        logger.info(f"Extracted {len(extracted_text)} characters")
-
-        # Update document with extracted text
-        try:
-            supabase_request(
-                "PATCH",
-                f"documents?id=eq.{document_id}",
-                {
-                    "extracted_text": extracted_text,
-                    "processing_status": "EXTRACTED",
-                    "error_message": None,
-                }
-            )
-        except Exception:
-            supabase_request(
-                "PATCH",
-                f"documents?id=eq.{document_id}",
-                {
-                    "extracted_text": extracted_text,
-                    "processing_status": "EXTRACTED"
-                }
-            )
+        set_status(document_id, "EXTRACTING")
 
+        text_length = _extract_and_store(document_id, storage_url, mime_type, filename)
 
         return {
             "success": True,
-            "textLength": len(extracted_text),
+            "textLength": text_length,
             "message": "Text extraction completed"
         }
 
+    except CircuitOpen as e:
+        return _defer(document_id, e)
     except Exception as e:
         logger.error(f"Text extraction failed for {document_id}: {str(e)}", exc_info=True)
 
@@ -172,7 +310,7 @@ def extract_document_text(document_id: str, storage_url: str, mime_type: str = N
             "error": str(e)
         }
 
-def generate_document_embeddings(document_id: str) -> Dict[str, Any]:
+def generate_document_embeddings(document_id: str, incremental: bool = None) -> Dict[str, Any]:
     """Generate embeddings for document chunks"""
     try:
         # Trim any whitespace from document_id
@@ -185,33 +323,29 @@ def generate_document_embeddings(document_id: str) -> Dict[str, Any]:
         logger.info(f"Starting embedding generation for document {document_id}")
 
         # Update status
-        supabase_request(
-            "PATCH",
-            f"documents?id=eq.{document_id}",
-            {"processing_status": "EMBEDDING"}
-        )
+        set_status(document_id, "EMBEDDING")
 
         # Get document text
-        doc = supabase_request(
-            "GET",
-            f"documents?id=eq.{document_id}&select=extracted_text"
-        )
+        with stage("fetch"):
+            doc = supabase_request(
+                "GET",
+                f"documents?id=eq.{document_id}&select=extracted_text,mime_type,title"
+            )
 
         if not doc or not doc[0].get("extracted_text"):
             raise Exception("No extracted text found")
 
         text = doc[0]["extracted_text"]
+        route = _document_route(doc[0])
 
         # Generate embeddings and store
-        num_chunks = generate_embeddings(document_id, text)
+        with stage("embed", route):
+            num_chunks = generate_embeddings(document_id, text, incremental=incremental, route=route)
         logger.info(f"Generated embeddings for {num_chunks} chunks")
 
         # Update status to READY
-        supabase_request(
-            "PATCH",
-            f"documents?id=eq.{document_id}",
-            {"processing_status": "READY"}
-        )
+        set_status(document_id, "READY")
+        _refresh_search_index(document_id)
 
         return {
             "success": True,
@@ -219,19 +353,268 @@ def generate_document_embeddings(document_id: str) -> Dict[str, Any]:
             "message": "Embeddings generated successfully"
         }
 
+    except CircuitOpen as e:
+        return _defer(document_id, e)
     except Exception as e:
         logger.error(f"Embedding generation failed for {document_id}: {str(e)}", exc_info=True)
 
         try:
-            supabase_request(
-                "PATCH",
-                f"documents?id=eq.{document_id}",
-                {"processing_status": "EMBEDDING_FAILED"}
-            )
+            set_status(document_id, "EMBEDDING_FAILED")
         except:
             pass
 
         return {
             "success": False,
             "error": str(e)
-        }
\ No newline at end of file
+        }
+
+def _batch_result(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Per-document results of a batch call, with overall success only when every document succeeded."""
+    failed = sum(1 for result in results if not result["success"])
+    summary = {
+        "success": failed == 0,
+        "succeeded": len(results) - failed,
+        "failed": failed,
+        "results": results,
+    }
+    if failed:
+        summary["error"] = f"{failed} of {len(results)} documents failed"
+    return summary
+
+def extract_documents_text(documents: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Extract many documents: one bulk EXTRACTING update, then download, extract
+    and store up to BATCH_EXTRACT_CONCURRENCY documents at a time.
+
+    Each document is a dict with documentId, storageUrl, mimeType and filename.
+    A failing document is marked EXTRACTION_FAILED without affecting the rest;
+    one whose provider's circuit is open goes back to DEFERRED_STATUS.
+    """
+    document_ids = [document["documentId"] for document in documents]
+    logger.info(f"Starting batch text extraction for {len(document_ids)} documents")
+    try:
+        set_statuses(document_ids, "EXTRACTING")
+    except Exception as e:
+        logger.error(f"Batch extraction could not start: {str(e)}", exc_info=True)
+        return _batch_result([{"documentId": document_id, "success": False, "error": str(e)} for document_id in document_ids])
+
+    def extract_one(document: Dict[str, Any]) -> Dict[str, Any]:
+        document_id = document["documentId"]
+        try:
+            text_length = _extract_and_store(document_id, document["storageUrl"], document.get("mimeType"), document.get("filename"))
+            return {"documentId": document_id, "success": True, "textLength": text_length}
+        except CircuitOpen as e:
+            return dict(_defer(document_id, e), documentId=document_id)
+        except Exception as e:
+            logger.error(f"Text extraction failed for {document_id}: {str(e)}", exc_info=True)
+            try:
+                _update_extraction_failed(document_id, str(e))
+            except Exception:
+                pass
+            return {"documentId": document_id, "success": False, "error": str(e)}
+
+    results: List[Dict[str, Any]] = [None] * len(documents)
+    workers = max(1, min(BATCH_EXTRACT_CONCURRENCY, len(documents)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch-extract") as pool:
+        extract_one = propagate(extract_one)
+        futures = {pool.submit(extract_one, document): i for i, document in enumerate(documents)}
+        for done, future in enumerate(as_completed(futures), 1):
+            results[futures[future]] = future.result()
+            report_progress(done, len(documents), "documents")
+
+    return _batch_result(results)
+
+def generate_documents_embeddings(document_ids: List[str], incremental: bool = None) -> Dict[str, Any]:
+    """
+    Embed many documents in one pass.
+
+    Status updates and the extracted_text fetch are bulk in.(...) requests, and
+    chunks from all documents share one embedding pipeline, so small documents
+    fill Voyage batches together. A document without text fails on its own; an
+    embedding failure fails every document still being embedded.
+    """
+    logger.info(f"Starting batch embedding generation for {len(document_ids)} documents")
+    errors: Dict[str, str] = {}
+    counts: Dict[str, int] = {}
+    try:
+        set_statuses(document_ids, "EMBEDDING")
+
+        with stage("fetch"):
+            texts: Dict[str, str] = {}
+            routes: Dict[str, str] = {}
+            for i in range(0, len(document_ids), BATCH_FILTER_IDS):
+                batch = document_ids[i:i + BATCH_FILTER_IDS]
+                for row in supabase_request("GET", f"documents?id=in.({','.join(batch)})&select=id,extracted_text,mime_type,title"):
+                    texts[row["id"]] = row.get("extracted_text")
+                    routes[row["id"]] = _document_route(row)
+
+        chunks_by_document = {}
+        for document_id in document_ids:
+            text = texts.pop(document_id, None)
+            if text:
+                chunks_by_document[document_id] = chunk_text(text, route=routes[document_id])
+            else:
+                errors[document_id] = "No extracted text found"
+        del texts
+
+        if chunks_by_document:
+            # Embed calls are shared across documents; label them by route only when there is one
+            batch_routes = {routes[document_id] for document_id in chunks_by_document}
+            route = batch_routes.pop() if len(batch_routes) == 1 else "mixed"
+            with stage("embed", route):
+                counts = embed_documents(chunks_by_document, incremental=incremental, route=route)
+            logger.info(f"Generated embeddings for {sum(counts.values())} chunks across {len(counts)} documents")
+
+    except Exception as e:
+        logger.error(f"Batch embedding generation failed: {str(e)}", exc_info=True)
+        errors.update({document_id: str(e) for document_id in document_ids if document_id not in errors})
+        counts = {}
+
+    try:
+        set_statuses([document_id for document_id in document_ids if document_id in counts], "READY")
+    except Exception as e:
+        logger.error(f"Marking batch READY failed: {str(e)}")
+        errors.update({document_id: str(e) for document_id in counts})
+        counts = {}
+    try:
+        set_statuses(list(errors), "EMBEDDING_FAILED")
+    except Exception:
+        pass
+    for document_id in counts:
+        _refresh_search_index(document_id)
+
+    return _batch_result([
+        {"documentId": document_id, "success": True, "numChunks": counts[document_id]}
+        if document_id in counts else
+        {"documentId": document_id, "success": False, "error": errors[document_id]}
+        for document_id in document_ids
+    ])
+
+class _OrderedWriter:
+    """Runs Supabase writes one at a time, in submission order, off the calling thread."""
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="writer")
+        self._futures = []
+
+    def submit(self, fn: Callable, *args) -> None:
+        self._futures.append(self._executor.submit(fn, *args))
+
+    def wait(self) -> None:
+        """Block until every queued write is done; re-raise the first failure."""
+        try:
+            for future in self._futures:
+                future.result()
+        finally:
+            self._executor.shutdown(wait=True)
+
+def process_document(
+    document_id: str,
+    storage_url: str,
+    mime_type: str = None,
+    filename: str = None,
+    incremental: bool = None,
+) -> Dict[str, Any]:
+    """
+    Download, extract, chunk, embed and store a document in one pass.
+
+    Chunks stream into embedding while pages are still being extracted, and
+    the extracted_text write happens in the background instead of being
+    round-tripped through Supabase. Status transitions match /extract then
+    /embed: EXTRACTING -> EXTRACTED -> EMBEDDING -> READY.
+    """
+    writer = _OrderedWriter()
+    phase = "extract"
+    try:
+        # Trim any whitespace from document_id
+        document_id = document_id.strip() if document_id else None
+
+        if not document_id:
+            raise ValueError('Document ID is required')
+
+        logger.info(f"Processing document: {document_id}")
+        writer.submit(set_status, document_id, "EXTRACTING")
+
+        resolved_filename = _resolve_filename(storage_url, filename)
+        route = resolve_route(mime_type, resolved_filename)
+
+        # Download file from signed URL
+        with stage("download", route):
+            file_data = download_from_signed_url(storage_url, route)
+        cache = get_extraction_cache()
+        spool = TextSpool(PDF_TEXT_SPOOL_BYTES)
+
+        def extracted_pieces() -> Iterator[str]:
+            nonlocal phase
+            try:
+                cache_key = cache.key_for(file_data, _cache_route(route, mime_type))
+                cached = cache.get(cache_key) if cache_key else None
+
+                if cached is not None:
+                    pieces = [cached]
+                elif route == "pdf":
+                    pieces = iter_text_from_pdf(file_data)
+                else:
+                    pieces = [route_extraction(file_data, mime_type=mime_type, filename=resolved_filename, route=route)]
+
+                for piece in pieces:
+                    spool.write(piece)
+                    yield piece
+
+                extracted_text = spool.getvalue()
+                spool.close()
+                logger.info(f"Extracted {len(extracted_text)} characters")
+                CHARACTERS.inc(len(extracted_text), route=route)
+                if cache_key and cached is None:
+                    cache.put(cache_key, extracted_text)
+
+                # Extraction is complete; store text and move on while chunks keep embedding
+                writer.submit(_store_extracted_text, document_id, extracted_text)
+                writer.submit(set_status, document_id, "EMBEDDING")
+            except Exception:
+                # Failures raised here are extraction failures; anything else in
+                # extract_embed comes from the embedding side
+                phase = "extract"
+                raise
+
+        # Embedding runs while pages are still being extracted; extracted_pieces
+        # sets phase back to "extract" if the failure came from its side
+        phase = "embed"
+        with stage("extract_embed", route), file_data, spool:
+            num_chunks = embed_chunks(document_id, iter_chunks(extracted_pieces(), route=route), incremental=incremental, route=route)
+        logger.info(f"Generated embeddings for {num_chunks} chunks")
+
+        writer.submit(set_status, document_id, "READY")
+        writer.wait()
+        _refresh_search_index(document_id)
+
+        return {
+            "success": True,
+            "textLength": spool.length,
+            "numChunks": num_chunks,
+            "message": "Document processed successfully"
+        }
+
+    except Exception as e:
+        logger.error(f"Document processing failed for {document_id} during {phase}: {str(e)}", exc_info=True)
+
+        # Let queued writes land first so the failure status is the last write
+        try:
+            writer.wait()
+        except Exception:
+            pass
+
+        if isinstance(e, CircuitOpen):
+            return _defer(document_id, e)
+        try:
+            if phase == "extract":
+                _update_extraction_failed(document_id, str(e))
+            else:
+                set_status(document_id, "EMBEDDING_FAILED")
+        except Exception:
+            pass
+
+        return {
+            "success": False,
+            "error": str(e)
+        }
@@ -0,0 +1,259 @@
+"""Prometheus-format metrics for per-stage latency and throughput."""
+import os
+import json
+import time
+import logging
+import tempfile
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Each process periodically snapshots its metrics here; /metrics merges all live processes
+METRICS_DIR = os.getenv("WORKER_METRICS_DIR") or os.path.join(tempfile.gettempdir(), "manthan-worker-metrics")
+METRICS_FLUSH_INTERVAL = float(os.getenv("WORKER_METRICS_FLUSH_INTERVAL", "5"))
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+LabelValues = Tuple[str, ...]
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, object] = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def snapshot(self) -> List:
+        with self._lock:
+            return [[list(key), value if not isinstance(value, list) else list(value)] for key, value in self._values.items()]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        _ensure_flusher()
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        _ensure_flusher()
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track_inprogress(self, **labels: str):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    """Stored per label set as [bucket counts..., +Inf count, sum]."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels: str) -> None:
+        _ensure_flusher()
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 2)
+            state[index] += 1
+            state[-1] += value
+
+    @contextmanager
+    def time(self, **labels: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+
+_registry: List[_Metric] = []
+
+# Pipeline metrics
+STAGE_SECONDS = Histogram("manthan_worker_stage_seconds", "Time spent per pipeline stage", ["stage", "route"])
+STAGE_INFLIGHT = Gauge("manthan_worker_stage_inflight", "Pipeline stages currently running", ["stage"])
+REQUESTS_INFLIGHT = Gauge("manthan_worker_requests_inflight", "HTTP requests currently being handled", ["endpoint"])
+DOWNLOADED_BYTES = Counter("manthan_worker_downloaded_bytes_total", "Bytes downloaded from storage", ["route"])
+PAGES = Counter("manthan_worker_pages_total", "PDF pages / slides processed", ["route"])
+CHARACTERS = Counter("manthan_worker_extracted_characters_total", "Characters of text extracted", ["route"])
+PDF_PAGE_TIERS = Counter("manthan_worker_pdf_page_tiers_total", "PDF pages by the extraction tier that produced them", ["tier", "reason"])
+CHUNKS = Counter("manthan_worker_chunks_total", "Chunks produced, by whether they were embedded or reused", ["outcome"])
+ADMISSION_WAIT_SECONDS = Histogram("manthan_worker_admission_wait_seconds", "Time requests waited for admission", ["endpoint"])
+ADMISSION_REJECTIONS = Counter("manthan_worker_admission_rejections_total", "Requests refused with 429 by admission control", ["endpoint", "reason"])
+OUTBOUND_CALLS = Counter("manthan_worker_outbound_calls_total", "Provider calls by outcome (ok, retry, error, rejected, deadline, hedged)", ["provider", "outcome"])
+OUTBOUND_SECONDS = Histogram("manthan_worker_outbound_seconds", "Latency of provider call attempts, including hedges", ["provider"])
+
+
+# --- Cross-process aggregation -------------------------------------------------
+
+_flusher_started = False
+_flusher_lock = threading.Lock()
+
+
+def _snapshot_path(pid: int) -> str:
+    return os.path.join(METRICS_DIR, f"{pid}.json")
+
+
+def _snapshot() -> Dict[str, List]:
+    return {metric.name: metric.snapshot() for metric in _registry}
+
+
+def _flush() -> None:
+    try:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        path = _snapshot_path(os.getpid())
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(_snapshot(), f)
+        os.replace(f"{path}.tmp", path)
+    except OSError as e:
+        logger.warning(f"Failed to write metrics snapshot: {str(e)}")
+
+
+def _flush_loop() -> None:
+    while True:
+        time.sleep(METRICS_FLUSH_INTERVAL)
+        _flush()
+
+
+def _ensure_flusher() -> None:
+    global _flusher_started
+    if _flusher_started:
+        return
+    with _flusher_lock:
+        if not _flusher_started:
+            threading.Thread(target=_flush_loop, name="metrics-flush", daemon=True).start()
+            _flusher_started = True
+
+
+def _after_fork_in_child() -> None:
+    # Children start from zero; the parent's counts stay in the parent's snapshot
+    global _flusher_started, _flusher_lock
+    _flusher_started = False
+    _flusher_lock = threading.Lock()
+    for metric in _registry:
+        metric._lock = threading.Lock()
+        metric.reset()
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+
+def _merged() -> Dict[str, Dict[LabelValues, object]]:
+    """This process's live values plus the latest snapshots of other live processes."""
+    merged: Dict[str, Dict[LabelValues, object]] = {}
+    snapshots = [_snapshot()]
+
+    try:
+        for name in os.listdir(METRICS_DIR):
+            if not name.endswith(".json"):
+                continue
+            pid = int(name[:-5])
+            if pid == os.getpid():
+                continue
+            if not _pid_alive(pid):
+                try:
+                    os.remove(os.path.join(METRICS_DIR, name))
+                except OSError:
+                    pass
+                continue
+            with open(os.path.join(METRICS_DIR, name)) as f:
+                snapshots.append(json.load(f))
+    except (OSError, ValueError):
+        pass
+
+    for snapshot in snapshots:
+        for metric_name, samples in snapshot.items():
+            values = merged.setdefault(metric_name, {})
+            for labels, value in samples:
+                key = tuple(labels)
+                if isinstance(value, list):
+                    current = values.get(key)
+                    values[key] = value if current is None else [a + b for a, b in zip(current, value)]
+                else:
+                    values[key] = values.get(key, 0) + value
+    return merged
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [(name, value) for name, value in zip(names, values) if value != ""]
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render() -> str:
+    """Render all metrics in the Prometheus text exposition format."""
+    merged = _merged()
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for key, value in sorted(merged.get(metric.name, {}).items()):
+            if isinstance(metric, Histogram):
+                cumulative = 0
+                for bound, count in zip(metric.buckets, value):
+                    cumulative += count
+                    lines.append(f"{metric.name}_bucket{_format_labels(metric.labelnames, key, ('le', repr(float(bound))))} {cumulative}")
+                cumulative += value[len(metric.buckets)]
+                lines.append(f"{metric.name}_bucket{_format_labels(metric.labelnames, key, ('le', '+Inf'))} {cumulative}")
+                lines.append(f"{metric.name}_sum{_format_labels(metric.labelnames, key)} {_format_value(value[-1])}")
+                lines.append(f"{metric.name}_count{_format_labels(metric.labelnames, key)} {cumulative}")
+            else:
+                lines.append(f"{metric.name}{_format_labels(metric.labelnames, key)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,306 @@
+"""
+Outbound calls to model providers (Voyage, Anthropic).
+
+Every call runs under the current deadline (set per job or request and
+carried into pool threads), is retried with backoff on rate limits, 5xx
+and transport errors, can be hedged with a duplicate request when it is
+slow, and goes through a per-provider circuit breaker that fails fast
+while the provider is down.
+"""
+import os
+import time
+import random
+import logging
+import threading
+import contextvars
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple, TypeVar
+
+from metrics import OUTBOUND_CALLS, OUTBOUND_SECONDS
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Total budget for provider calls made by one synchronous request (under gunicorn's 300s timeout)
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "270"))
+OUTBOUND_MAX_RETRIES = int(os.getenv("OUTBOUND_MAX_RETRIES", "3"))
+OUTBOUND_BACKOFF_BASE = float(os.getenv("OUTBOUND_BACKOFF_BASE", "0.5"))
+OUTBOUND_BACKOFF_MAX = float(os.getenv("OUTBOUND_BACKOFF_MAX", "10"))
+# Consecutive failures that open a provider's breaker, and how long it stays open
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+HEDGE_POOL_SIZE = int(os.getenv("OUTBOUND_HEDGE_POOL_SIZE", "8"))
+
+# Per-attempt timeout and hedge delay per provider (VOYAGE_TIMEOUT_SECONDS, ANTHROPIC_HEDGE_AFTER_SECONDS, ...).
+# A hedge re-sends the request once the first attempt has taken this long; 0 disables.
+PROVIDER_DEFAULTS = {
+    "voyage": {"timeout": 30.0, "hedge_after": 0.0},
+    "anthropic": {"timeout": 90.0, "hedge_after": 0.0},
+}
+
+# Worth retrying: rate limits, overload (Anthropic's 529) and server errors
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504, 529}
+# Client libraries whose status-less errors are timeouts or connection failures
+TRANSPORT_ERROR_PACKAGES = {"voyageai", "anthropic", "requests", "httpx", "urllib3"}
+
+_deadline: ContextVar[Optional[float]] = ContextVar("outbound_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """Raised when the deadline leaves no time for another provider call."""
+
+
+class CircuitOpen(Exception):
+    """Raised without calling the provider while its breaker is open."""
+
+    def __init__(self, provider: str, retry_after: int):
+        super().__init__(f"{provider} is unavailable (circuit open); retry after {retry_after}s")
+        self.provider = provider
+        self.retry_after = retry_after
+
+
+def set_deadline(seconds: float) -> contextvars.Token:
+    """Start a deadline `seconds` from now (never later than the current one); pass the token to reset_deadline."""
+    expires = time.monotonic() + seconds
+    current = _deadline.get()
+    return _deadline.set(expires if current is None else min(current, expires))
+
+
+def reset_deadline(token: contextvars.Token) -> None:
+    _deadline.reset(token)
+
+
+@contextmanager
+def deadline(seconds: Optional[float]) -> Iterator[None]:
+    """Bound provider calls in the block to `seconds` from now; a nested deadline can only tighten it."""
+    if seconds is None or seconds <= 0:
+        yield
+        return
+    token = set_deadline(seconds)
+    try:
+        yield
+    finally:
+        reset_deadline(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left on the current deadline, or None when there is none."""
+    expires = _deadline.get()
+    return None if expires is None else expires - time.monotonic()
+
+
+def propagate(fn: Callable[..., T]) -> Callable[..., T]:
+    """Wrap fn to run under the caller's deadline on another thread (pool threads don't inherit context)."""
+    expires = _deadline.get()
+
+    def run(*args, **kwargs):
+        token = _deadline.set(expires)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _deadline.reset(token)
+    return run
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures; once the reset time passes, one probe call decides whether it closes."""
+
+    def __init__(self, provider: str, threshold: int = BREAKER_FAILURE_THRESHOLD, reset_seconds: float = BREAKER_RESET_SECONDS):
+        self.provider = provider
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.calls = 0
+        self.failures = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def allow(self) -> None:
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = "half_open"
+                self.probing = False
+            if self.state == "closed" or (self.state == "half_open" and not self.probing):
+                self.probing = self.state == "half_open"
+                self.calls += 1
+                return
+            self.rejected += 1
+            retry_after = max(1, int(self.reset_seconds - (time.monotonic() - self.opened_at)) + 1)
+        OUTBOUND_CALLS.inc(provider=self.provider, outcome="rejected")
+        raise CircuitOpen(self.provider, retry_after)
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != "closed":
+                logger.info(f"{self.provider} circuit closed")
+            self.state = "closed"
+            self.consecutive_failures = 0
+            self.probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self.consecutive_failures += 1
+            self.probing = False
+            if self.state == "half_open" or (self.state == "closed" and self.consecutive_failures >= self.threshold):
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                logger.warning(f"{self.provider} circuit opened after {self.consecutive_failures} consecutive failures")
+
+    def release(self) -> None:
+        """A probe ended without telling us anything (e.g. a 400); let the next call probe."""
+        with self._lock:
+            self.probing = False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = {
+                "state": self.state,
+                "consecutiveFailures": self.consecutive_failures,
+                "calls": self.calls,
+                "failures": self.failures,
+                "rejected": self.rejected,
+            }
+            if self.state == "open":
+                stats["retryIn"] = round(max(0.0, self.reset_seconds - (time.monotonic() - self.opened_at)), 1)
+            return stats
+
+
+class Provider:
+    def __init__(self, name: str, timeout: float, hedge_after: float):
+        self.name = name
+        self.timeout = float(os.getenv(f"{name.upper()}_TIMEOUT_SECONDS", str(timeout)))
+        self.hedge_after = float(os.getenv(f"{name.upper()}_HEDGE_AFTER_SECONDS", str(hedge_after)))
+        self.breaker = CircuitBreaker(name)
+        self.hedges = 0
+        self.hedge_wins = 0
+
+
+_providers = {name: Provider(name, **defaults) for name, defaults in PROVIDER_DEFAULTS.items()}
+_hedge_pool: Optional[ThreadPoolExecutor] = None
+_hedge_pool_lock = threading.Lock()
+
+
+def _get_hedge_pool() -> ThreadPoolExecutor:
+    global _hedge_pool
+    with _hedge_pool_lock:
+        if _hedge_pool is None:
+            _hedge_pool = ThreadPoolExecutor(max_workers=HEDGE_POOL_SIZE, thread_name_prefix="hedge")
+        return _hedge_pool
+
+
+def _classify(exc: BaseException) -> Tuple[bool, bool, Optional[float]]:
+    """(retryable, counts against the breaker, Retry-After seconds) for a failed call."""
+    status = getattr(exc, "status_code", None) or getattr(exc, "http_status", None)
+    if status is None:
+        transport = (
+            isinstance(exc, (TimeoutError, ConnectionError))
+            or type(exc).__module__.split(".")[0] in TRANSPORT_ERROR_PACKAGES
+        )
+        return transport, transport, None
+
+    headers = getattr(exc, "headers", None) or getattr(getattr(exc, "response", None), "headers", None) or {}
+    retry_after = None
+    try:
+        retry_after = float(headers.get("retry-after") or headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        pass
+    # 429 means the provider is up but busy; it is retried without opening the breaker
+    return status in RETRY_STATUSES, status in RETRY_STATUSES and status != 429, retry_after
+
+
+def _attempt(provider: Provider, fn: Callable[[float], T], timeout: float) -> T:
+    """One call, plus a duplicate if the first is still running after hedge_after; the first success wins."""
+    if not provider.hedge_after or provider.hedge_after >= timeout:
+        return fn(timeout)
+
+    pool = _get_hedge_pool()
+    started = time.monotonic()
+    primary = pool.submit(fn, timeout)
+    done, _ = wait([primary], timeout=provider.hedge_after)
+    if done:
+        return primary.result()
+
+    provider.hedges += 1
+    OUTBOUND_CALLS.inc(provider=provider.name, outcome="hedged")
+    hedge = pool.submit(fn, max(0.1, timeout - (time.monotonic() - started)))
+    pending = {primary, hedge}
+    error: Optional[BaseException] = None
+    while pending:
+        done, pending = wait(pending, timeout=max(0.0, timeout - (time.monotonic() - started)), return_when=FIRST_COMPLETED)
+        if not done:
+            raise TimeoutError(f"{provider.name} call timed out after {timeout:.1f}s")
+        for future in done:
+            if future.exception() is None:
+                if future is hedge:
+                    provider.hedge_wins += 1
+                # The slower request is left to finish in the background; its result is dropped
+                return future.result()
+            error = future.exception()
+    raise error
+
+
+def call(provider_name: str, fn: Callable[[float], T]) -> T:
+    """
+    Call a provider: fn(timeout) makes one request with that timeout in seconds.
+
+    Retries retryable failures with full-jitter backoff (or the provider's
+    Retry-After) while the deadline allows; raises CircuitOpen without
+    calling when the breaker is open and DeadlineExceeded when no time is left.
+    """
+    provider = _providers[provider_name]
+    attempt = 0
+    while True:
+        left = remaining()
+        if left is not None and left <= 0:
+            OUTBOUND_CALLS.inc(provider=provider.name, outcome="deadline")
+            raise DeadlineExceeded(f"Deadline exceeded before {provider.name} call")
+        timeout = provider.timeout if left is None else min(provider.timeout, left)
+
+        provider.breaker.allow()
+        started = time.perf_counter()
+        try:
+            result = _attempt(provider, fn, timeout)
+        except Exception as e:
+            OUTBOUND_SECONDS.observe(time.perf_counter() - started, provider=provider.name)
+            retryable, failure, retry_after = _classify(e)
+            if failure:
+                provider.breaker.record_failure()
+            else:
+                provider.breaker.release()
+            if not retryable or attempt >= OUTBOUND_MAX_RETRIES:
+                OUTBOUND_CALLS.inc(provider=provider.name, outcome="error")
+                raise
+
+            delay = retry_after if retry_after is not None else random.uniform(
+                0, min(OUTBOUND_BACKOFF_MAX, OUTBOUND_BACKOFF_BASE * (2 ** attempt))
+            )
+            delay = min(delay, OUTBOUND_BACKOFF_MAX)
+            left = remaining()
+            if left is not None and delay >= left:
+                OUTBOUND_CALLS.inc(provider=provider.name, outcome="error")
+                raise
+            OUTBOUND_CALLS.inc(provider=provider.name, outcome="retry")
+            attempt += 1
+            logger.warning(f"{provider.name} call failed ({type(e).__name__}: {str(e)[:200]}), retry {attempt} in {delay:.2f}s")
+            time.sleep(delay)
+            continue
+
+        OUTBOUND_SECONDS.observe(time.perf_counter() - started, provider=provider.name)
+        OUTBOUND_CALLS.inc(provider=provider.name, outcome="ok")
+        provider.breaker.record_success()
+        return result
+
+
+def stats() -> Dict[str, Any]:
+    """Breaker state and hedging counts per provider (this worker process only)."""
+    return {
+        name: dict(provider.breaker.stats(), hedges=provider.hedges, hedgeWins=provider.hedge_wins)
+        for name, provider in _providers.items()
+    }
@@ -1 +1,12 @@
-"""Processing modules for document handling."""
\ No newline at end of file
+"""Processing modules for document handling."""
+
+# Bump a route's version whenever its extractor output changes so cached
+# extractions (keyed on file hash + route + version) are not reused.
+EXTRACTOR_VERSIONS = {
+    "pdf": 3,
+    "docx": 3,
+    "pptx": 2,
+    "image": 2,
+    "text": 1,
+    "fallback": 1,
+}
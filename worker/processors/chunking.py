@@ -0,0 +1,252 @@
+"""
+Structure-aware chunking of extracted text.
+
+Chunks end on the boundaries the extractors mark: pages ("[Page n/total]"),
+slides ("Slide n:"), headings ("## ...") and paragraphs, falling back to
+lines, sentences and finally words when a block is too long. Sizes are
+estimated in tokens, and page / slide / heading context goes into each
+chunk's metadata instead of its text.
+"""
+import os
+import re
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from metrics import STAGE_SECONDS
+from processors.embedding_pipeline import CHARS_PER_TOKEN, estimate_tokens
+
+# Chunks stay under CHUNK_MAX_TOKENS; a page or slide shorter than
+# CHUNK_MIN_TOKENS is merged with the next one rather than becoming its own chunk
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "512"))
+CHUNK_MIN_TOKENS = int(os.getenv("CHUNK_MIN_TOKENS", "160"))
+# When a long passage has to be split mid-paragraph, repeat up to this many
+# tokens of trailing lines/sentences at the start of the next chunk
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "64"))
+
+_PAGE_MARKER = re.compile(r"\[Page (\d+)/(\d+)\]")
+_SLIDE_MARKER = re.compile(r"Slide (\d+):")
+_HEADING = re.compile(r"## (.+)")
+# Sentence ends: Latin and Devanagari terminators (danda, double danda), then whitespace
+_SENTENCE_END = re.compile(r"(?<=[.!?।॥…])[\"'”’)\]]*\s+")
+
+
+class _Unit:
+    """A piece of text that is never split further: a line, a sentence or a word run."""
+
+    __slots__ = ("text", "start", "separator", "tokens")
+
+    def __init__(self, text: str, start: int, separator: str):
+        self.text = text
+        self.start = start
+        # Joiner to the previous unit in the same chunk: paragraph, line or in-line break
+        self.separator = separator
+        self.tokens = estimate_tokens(text)
+
+
+class _Chunker:
+    def __init__(self, max_tokens: int, min_tokens: int, overlap_tokens: int):
+        self.max_tokens = max_tokens
+        self.min_tokens = min_tokens
+        self.overlap_tokens = overlap_tokens
+        self.units: List[_Unit] = []
+        self.tokens = 0
+        self.index = 0
+        self.page: Optional[int] = None
+        self.slide: Optional[int] = None
+        self.heading: Optional[str] = None
+        # Context of the chunk being built (where its first unit came from)
+        self.context: Dict[str, Any] = {}
+        self.spans: Dict[str, int] = {}
+
+    def _start_context(self) -> None:
+        self.context = {"page": self.page, "slide": self.slide, "heading": self.heading}
+
+    def add(self, unit: _Unit) -> Iterator[Dict[str, Any]]:
+        if self.units and self.tokens + unit.tokens > self.max_tokens:
+            yield from self.flush(overlap=unit.separator != "\n\n")
+        if not self.units:
+            self._start_context()
+        self.units.append(unit)
+        self.tokens += unit.tokens
+        if self.page is not None:
+            self.spans["page"] = self.page
+        if self.slide is not None:
+            self.spans["slide"] = self.slide
+
+    def flush(self, overlap: bool = False) -> Iterator[Dict[str, Any]]:
+        """Emit the current chunk; with overlap, seed the next one with its trailing units."""
+        if not self.units:
+            return
+        yield self._make_chunk()
+
+        carried: List[_Unit] = []
+        if overlap and self.overlap_tokens > 0:
+            budget = self.overlap_tokens
+            for unit in reversed(self.units[1:]):
+                if unit.tokens > budget:
+                    break
+                carried.insert(0, unit)
+                budget -= unit.tokens
+        self.units = carried
+        self.tokens = sum(unit.tokens for unit in carried)
+        self.spans = {}
+        if carried:
+            self._start_context()
+
+    def _make_chunk(self) -> Dict[str, Any]:
+        text = self.units[0].text + "".join(unit.separator + unit.text for unit in self.units[1:])
+        last = self.units[-1]
+        metadata: Dict[str, Any] = {
+            "chunk_index": self.index,
+            "chunk_length": len(text),
+            "start_position": self.units[0].start,
+            "end_position": last.start + len(last.text),
+            "token_estimate": self.tokens,
+        }
+        for key in ("page", "slide"):
+            first = self.context.get(key)
+            if first is not None:
+                metadata[key] = first
+                if self.spans.get(key, first) != first:
+                    metadata[f"{key}_end"] = self.spans[key]
+        if self.context.get("heading"):
+            metadata["heading"] = self.context["heading"]
+        self.index += 1
+        return {"text": text, "metadata": metadata}
+
+    def boundary(self) -> Iterator[Dict[str, Any]]:
+        """A page or slide starts: end the chunk unless it is still too small to stand alone."""
+        if self.tokens >= self.min_tokens:
+            yield from self.flush()
+
+
+def _split_line(line: str, start: int, separator: str, max_tokens: int) -> Iterator[_Unit]:
+    """A line as one unit, or as sentences (then word runs) when it is too long."""
+    if estimate_tokens(line) <= max_tokens:
+        yield _Unit(line, start, separator)
+        return
+
+    max_chars = max(1, max_tokens * CHARS_PER_TOKEN)
+    position = 0
+    for match in list(_SENTENCE_END.finditer(line)) + [None]:
+        end = match.start() if match else len(line)
+        sentence = line[position:end]
+        if sentence:
+            if estimate_tokens(sentence) <= max_tokens:
+                yield _Unit(sentence, start + position, separator)
+            else:
+                # No usable sentence breaks: cut at the last space inside each window
+                offset = 0
+                while offset < len(sentence):
+                    piece = sentence[offset:offset + max_chars]
+                    if offset + max_chars < len(sentence) and " " in piece:
+                        piece = piece[:piece.rindex(" ")]
+                    yield _Unit(piece.strip(), start + position + offset, separator)
+                    offset += len(piece)
+                    while offset < len(sentence) and sentence[offset] == " ":
+                        offset += 1
+                    separator = " "
+            separator = " "
+        position = match.end() if match else len(line)
+
+
+def _iter_lines(pieces: Iterable[str]) -> Iterator[Tuple[str, int]]:
+    """Complete lines of the concatenated pieces, with their start offsets."""
+    buffer = ""
+    offset = 0
+    for piece in pieces:
+        buffer += piece
+        lines = buffer.split("\n")
+        buffer = lines.pop()
+        for line in lines:
+            yield line, offset
+            offset += len(line) + 1
+    if buffer:
+        yield buffer, offset
+
+
+def iter_structured_chunks(
+    pieces: Iterable[str],
+    max_tokens: int = CHUNK_MAX_TOKENS,
+    min_tokens: int = CHUNK_MIN_TOKENS,
+    overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+    route: str = "",
+) -> Iterator[Dict[str, Any]]:
+    """
+    Chunk streamed extractor output on its structural boundaries, as it arrives.
+
+    Yields {"text", "metadata"} dicts. Metadata carries chunk_index, character
+    positions in the full text, token_estimate, and page / page_end,
+    slide / slide_end and heading where the text has them.
+    """
+    chunker = _Chunker(max_tokens, min_tokens, overlap_tokens)
+    # Lines of the current paragraph, held back (up to max_tokens) so a paragraph
+    # that fits in one chunk isn't split across two
+    paragraph: List[_Unit] = []
+    paragraph_tokens = 0
+    separator = ""
+    # Time spent chunking only, excluding time the consumer or producer holds us suspended
+    elapsed = 0.0
+    started = time.perf_counter()
+
+    def timed(chunks: Iterator[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        nonlocal elapsed, started
+        for chunk in chunks:
+            elapsed += time.perf_counter() - started
+            yield chunk
+            started = time.perf_counter()
+
+    def end_paragraph() -> Iterator[Dict[str, Any]]:
+        nonlocal paragraph, paragraph_tokens
+        if paragraph and paragraph_tokens <= max_tokens and chunker.tokens + paragraph_tokens > max_tokens:
+            yield from chunker.flush()
+        for unit in paragraph:
+            yield from chunker.add(unit)
+        paragraph = []
+        paragraph_tokens = 0
+
+    for line, start in _iter_lines(pieces):
+        started = time.perf_counter()
+        try:
+            stripped = line.strip()
+            page = _PAGE_MARKER.fullmatch(stripped)
+            slide = _SLIDE_MARKER.fullmatch(stripped)
+            heading = _HEADING.fullmatch(stripped)
+
+            if not stripped or page or slide or heading:
+                yield from timed(end_paragraph())
+                separator = "\n\n"
+                if page or slide:
+                    yield from timed(chunker.boundary())
+                    if page:
+                        chunker.page = int(page.group(1))
+                    else:
+                        chunker.slide = int(slide.group(1))
+                    continue
+                if not heading:
+                    continue
+                # A new section always starts a new chunk, led by its heading
+                yield from timed(chunker.flush())
+                chunker.heading = stripped = heading.group(1).strip()
+
+            for unit in _split_line(stripped, start + max(0, line.find(stripped)), separator or "\n", max_tokens):
+                paragraph.append(unit)
+                paragraph_tokens += unit.tokens
+                if paragraph_tokens > max_tokens:
+                    # Too long to keep whole anyway; pack what we have greedily
+                    for held in paragraph:
+                        yield from timed(chunker.add(held))
+                    paragraph = []
+                    paragraph_tokens = max_tokens + 1
+            if heading:
+                yield from timed(end_paragraph())
+            separator = "\n"
+        finally:
+            # Also reached through the continues above
+            elapsed += time.perf_counter() - started
+
+    started = time.perf_counter()
+    yield from timed(end_paragraph())
+    yield from timed(chunker.flush())
+    elapsed += time.perf_counter() - started
+    STAGE_SECONDS.observe(elapsed, stage="chunking", route=route)
@@ -1,29 +1,160 @@
-def extract(file_bytes: bytes) -> str:
-    from docx import Document
-    import io
+"""
+DOCX text extraction by streaming word/document.xml straight from the zip.
 
+Paragraphs and tables are emitted in body order. Each body element is
+processed and then discarded, so memory stays flat for long scripts.
+"""
+import re
+from typing import Iterator, List
+
+from processors.ooxml import MC_NS, find_rel, main_part, open_package, read_rels
+from processors.sources import FileSource
+
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+W = f"{{{W_NS}}}"
+
+_HEADING_NAME = re.compile(r"heading [1-9]")
+# Subtrees whose text isn't body text, or duplicates it (VML fallbacks of text boxes)
+_SKIPPED = {f"{{{MC_NS}}}Fallback", f"{W}txbxContent", f"{W}pPr", f"{W}rPr", f"{W}del", f"{W}instrText"}
+
+
+def _heading_styles(package, document_part: str) -> set:
+    """Style ids whose display name marks a heading (python-docx's 'Heading N' names)."""
+    from lxml import etree
+
+    styles_part = find_rel(read_rels(package, document_part), "/styles")
+    if not styles_part:
+        return set()
     try:
-        doc = Document(io.BytesIO(file_bytes))
-        lines = []
+        root = etree.fromstring(package.read(styles_part))
+    except KeyError:
+        return set()
+
+    headings = set()
+    for style in root.iter(f"{W}style"):
+        name = style.find(f"{W}name")
+        name = name.get(f"{W}val", "") if name is not None else ""
+        if name.startswith("Heading") or _HEADING_NAME.fullmatch(name):
+            headings.add(style.get(f"{W}styleId"))
+    return headings
+
+
+def _collect_text(element, parts: List[str]) -> None:
+    """Append run text under element: w:t, tabs and breaks, as python-docx renders them."""
+    for child in element:
+        tag = child.tag
+        if tag == f"{W}t":
+            parts.append(child.text or "")
+        elif tag in (f"{W}tab", f"{W}ptab"):
+            parts.append("\t")
+        elif tag == f"{W}cr" or (tag == f"{W}br" and child.get(f"{W}type") in (None, "textWrapping")):
+            parts.append("\n")
+        elif tag == f"{W}noBreakHyphen":
+            parts.append("-")
+        elif tag not in _SKIPPED:
+            _collect_text(child, parts)
+
+
+def _paragraph_text(paragraph) -> str:
+    parts: List[str] = []
+    _collect_text(paragraph, parts)
+    return "".join(parts)
+
+
+def _paragraph_style(paragraph) -> str:
+    style = paragraph.find(f"{W}pPr/{W}pStyle")
+    return style.get(f"{W}val", "") if style is not None else ""
+
+
+def _cell_content(element, paragraphs: List[str], tables: list) -> None:
+    """
+    Split a cell into the text of its own paragraphs and its nested tables.
 
-        for para in doc.paragraphs:
-            text = para.text.strip()
+    Only direct children (and content controls wrapping them) are taken;
+    paragraphs inside nested tables or text boxes are not the cell's own.
+    """
+    for child in element:
+        if child.tag == f"{W}p":
+            paragraphs.append(_paragraph_text(child))
+        elif child.tag == f"{W}tbl":
+            tables.append(child)
+        elif child.tag == f"{W}sdt":
+            content = child.find(f"{W}sdtContent")
+            if content is not None:
+                _cell_content(content, paragraphs, tables)
+
+
+def _table_lines(table) -> Iterator[str]:
+    """
+    One ' | '-joined line per row; merged cells contribute their text once.
+
+    Tables nested in a row's cells follow that row as lines of their own.
+    """
+    for row in table.iterchildren(f"{W}tr"):
+        cells = []
+        nested: list = []
+        for cell in row.iterchildren(f"{W}tc"):
+            # Horizontal merges are a single w:tc; vertical continuations repeat the cell above
+            merge = cell.find(f"{W}tcPr/{W}vMerge")
+            if merge is not None and merge.get(f"{W}val", "continue") == "continue":
+                continue
+            paragraphs: List[str] = []
+            _cell_content(cell, paragraphs, nested)
+            text = "\n".join(paragraphs).strip()
             if text:
-                style_name = para.style.name if para.style and para.style.name else ""
-                if style_name.startswith("Heading"):
-                    lines.append(f"\n## {text}\n")
-                else:
-                    lines.append(text)
-
-        for table in doc.tables:
-            for row in table.rows:
-                row_text = " | ".join(
-                    cell.text.strip() for cell in row.cells if cell.text.strip()
-                )
-                if row_text:
-                    lines.append(row_text)
-
-        result = "\n".join(lines).strip()
+                cells.append(text)
+        if cells:
+            yield " | ".join(cells)
+        for inner in nested:
+            yield from _table_lines(inner)
+
+
+def _block_lines(element, headings: set) -> Iterator[str]:
+    """Lines for one body-level block: a paragraph, a table or a content control wrapping either."""
+    if element.tag == f"{W}p":
+        text = _paragraph_text(element).strip()
+        if text:
+            yield f"\n## {text}\n" if _paragraph_style(element) in headings else text
+    elif element.tag == f"{W}tbl":
+        yield from _table_lines(element)
+    elif element.tag == f"{W}sdt":
+        content = element.find(f"{W}sdtContent")
+        for child in content if content is not None else ():
+            yield from _block_lines(child, headings)
+
+
+def iter_lines(source: FileSource) -> Iterator[str]:
+    """Yield extracted lines in document order while streaming the document part."""
+    from lxml import etree
+
+    with open_package(source) as package:
+        document_part = main_part(package, "word/document.xml")
+        headings = _heading_styles(package, document_part)
+
+        body = None
+        with package.open(document_part) as stream:
+            for event, element in etree.iterparse(
+                stream, events=("start", "end"), tag=(f"{W}body", f"{W}p", f"{W}tbl", f"{W}sdt"),
+                huge_tree=True,
+            ):
+                if event == "start":
+                    if element.tag == f"{W}body":
+                        body = element
+                    continue
+                if body is None or element.getparent() is not body:
+                    continue
+
+                yield from _block_lines(element, headings)
+
+                # Drop the finished block (and anything before it) from the partial tree
+                element.clear()
+                while element.getprevious() is not None:
+                    del body[0]
+
+
+def extract(source: FileSource) -> str:
+    try:
+        result = "\n".join(iter_lines(source)).strip()
         if not result:
             raise ValueError("No readable text found in DOCX")
         return result
@@ -0,0 +1,156 @@
+"""Chunk-hash -> embedding cache so identical chunk text is only embedded once."""
+import os
+import hashlib
+import logging
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+from supabase_client import rest_request
+
+logger = logging.getLogger(__name__)
+
+# In-process LRU; vectors are stored as float32 arrays (~2 KB each at 512 dims)
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "20000"))
+# Optional shared Supabase table (see db/migrations/014_embedding_cache.sql)
+EMBEDDING_CACHE_TABLE = os.getenv("EMBEDDING_CACHE_TABLE", "")
+# Keys per shared-table lookup, keeps the in.(...) query string short
+SHARED_LOOKUP_BATCH = 50
+
+EmbedFn = Callable[[List[str]], List[List[float]]]
+
+
+def chunk_key(text: str, model: str, input_type: str) -> str:
+    return hashlib.sha256(f"{model}\0{input_type}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Local LRU in front of an optional shared table, with hit/miss counters."""
+
+    def __init__(self, max_entries: int = EMBEDDING_CACHE_SIZE, table: str = EMBEDDING_CACHE_TABLE):
+        self.max_entries = max_entries
+        self.table = table
+        self._entries: "OrderedDict[str, array]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "sharedHits": 0, "misses": 0, "deduplicated": 0, "errors": 0}
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counters, entries=len(self._entries))
+
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += n
+
+    def _get_local(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                return None
+            self._entries.move_to_end(key)
+        return vector.tolist()
+
+    def _put_local(self, key: str, embedding: List[float]) -> None:
+        if self.max_entries <= 0:
+            return
+        vector = array("f", embedding)
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _get_shared(self, keys: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        for i in range(0, len(keys), SHARED_LOOKUP_BATCH):
+            batch = keys[i:i + SHARED_LOOKUP_BATCH]
+            try:
+                rows = rest_request(
+                    "GET",
+                    f"{self.table}?cache_key=in.({','.join(batch)})&select=cache_key,embedding",
+                ).json()
+                for row in rows:
+                    found[row["cache_key"]] = row["embedding"]
+            except Exception as e:
+                self._count("errors")
+                logger.warning(f"Shared embedding cache lookup failed: {str(e)}")
+        return found
+
+    def _put_shared(self, rows: List[Dict]) -> None:
+        try:
+            rest_request(
+                "POST",
+                self.table,
+                rows,
+                headers={"Prefer": "resolution=merge-duplicates,return=minimal"},
+                retry_unsafe=True,
+            )
+        except Exception as e:
+            self._count("errors")
+            logger.warning(f"Failed to write shared embedding cache entries: {str(e)}")
+
+    def embed(self, texts: List[str], model: str, input_type: str, embed_fn: EmbedFn) -> List[List[float]]:
+        """
+        Embed texts, calling embed_fn only for distinct texts not already cached.
+
+        Args:
+            texts: Chunk texts, in order
+            model: Embedding model name (part of the cache key)
+            input_type: Voyage input type (part of the cache key)
+            embed_fn: Embeds a list of texts, returning vectors in the same order
+
+        Returns:
+            One embedding per input text, in order
+        """
+        keys = [chunk_key(text, model, input_type) for text in texts]
+        resolved: Dict[str, List[float]] = {}
+
+        # Texts repeated within this batch only need one lookup / embed call
+        unique: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            unique.setdefault(key, text)
+        if len(unique) < len(keys):
+            self._count("deduplicated", len(keys) - len(unique))
+
+        for key in unique:
+            embedding = self._get_local(key)
+            if embedding is not None:
+                resolved[key] = embedding
+        self._count("hits", len(resolved))
+
+        missing = [key for key in unique if key not in resolved]
+        if missing and self.table:
+            shared = self._get_shared(missing)
+            for key, embedding in shared.items():
+                resolved[key] = embedding
+                self._put_local(key, embedding)
+            self._count("sharedHits", len(shared))
+            missing = [key for key in missing if key not in resolved]
+
+        if missing:
+            self._count("misses", len(missing))
+            embeddings = embed_fn([unique[key] for key in missing])
+            for key, embedding in zip(missing, embeddings):
+                resolved[key] = embedding
+                self._put_local(key, embedding)
+            if self.table:
+                self._put_shared([
+                    {"cache_key": key, "model": model, "input_type": input_type, "embedding": resolved[key]}
+                    for key in missing
+                ])
+
+        return [resolved[key] for key in keys]
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Get the process-wide embedding cache, creating it on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = EmbeddingCache()
+        return _cache
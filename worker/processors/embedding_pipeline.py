@@ -0,0 +1,166 @@
+"""Pipelined embedding engine: concurrent, rate-limited embed calls overlapped with inserts."""
+import os
+import time
+import logging
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set
+
+from jobs import report_progress
+from outbound import propagate
+from metrics import CHUNKS, STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Concurrency and rate limits
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+INSERT_CONCURRENCY = int(os.getenv("INSERT_CONCURRENCY", "2"))
+EMBED_REQUESTS_PER_MINUTE = float(os.getenv("EMBED_REQUESTS_PER_MINUTE", "0"))
+
+# Batch sizing; voyage-3-lite accepts up to 128 inputs and 1M tokens per request
+EMBED_MAX_BATCH_SIZE = int(os.getenv("EMBED_MAX_BATCH_SIZE", "128"))
+EMBED_MAX_BATCH_TOKENS = int(os.getenv("EMBED_MAX_BATCH_TOKENS", "120000"))
+# Conservative: Indic scripts tokenise to far fewer characters per token than English
+CHARS_PER_TOKEN = 3
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def iter_batches(
+    chunks: Iterable[Dict],
+    max_tokens: int = EMBED_MAX_BATCH_TOKENS,
+    max_size: int = EMBED_MAX_BATCH_SIZE,
+) -> Iterator[List[Dict]]:
+    """Group chunks into batches bounded by estimated tokens and item count."""
+    batch: List[Dict] = []
+    batch_tokens = 0
+    for chunk in chunks:
+        tokens = estimate_tokens(chunk["text"])
+        if batch and (batch_tokens + tokens > max_tokens or len(batch) >= max_size):
+            yield batch
+            batch = []
+            batch_tokens = 0
+        batch.append(chunk)
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
+
+class RateLimiter:
+    """Token bucket allowing `per_minute` acquisitions per minute (0 = unlimited)."""
+
+    def __init__(self, per_minute: float):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait_until = max(self._next, now)
+            self._next = wait_until + self.interval
+        if wait_until > now:
+            time.sleep(wait_until - now)
+
+
+_rate_limiter = RateLimiter(EMBED_REQUESTS_PER_MINUTE)
+
+
+class EmbeddingPipeline:
+    """
+    Runs embed calls for successive batches concurrently and inserts each
+    batch's rows while later embed calls are still in flight.
+
+    Chunks are dicts with 'document_id', 'text' and 'metadata' keys.
+    """
+
+    def __init__(
+        self,
+        embed_fn: Callable[[List[str]], List[List[float]]],
+        insert_fn: Callable[[List[Dict]], None],
+        concurrency: int = EMBED_CONCURRENCY,
+        insert_concurrency: int = INSERT_CONCURRENCY,
+        rate_limiter: Optional[RateLimiter] = None,
+        route: str = "",
+    ):
+        self.embed_fn = embed_fn
+        self.insert_fn = insert_fn
+        self.concurrency = max(1, concurrency)
+        self.insert_concurrency = max(1, insert_concurrency)
+        self.rate_limiter = rate_limiter or _rate_limiter
+        # Extractor route of the documents being embedded, for the stage metrics
+        self.route = route
+
+    def _embed(self, batch: List[Dict]) -> List[Dict]:
+        self.rate_limiter.acquire()
+        with STAGE_SECONDS.time(stage="embed_call", route=self.route):
+            embeddings = self.embed_fn([chunk["text"] for chunk in batch])
+        return [
+            {
+                "document_id": chunk["document_id"],
+                "content": chunk["text"],
+                "embedding": embedding,
+                "metadata": chunk["metadata"],
+            }
+            for chunk, embedding in zip(batch, embeddings)
+        ]
+
+    def _insert(self, records: List[Dict]) -> None:
+        with STAGE_SECONDS.time(stage="insert", route=self.route):
+            self.insert_fn(records)
+
+    def run(self, batches: Iterable[List[Dict]], total_chunks: Optional[int] = None) -> int:
+        """Embed and insert all batches; returns the number of chunks stored."""
+        embed_pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="embed")
+        insert_pool = ThreadPoolExecutor(max_workers=self.insert_concurrency, thread_name_prefix="insert")
+        # Embed calls run on pool threads but spend the caller's deadline
+        embed = propagate(self._embed)
+        embeds: Set[Future] = set()
+        inserts: Dict[Future, int] = {}
+        stored = 0
+        batch_num = 0
+
+        def collect(block_embeds: bool, block_inserts: bool) -> None:
+            nonlocal stored
+            if embeds and block_embeds:
+                wait(embeds, return_when=FIRST_COMPLETED)
+            for future in [f for f in embeds if f.done()]:
+                embeds.discard(future)
+                records = future.result()
+                inserts[insert_pool.submit(self._insert, records)] = len(records)
+
+            if inserts and block_inserts:
+                wait(inserts, return_when=FIRST_COMPLETED)
+            for future in [f for f in inserts if f.done()]:
+                count = inserts.pop(future)
+                future.result()
+                stored += count
+                CHUNKS.inc(count, outcome="embedded")
+                report_progress(stored, total_chunks or stored, "chunks")
+                logger.info(f"Stored {stored}/{total_chunks or '?'} embeddings")
+
+        try:
+            for batch in batches:
+                batch_num += 1
+                logger.info(f"Generating embeddings for batch {batch_num} ({len(batch)} chunks)")
+                embeds.add(embed_pool.submit(embed, batch))
+
+                # Backpressure: bound in-flight embed calls and queued inserts
+                while len(embeds) >= self.concurrency:
+                    collect(block_embeds=True, block_inserts=False)
+                while len(inserts) > self.insert_concurrency * 2:
+                    collect(block_embeds=False, block_inserts=True)
+                collect(block_embeds=False, block_inserts=False)
+
+            while embeds or inserts:
+                collect(block_embeds=bool(embeds), block_inserts=not embeds)
+        finally:
+            # On error, drop queued work; calls already in flight finish in the background
+            embed_pool.shutdown(wait=False, cancel_futures=True)
+            insert_pool.shutdown(wait=False, cancel_futures=True)
+
+        return stored
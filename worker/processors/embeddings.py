@@ -1,105 +1,366 @@
 import os
-import voyageai
-import requests
+import time
+import itertools
 import logging
-from typing import List, Dict, Any
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Iterable, Iterator, Optional
+
+import outbound
+from supabase_client import encode_json, rest_request
+from metrics import CHUNKS, STAGE_SECONDS
+from processors.embedding_cache import get_embedding_cache, chunk_key
+from processors.embedding_pipeline import EmbeddingPipeline, iter_batches
+from processors.chunking import iter_structured_chunks
 
 logger = logging.getLogger(__name__)
 
-# Supabase configuration
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+EMBEDDING_MODEL = "voyage-3-lite"
+EMBEDDING_INPUT_TYPE = "document"
+
+# "structured" splits on pages/slides/headings/paragraphs (see processors/chunking.py);
+# "window" is the original fixed 1000-character window with 200 characters of overlap
+CHUNKER = os.getenv("CHUNKER", "structured").lower()
+
+# Reuse unchanged document_sections rows on re-embed instead of appending duplicates
+# (opt-in; also per request with "incremental": true)
+EMBED_INCREMENTAL = os.getenv("EMBED_INCREMENTAL", "false").lower() in ("1", "true", "yes")
+# PostgREST page size / ids per in.(...) filter
+SECTIONS_PAGE_SIZE = 1000
+SECTIONS_DELETE_BATCH = 100
+
+# Send embeddings as pgvector text literals with this many significant digits
+# (pgvector stores float4, so ~7 is lossless in practice); 0 sends JSON float arrays
+EMBED_VECTOR_PRECISION = int(os.getenv("EMBED_VECTOR_PRECISION", "7"))
+# Split document_sections inserts into requests of at most this size, posted concurrently
+INSERT_MAX_BODY_BYTES = int(os.getenv("INSERT_MAX_BODY_BYTES", str(2 * 1024 * 1024)))
+INSERT_PARALLEL_REQUESTS = int(os.getenv("INSERT_PARALLEL_REQUESTS", "2"))
+
+_voyage_client = None
+_voyage_client_pid: Optional[int] = None
+_voyage_client_lock = threading.Lock()
 
 def get_voyage_client():
-    """Get Voyage AI client"""
-    return voyageai.Client(api_key=os.getenv("VOYAGE_API_KEY"))
+    """Get this process's Voyage AI client (voyageai is imported on first use)"""
+    global _voyage_client, _voyage_client_pid
+    with _voyage_client_lock:
+        if _voyage_client is None or _voyage_client_pid != os.getpid():
+            import voyageai
+
+            _voyage_client = voyageai.Client(api_key=os.getenv("VOYAGE_API_KEY"))
+            _voyage_client_pid = os.getpid()
+        return _voyage_client
 
-def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> List[Dict[str, Any]]:
-    """Split text into overlapping chunks"""
-    chunks = []
+def iter_chunks(pieces: Iterable[str], route: str = "") -> Iterator[Dict[str, Any]]:
+    """
+    Split streamed text into chunks as it arrives, using the configured CHUNKER.
+
+    Yields exactly the chunks chunk_text would produce for "".join(pieces).
+    """
+    if CHUNKER == "window":
+        return iter_window_chunks(pieces, route=route)
+    return iter_structured_chunks(pieces, route=route)
+
+def iter_window_chunks(pieces: Iterable[str], chunk_size: int = 1000, overlap: int = 200, route: str = "") -> Iterator[Dict[str, Any]]:
+    """Split streamed text into fixed-size overlapping character windows as it arrives."""
+    buffer = ""
+    buffer_start = 0
     start = 0
-    text_len = len(text)
     chunk_index = 0
 
-    while start < text_len:
-        end = start + chunk_size
-        chunk_text = text[start:end]
-
-        chunks.append({
-            'text': chunk_text,
+    def make_chunk(text: str) -> Dict[str, Any]:
+        return {
+            'text': text,
             'metadata': {
                 'chunk_index': chunk_index,
-                'chunk_length': len(chunk_text),
+                'chunk_length': len(text),
                 'start_position': start,
-                'end_position': end
+                'end_position': start + chunk_size
             }
-        })
+        }
+
+    # Time spent chunking only, excluding time the consumer or producer holds us suspended
+    elapsed = 0.0
+
+    for piece in pieces:
+        started = time.perf_counter()
+        buffer += piece
 
-        start = end - overlap
+        # Emit every full window now available
+        while start + chunk_size <= buffer_start + len(buffer):
+            offset = start - buffer_start
+            chunk = make_chunk(buffer[offset:offset + chunk_size])
+            elapsed += time.perf_counter() - started
+            yield chunk
+            started = time.perf_counter()
+            start = start + chunk_size - overlap
+            chunk_index += 1
+
+        # Drop consumed text once per piece (not per window) to keep this linear
+        buffer = buffer[start - buffer_start:]
+        buffer_start = start
+        elapsed += time.perf_counter() - started
+
+    while start < buffer_start + len(buffer):
+        offset = start - buffer_start
+        yield make_chunk(buffer[offset:offset + chunk_size])
+        start = start + chunk_size - overlap
         chunk_index += 1
 
+    STAGE_SECONDS.observe(elapsed, stage="chunking", route=route)
+
+def chunk_text(text: str, route: str = "") -> List[Dict[str, Any]]:
+    """Split text into chunks"""
+    chunks = list(iter_chunks([text], route=route))
     logger.info(f"Created {len(chunks)} chunks from text")
     return chunks
 
+def vector_literal(embedding: List[float], precision: int = EMBED_VECTOR_PRECISION) -> str:
+    """pgvector text form, e.g. '[0.0123457,-0.5]' (about half the size of a JSON float list)"""
+    fmt = f"%.{precision}g"
+    return "[" + ",".join([fmt % value for value in embedding]) + "]"
+
+def encode_section_rows(records: List[Dict]) -> List[bytes]:
+    """JSON-encode document_sections rows one by one, with compact vectors"""
+    rows = []
+    for record in records:
+        if EMBED_VECTOR_PRECISION > 0 and not isinstance(record.get("embedding"), str):
+            record = dict(record, embedding=vector_literal(record["embedding"]))
+        rows.append(encode_json(record))
+    return rows
+
+def split_bodies(rows: List[bytes], max_bytes: int = INSERT_MAX_BODY_BYTES) -> List[bytes]:
+    """Pack encoded rows into JSON array bodies of at most max_bytes (a single oversized row gets its own)"""
+    bodies = []
+    current: List[bytes] = []
+    size = 2
+    for row in rows:
+        if current and size + len(row) + 1 > max_bytes:
+            bodies.append(b"[" + b",".join(current) + b"]")
+            current = []
+            size = 2
+        current.append(row)
+        size += len(row) + 1
+    if current:
+        bodies.append(b"[" + b",".join(current) + b"]")
+    return bodies
+
+def _post_sections(body: bytes) -> None:
+    rest_request(
+        "POST",
+        "document_sections",
+        body=body,
+        headers={"Prefer": "return=minimal"},
+    )
+
 def insert_embeddings(records: List[Dict]) -> None:
-    """Insert embeddings into Supabase using REST API"""
-    headers = {
-        "apikey": SUPABASE_KEY,
-        "Authorization": f"Bearer {SUPABASE_KEY}",
-        "Content-Type": "application/json",
-        "Prefer": "return=minimal"
-    }
-
-    url = f"{SUPABASE_URL}/rest/v1/document_sections"
-    response = requests.post(url, headers=headers, json=records)
-    response.raise_for_status()
-
-def generate_embeddings(document_id: str, text: str) -> int:
-    """Generate embeddings using Voyage AI and store in database"""
-    try:
-        # Chunk the text
-        chunks = chunk_text(text)
+    """Insert embeddings into Supabase using REST API, split into byte-bounded bulk requests"""
+    bodies = split_bodies(encode_section_rows(records))
+    if len(bodies) == 1:
+        _post_sections(bodies[0])
+        return
 
-        # Get Voyage client
-        vo = get_voyage_client()
+    logger.info(f"Inserting {len(records)} rows as {len(bodies)} requests ({sum(map(len, bodies))} bytes)")
+    with ThreadPoolExecutor(max_workers=max(1, min(INSERT_PARALLEL_REQUESTS, len(bodies))), thread_name_prefix="insert-part") as pool:
+        for future in [pool.submit(_post_sections, body) for body in bodies]:
+            future.result()
 
-        # Generate embeddings in batches
-        batch_size = 128
-        total_embedded = 0
+def voyage_embed(vo, texts: List[str], input_type: Optional[str]) -> List[List[float]]:
+    """
+    One Voyage embedding request through the outbound layer (deadline, retries, breaker).
 
-        for i in range(0, len(chunks), batch_size):
-            batch_chunks = chunks[i:i + batch_size]
-            batch_texts = [chunk['text'] for chunk in batch_chunks]
+    Goes to voyageai.Embedding.create rather than vo.embed, which has no
+    per-call timeout; the client's own retry loop is left out because
+    outbound retries instead.
+    """
+    import voyageai
+    from voyageai.object import EmbeddingsObject
 
-            logger.info(f"Generating embeddings for batch {i//batch_size + 1}")
+    def request(timeout: float) -> List[List[float]]:
+        response = voyageai.Embedding.create(
+            input=texts,
+            model=EMBEDDING_MODEL,
+            input_type=input_type,
+            truncation=True,
+            api_key=vo.api_key,
+            request_timeout=timeout,
+        )
+        return EmbeddingsObject(response).embeddings
 
-            # Call Voyage AI API
-            result = vo.embed(
-                batch_texts,
-                model="voyage-3-lite",
-                input_type="document"
-            )
+    return outbound.call("voyage", request)
 
-            embeddings = result.embeddings
+def embed_texts(vo, texts: List[str]) -> List[List[float]]:
+    """Embed document chunks, skipping any already in the embedding cache"""
+    return get_embedding_cache().embed(
+        texts,
+        EMBEDDING_MODEL,
+        EMBEDDING_INPUT_TYPE,
+        lambda missing: voyage_embed(vo, missing, EMBEDDING_INPUT_TYPE),
+    )
 
-            # Prepare records for insertion
-            records = []
-            for chunk, embedding in zip(batch_chunks, embeddings):
-                records.append({
-                    "document_id": document_id,
-                    "content": chunk['text'],
-                    "embedding": embedding,
-                    "metadata": chunk['metadata']
-                })
+def fetch_existing_sections_for(document_ids: List[str]) -> Dict[str, Dict[str, List[Dict[str, Any]]]]:
+    """Existing document_sections rows for several documents, by document id then chunk content hash"""
+    by_document: Dict[str, Dict[str, List[Dict[str, Any]]]] = {document_id: {} for document_id in document_ids}
+    for i in range(0, len(document_ids), SECTIONS_DELETE_BATCH):
+        batch = document_ids[i:i + SECTIONS_DELETE_BATCH]
+        offset = 0
+        while True:
+            rows = rest_request(
+                "GET",
+                f"document_sections?document_id=in.({','.join(batch)})&select=id,document_id,metadata"
+                f"&order=id&limit={SECTIONS_PAGE_SIZE}&offset={offset}",
+            ).json()
+            for row in rows:
+                content_hash = (row.get('metadata') or {}).get('content_hash')
+                by_document.setdefault(row['document_id'], {}).setdefault(content_hash, []).append(row)
+            if len(rows) < SECTIONS_PAGE_SIZE:
+                break
+            offset += SECTIONS_PAGE_SIZE
+    return by_document
 
-            # Insert using REST API
-            insert_embeddings(records)
+def fetch_existing_sections(document_id: str) -> Dict[str, List[Dict[str, Any]]]:
+    """Existing document_sections rows for a document, grouped by chunk content hash"""
+    return fetch_existing_sections_for([document_id])[document_id]
+
+def delete_sections(ids: List[str]) -> None:
+    """Bulk-delete document_sections rows by id"""
+    for i in range(0, len(ids), SECTIONS_DELETE_BATCH):
+        batch = ids[i:i + SECTIONS_DELETE_BATCH]
+        rest_request("DELETE", f"document_sections?id=in.({','.join(batch)})")
+
+def update_section_metadata(rows: List[Dict[str, Any]]) -> None:
+    """Bulk-update content/metadata of reused rows, leaving their embeddings untouched"""
+    for body in split_bodies([encode_json(row) for row in rows]):
+        rest_request(
+            "POST",
+            "document_sections?on_conflict=id",
+            body=body,
+            headers={"Prefer": "resolution=merge-duplicates,return=minimal"},
+            retry_unsafe=True,
+        )
+
+class _DocumentChunks:
+    """One document's chunks, split into rows that can be reused and chunks still to embed."""
+
+    def __init__(self, document_id: str, chunks: Iterable[Dict[str, Any]], existing: Optional[Dict[str, List[Dict[str, Any]]]]):
+        self.document_id = document_id
+        self.chunks = chunks
+        # None when not incremental; otherwise rows by content hash, consumed as they are reused
+        self.existing = existing
+        self.reused_updates: List[Dict[str, Any]] = []
+        self.seen = 0
+        self.pending_count = 0
+
+    def pending(self) -> Iterator[Dict[str, Any]]:
+        for chunk in self.chunks:
+            self.seen += 1
+            content_hash = chunk_key(chunk['text'], EMBEDDING_MODEL, EMBEDDING_INPUT_TYPE)
+            chunk['metadata']['content_hash'] = content_hash
+
+            rows = self.existing.get(content_hash) if self.existing is not None else None
+            if rows:
+                row = rows.pop()
+                if row.get('metadata') != chunk['metadata']:
+                    self.reused_updates.append({
+                        "id": row['id'],
+                        "document_id": self.document_id,
+                        "content": chunk['text'],
+                        "metadata": chunk['metadata'],
+                    })
+                continue
+
+            chunk['document_id'] = self.document_id
+            self.pending_count += 1
+            yield chunk
+
+    def stale_ids(self) -> List[str]:
+        """Rows left over once every chunk has been matched"""
+        return [row['id'] for rows in (self.existing or {}).values() for row in rows]
+
+def _run_pipeline(chunks: Iterable[Dict[str, Any]], total_chunks: Optional[int], route: str = "") -> int:
+    vo = get_voyage_client()
+
+    # Embed token-budgeted batches concurrently, inserting as each completes
+    pipeline = EmbeddingPipeline(
+        embed_fn=lambda texts: embed_texts(vo, texts),
+        insert_fn=insert_embeddings,
+        route=route,
+    )
+    return pipeline.run(iter_batches(chunks), total_chunks=total_chunks)
+
+def _apply_reuse(documents: List[_DocumentChunks]) -> None:
+    """Incremental mode: update reused rows and delete stale ones, in bulk across documents"""
+    update_section_metadata([row for document in documents for row in document.reused_updates])
+    stale_ids = [row_id for document in documents for row_id in document.stale_ids()]
+    delete_sections(stale_ids)
+    for document in documents:
+        reused = document.seen - document.pending_count
+        CHUNKS.inc(reused, outcome="reused")
+        logger.info(
+            f"Incremental embed for {document.document_id}: {document.pending_count} new, {reused} reused, "
+            f"{len(document.stale_ids())} stale rows deleted"
+        )
+
+def embed_chunks(
+    document_id: str,
+    chunks: Iterable[Dict[str, Any]],
+    total_chunks: Optional[int] = None,
+    incremental: Optional[bool] = None,
+    route: str = "",
+) -> int:
+    """
+    Embed and store chunks as they are produced; returns the document's chunk count.
+
+    In incremental mode, chunks whose content hash already has a row for this
+    document keep that row (and its embedding); only new or changed chunks are
+    embedded, and rows that no longer match any chunk are deleted.
+    """
+    if incremental is None:
+        incremental = EMBED_INCREMENTAL
+
+    document = _DocumentChunks(document_id, chunks, fetch_existing_sections(document_id) if incremental else None)
+    _run_pipeline(document.pending(), total_chunks, route)
+    if incremental:
+        _apply_reuse([document])
+    return document.seen
+
+def embed_documents(
+    chunks_by_document: Dict[str, List[Dict[str, Any]]],
+    incremental: Optional[bool] = None,
+    route: str = "",
+) -> Dict[str, int]:
+    """
+    Embed several documents' chunks through one pipeline; returns each document's chunk count.
+
+    Chunks from different documents are packed into the same Voyage batches, so
+    a set of small documents costs a few full embed calls rather than one
+    part-filled call each. Incremental reuse works as in embed_chunks. Embed
+    calls can mix documents, so one route labels the whole batch's metrics.
+    """
+    if incremental is None:
+        incremental = EMBED_INCREMENTAL
+
+    existing = fetch_existing_sections_for(list(chunks_by_document)) if incremental else {}
+    documents = [
+        _DocumentChunks(document_id, chunks, existing.get(document_id, {}) if incremental else None)
+        for document_id, chunks in chunks_by_document.items()
+    ]
+    total_chunks = sum(len(chunks) for chunks in chunks_by_document.values())
+    _run_pipeline(itertools.chain.from_iterable(document.pending() for document in documents), total_chunks, route)
+    if incremental:
+        _apply_reuse(documents)
+    return {document.document_id: document.seen for document in documents}
+
+def generate_embeddings(document_id: str, text: str, incremental: Optional[bool] = None, route: str = "") -> int:
+    """Generate embeddings using Voyage AI and store in database"""
+    try:
+        # Chunk the text
+        chunks = chunk_text(text, route=route)
 
-            total_embedded += len(batch_texts)
-            logger.info(f"Stored {total_embedded}/{len(chunks)} embeddings")
+        embed_chunks(document_id, chunks, total_chunks=len(chunks), incremental=incremental, route=route)
 
         return len(chunks)
 
     except Exception as e:
         logger.error(f"Embedding generation error: {str(e)}")
-        raise
\ No newline at end of file
+        raise
@@ -1,34 +1,32 @@
-import anthropic
-import base64
+import io
 import os
+import base64
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
 
+import outbound
+from processors.sources import FileSource, open_stream, read_bytes
 
-def extract(file_bytes: bytes, mime_type: str = "image/jpeg") -> str:
-    try:
-        client = anthropic.Anthropic(
-            api_key=os.environ.get("ANTHROPIC_API_KEY")
-        )
-        if not os.environ.get("ANTHROPIC_API_KEY"):
-            raise ValueError("ANTHROPIC_API_KEY is not configured")
-        image_data = base64.standard_b64encode(file_bytes).decode("utf-8")
-        message = client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=1024,
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "image",
-                            "source": {
-                                "type": "base64",
-                                "media_type": mime_type,
-                                "data": image_data,
-                            },
-                        },
-                        {
-                            "type": "text",
-                            "text": """You are analyzing a reference image uploaded by a 
+logger = logging.getLogger(__name__)
+
+IMAGE_MODEL = "claude-sonnet-4-20250514"
+
+# Claude downsamples anything past ~1568 px on the long edge, so larger uploads only cost bandwidth
+IMAGE_MAX_EDGE = int(os.getenv("IMAGE_MAX_EDGE", "1568"))
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+# Analysis cache: 0 reuses an analysis only for identical images (same prepared bytes).
+# Above 0, also for images whose dHashes differ in at most this many of 64 bits; similar
+# but different images (text screenshots, slides on one template) can collide, so this
+# is opt-in. Negative disables the cache.
+IMAGE_HASH_MAX_DISTANCE = int(os.getenv("IMAGE_HASH_MAX_DISTANCE", "0"))
+IMAGE_HASH_CACHE_SIZE = int(os.getenv("IMAGE_HASH_CACHE_SIZE", "512"))
+
+SUPPORTED_MEDIA_TYPES = {"image/jpeg", "image/png", "image/gif", "image/webp"}
+
+PROMPT = """You are analyzing a reference image uploaded by a 
 writer developing a story. Extract and describe:
 1) Any visible text, titles, or written content
 2) The visual mood, tone, and atmosphere
@@ -37,14 +35,204 @@ writer developing a story. Extract and describe:
 5) Any narrative elements visible
 
 Format as structured text a writer can use as 
-story reference material.""",
+story reference material."""
+
+_client = None
+_client_pid: Optional[int] = None
+_client_lock = threading.Lock()
+
+
+def get_anthropic_client():
+    """Get this process's Anthropic client, reusing its connection pool across calls."""
+    global _client, _client_pid
+    with _client_lock:
+        if _client is None or _client_pid != os.getpid():
+            import anthropic
+
+            _client = anthropic.Anthropic(api_key=os.environ.get("ANTHROPIC_API_KEY"))
+            _client_pid = os.getpid()
+        return _client
+
+
+def dhash(image, size: int = 8) -> int:
+    """64-bit difference hash: robust to re-encoding, resizing and small edits."""
+    from PIL import Image
+
+    gray = image.convert("L").resize((size + 1, size), Image.Resampling.BILINEAR)
+    pixels = list(gray.getdata())
+    bits = 0
+    for row in range(size):
+        for col in range(size):
+            left = pixels[row * (size + 1) + col]
+            right = pixels[row * (size + 1) + col + 1]
+            bits = (bits << 1) | (left > right)
+    return bits
+
+
+class ImageAnalysisCache:
+    """
+    LRU of analyses keyed on the content digest of the prepared image.
+
+    With max_distance > 0, a lookup that misses on the digest falls back to
+    the closest perceptual hash within that Hamming distance.
+    """
+
+    def __init__(self, max_entries: int = IMAGE_HASH_CACHE_SIZE, max_distance: int = IMAGE_HASH_MAX_DISTANCE):
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        # digest -> (dHash or None, analysis)
+        self._entries: "OrderedDict[bytes, Tuple[Optional[int], str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "nearHits": 0, "misses": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.max_distance >= 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counters, entries=len(self._entries))
+
+    def get(self, digest: bytes, image_hash: Optional[int] = None) -> Optional[str]:
+        with self._lock:
+            if digest in self._entries:
+                self._entries.move_to_end(digest)
+                self._counters["hits"] += 1
+                return self._entries[digest][1]
+
+            best, best_distance = None, self.max_distance + 1
+            if self.max_distance > 0 and image_hash is not None:
+                for key, (entry_hash, _) in self._entries.items():
+                    if entry_hash is None:
+                        continue
+                    distance = (entry_hash ^ image_hash).bit_count()
+                    if distance < best_distance:
+                        best, best_distance = key, distance
+            if best is None:
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(best)
+            self._counters["nearHits"] += 1
+            return self._entries[best][1]
+
+    def put(self, digest: bytes, image_hash: Optional[int], text: str) -> None:
+        with self._lock:
+            self._entries[digest] = (image_hash, text)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+_cache = ImageAnalysisCache()
+
+
+def get_image_cache() -> ImageAnalysisCache:
+    return _cache
+
+
+def preprocess(source: FileSource, mime_type: str) -> Tuple[bytes, str, Optional[int]]:
+    """
+    Normalise orientation, downscale to IMAGE_MAX_EDGE and re-encode for upload.
+
+    Returns (image bytes, media type, perceptual hash). The original bytes are
+    kept when they are already upright, small enough and in a supported
+    format and re-encoding wouldn't shrink them. If Pillow can't decode the
+    file it is sent unchanged, without a hash.
+    """
+    from PIL import Image, ImageOps
+
+    original = read_bytes(source)
+    try:
+        image = Image.open(open_stream(source))
+        original_size = image.size
+        orientation = image.getexif().get(0x0112, 1)
+        # Let the JPEG decoder do most of the downscale (1/2, 1/4, 1/8) while decoding
+        scale = IMAGE_MAX_EDGE / max(original_size)
+        if scale < 1:
+            image.draft("RGB", (max(1, int(original_size[0] * scale)), max(1, int(original_size[1] * scale))))
+        image = ImageOps.exif_transpose(image)
+        if max(image.size) > IMAGE_MAX_EDGE:
+            image.thumbnail((IMAGE_MAX_EDGE, IMAGE_MAX_EDGE), Image.Resampling.LANCZOS)
+        image_hash = dhash(image)
+    except Exception as e:
+        logger.warning(f"Image pre-processing skipped, sending original: {str(e)}")
+        return original, mime_type, None
+
+    transformed = image.size != original_size or orientation != 1
+    if not transformed and mime_type in SUPPORTED_MEDIA_TYPES:
+        # Already fine as uploaded; only re-encode if it's worth it
+        candidate = _encode(image)
+        if len(candidate[0]) >= len(original):
+            return original, mime_type, image_hash
+        return candidate + (image_hash,)
+
+    return _encode(image) + (image_hash,)
+
+
+def _encode(image) -> Tuple[bytes, str]:
+    """JPEG for opaque images, PNG when there is transparency."""
+    out = io.BytesIO()
+    has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+    if has_alpha:
+        image.save(out, format="PNG", optimize=True)
+        return out.getvalue(), "image/png"
+    image.convert("RGB").save(out, format="JPEG", quality=IMAGE_JPEG_QUALITY, optimize=True)
+    return out.getvalue(), "image/jpeg"
+
+
+def extract(source: FileSource, mime_type: str = "image/jpeg") -> str:
+    try:
+        if not os.environ.get("ANTHROPIC_API_KEY"):
+            raise ValueError("ANTHROPIC_API_KEY is not configured")
+
+        image_bytes, media_type, image_hash = preprocess(source, mime_type)
+        digest = hashlib.sha256(image_bytes).digest()
+        if _cache.enabled:
+            cached = _cache.get(digest, image_hash)
+            if cached is not None:
+                logger.info(f"Image analysis cache hit for {digest.hex()[:16]}")
+                return cached
+
+        logger.info(f"Sending {len(image_bytes)} byte {media_type} for image analysis")
+        image_data = base64.standard_b64encode(image_bytes).decode("utf-8")
+        messages = [
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "image",
+                        "source": {
+                            "type": "base64",
+                            "media_type": media_type,
+                            "data": image_data,
                         },
-                    ],
-                }
-            ],
+                    },
+                    {
+                        "type": "text",
+                        "text": PROMPT,
+                    },
+                ],
+            }
+        ]
+        client = get_anthropic_client()
+        # The client's own retries are off; outbound retries within the deadline
+        message = outbound.call(
+            "anthropic",
+            lambda timeout: client.with_options(timeout=timeout, max_retries=0).messages.create(
+                model=IMAGE_MODEL,
+                max_tokens=1024,
+                messages=messages,
+            ),
         )
         if not message.content or not hasattr(message.content[0], "text"):
             raise ValueError("Claude returned empty image analysis")
-        return message.content[0].text
+
+        text = message.content[0].text
+        if _cache.enabled:
+            _cache.put(digest, image_hash, text)
+        return text
+    except outbound.CircuitOpen:
+        # Not a problem with this image; callers retry it later
+        raise
     except Exception as exc:
         raise Exception(f"Image extraction failed: {exc}") from exc
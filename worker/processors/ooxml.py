@@ -0,0 +1,54 @@
+"""Zip-level helpers for Office Open XML packages (DOCX, PPTX) read without their object models."""
+import posixpath
+import zipfile
+from typing import Dict, Optional, Tuple
+
+from processors.sources import FileSource, open_stream
+
+REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+MC_NS = "http://schemas.openxmlformats.org/markup-compatibility/2006"
+
+
+def open_package(source: FileSource) -> zipfile.ZipFile:
+    """Open the package zip; parts are decompressed only as they are read."""
+    return zipfile.ZipFile(open_stream(source))
+
+
+def rels_path(part: str) -> str:
+    """Path of a part's relationships file, e.g. word/document.xml -> word/_rels/document.xml.rels."""
+    directory, name = posixpath.split(part)
+    return posixpath.join(directory, "_rels", f"{name}.rels")
+
+
+def read_rels(package: zipfile.ZipFile, part: str = "") -> Dict[str, Tuple[str, str]]:
+    """Relationships of a part (the package itself for ""): rId -> (type, resolved part path)."""
+    from lxml import etree
+
+    path = rels_path(part) if part else "_rels/.rels"
+    try:
+        root = etree.fromstring(package.read(path))
+    except KeyError:
+        return {}
+
+    base = posixpath.dirname(part)
+    rels = {}
+    for rel in root.iter(f"{{{REL_NS}}}Relationship"):
+        if rel.get("TargetMode") == "External":
+            continue
+        target = rel.get("Target", "")
+        resolved = target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join(base, target))
+        rels[rel.get("Id")] = (rel.get("Type", ""), resolved)
+    return rels
+
+
+def find_rel(rels: Dict[str, Tuple[str, str]], rel_type: str) -> Optional[str]:
+    """Target of the first relationship whose type ends with rel_type."""
+    for kind, target in rels.values():
+        if kind.endswith(rel_type):
+            return target
+    return None
+
+
+def main_part(package: zipfile.ZipFile, default: str) -> str:
+    """The package's main document part, per _rels/.rels."""
+    return find_rel(read_rels(package), "/officeDocument") or default
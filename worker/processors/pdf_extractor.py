@@ -1,54 +1,607 @@
-import pdfplumber
-from io import BytesIO
+import io
+import os
+import re
+import gc
+import ctypes
+import time
+import shutil
 import logging
+import unicodedata
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from jobs import report_progress
+from metrics import PAGES, PDF_PAGE_TIERS
+from processors.sources import FileSource, TextSpool, open_stream
 
 logger = logging.getLogger(__name__)
 
-def extract_text_from_pdf(pdf_bytes: bytes) -> str:
-    """
-    Extract text from PDF using pdfplumber.
-    Handles Indic Unicode scripts gracefully.
+# Parallel extraction configuration
+PDF_PARALLEL = os.getenv("PDF_PARALLEL", "false").lower() in ("1", "true", "yes")
+# Default leaves a core for the request thread; with one worker or fewer, extraction stays sequential
+PDF_PARALLEL_WORKERS = int(os.getenv("PDF_PARALLEL_WORKERS", "0")) or min((os.cpu_count() or 1) - 1, 8)
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "40"))
+# Ranges per worker; more, smaller ranges balance uneven pages better
+PDF_RANGES_PER_WORKER = 4
 
-    Args:
-        pdf_bytes: Raw PDF file bytes
+# "layout": pdfplumber for every page; "tiered": pdfium text layer first,
+# pdfplumber layout analysis only for pages that look wrong. Tiered text differs
+# from layout text (line breaks, spacing), so it is opt-in.
+PDF_EXTRACTION_MODE = os.getenv("PDF_EXTRACTION_MODE", "layout").lower()
+# Skip the layout tier when its predicted cost for a page exceeds this; once a page
+# actually takes longer, the rest of that document stays on the fast tier
+PDF_PAGE_BUDGET_SECONDS = float(os.getenv("PDF_PAGE_BUDGET_SECONDS", "5"))
+# Upward jumps between text lines beyond this suggest out-of-order text runs
+PDF_TIER_MAX_BACKTRACKS = int(os.getenv("PDF_TIER_MAX_BACKTRACKS", "2"))
+# Share of Indic characters that may be orphaned marks / placeholder glyphs
+PDF_TIER_INDIC_ERROR_RATIO = float(os.getenv("PDF_TIER_INDIC_ERROR_RATIO", "0.02"))
 
-    Returns:
-        Extracted text with page markers
+# Indic blocks (Devanagari..Sinhala), private-use glyphs, U+FFFD and the dotted circle
+_SUSPECT_TEXT = re.compile("[\u0900-\u0DFF\uE000-\uF8FF\uFFFD\u25CC]")
+_CONTROL_CHARS = dict.fromkeys([*range(0, 9), 11, 12, *range(14, 32), 0xFFFE])
 
-    Raises:
-        Exception: If extraction fails completely
+# Memory ceiling (RSS of this process plus its PDF pool workers; 0 disables).
+# Past PDF_MEMORY_SOFT_RATIO of it extraction degrades to sequential,
+# fast-tier-only, cache-releasing processing; past the ceiling it fails cleanly.
+PDF_MEMORY_CEILING_MB = int(os.getenv("PDF_MEMORY_CEILING_MB", "0"))
+PDF_MEMORY_SOFT_RATIO = float(os.getenv("PDF_MEMORY_SOFT_RATIO", "0.8"))
+PDF_MEMORY_CHECK_PAGES = 5
+# Extracted text past this size is spooled to disk rather than kept in memory
+PDF_TEXT_SPOOL_BYTES = int(os.getenv("PDF_TEXT_SPOOL_MB", "8")) * 1024 * 1024
+
+# pdfium is not thread-safe; job threads may extract PDFs concurrently
+_pdfium_lock = threading.Lock()
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """Get the shared page-extraction process pool, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn, not fork: the worker forks from a multi-threaded process
+            _pool = ProcessPoolExecutor(
+                max_workers=PDF_PARALLEL_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def _reset_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            # Workers exit (and free their memory) once their current range finishes
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _pool_pids() -> List[int]:
+    with _pool_lock:
+        return list((getattr(_pool, "_processes", None) or {}).keys()) if _pool is not None else []
+
+
+def _rss_bytes(pids: Iterable[int] = ()) -> int:
+    """Resident memory of this process plus the given processes (Linux /proc; 0 elsewhere)."""
+    total = 0
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    for pid in ["self", *pids]:
+        try:
+            with open(f"/proc/{pid}/statm") as f:
+                total += int(f.read().split()[1]) * page_size
+        except (OSError, ValueError, IndexError):
+            pass
+    return total
+
+
+def _release_memory() -> None:
+    """Collect garbage and hand freed heap pages back to the OS where glibc allows it."""
+    gc.collect()
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+class PdfMemoryError(Exception):
+    """Raised when extraction stays above PDF_MEMORY_CEILING_MB even in low-memory mode."""
+
+
+class _MemoryGuard:
+    """Tracks RSS against PDF_MEMORY_CEILING_MB and decides when to degrade or give up."""
+
+    def __init__(self, ceiling_mb: int = PDF_MEMORY_CEILING_MB):
+        self.ceiling = ceiling_mb * 1024 * 1024
+        self.low_memory = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.ceiling > 0
+
+    def check(self, pids: Iterable[int] = ()) -> bool:
+        """Switch to low-memory mode once RSS passes the soft limit; returns whether it is on."""
+        if self.enabled and not self.low_memory:
+            rss = _rss_bytes(pids)
+            if rss > self.ceiling * PDF_MEMORY_SOFT_RATIO:
+                self.low_memory = True
+                logger.warning(
+                    f"PDF extraction at {rss // (1024 * 1024)} MB of {self.ceiling // (1024 * 1024)} MB ceiling; "
+                    f"switching to sequential low-memory mode"
+                )
+        return self.low_memory
+
+    def enforce(self) -> None:
+        """Fail the extraction, rather than the whole process, if the ceiling is still exceeded."""
+        if not self.enabled or _rss_bytes() <= self.ceiling:
+            return
+        _release_memory()
+        rss = _rss_bytes()
+        if rss > self.ceiling:
+            raise PdfMemoryError(
+                f"PDF extraction exceeded memory ceiling ({rss // (1024 * 1024)} MB > {self.ceiling // (1024 * 1024)} MB)"
+            )
+
+
+def _extract_page(page, page_num: int) -> Optional[str]:
+    """Extract one page; failures are logged and isolated to that page."""
+    try:
+        return page.extract_text()
+    except Exception as e:
+        logger.warning(f"Failed to extract text from page {page_num}: {str(e)}")
+        return None
+
+
+class _IndependentReader(io.RawIOBase):
+    """
+    Separate read position over a stream that pdfminer is also reading.
+
+    pdfium reads through seek + readinto callbacks; restoring the underlying
+    position after each read keeps pdfminer's buffered parser in step.
     """
+
+    def __init__(self, fp):
+        self._fp = fp
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_END:
+            saved = self._fp.tell()
+            self._pos = self._fp.seek(0, io.SEEK_END) + offset
+            self._fp.seek(saved)
+        elif whence == io.SEEK_CUR:
+            self._pos += offset
+        else:
+            self._pos = offset
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+    def readinto(self, buffer) -> int:
+        saved = self._fp.tell()
+        try:
+            self._fp.seek(self._pos)
+            data = self._fp.read(len(buffer))
+        finally:
+            self._fp.seek(saved)
+        buffer[:len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
+
+class _LayoutCostModel:
+    """EWMA of pdfplumber seconds per character, to predict a page's layout-tier cost."""
+
+    def __init__(self, seconds_per_char: float = 5e-5, alpha: float = 0.2):
+        self.seconds_per_char = seconds_per_char
+        self.alpha = alpha
+        self._lock = threading.Lock()
+
+    def estimate(self, chars: int) -> float:
+        return chars * self.seconds_per_char
+
+    def observe(self, chars: int, seconds: float) -> None:
+        if chars <= 0:
+            return
+        with self._lock:
+            self.seconds_per_char += self.alpha * (seconds / chars - self.seconds_per_char)
+
+
+_layout_cost = _LayoutCostModel()
+
+
+def _normalise_fast_text(text: str) -> str:
+    """Match pdfplumber's shape: \n line breaks, no trailing spaces, no control characters."""
+    text = text.replace("\r\n", "\n").replace("\r", "\n").translate(_CONTROL_CHARS)
+    return "\n".join(line.rstrip() for line in text.split("\n")).strip("\n")
+
+
+def _indic_shaping_broken(text: str) -> bool:
+    """Combining marks with no base letter, or placeholder glyphs, point to bad ToUnicode maps."""
+    if not _SUSPECT_TEXT.search(text):
+        return False
+
+    indic = bad = 0
+    prev_category = "Zs"
+    for ch in text:
+        code = ord(ch)
+        category = unicodedata.category(ch)
+        if 0x0900 <= code <= 0x0DFF:
+            indic += 1
+            if category in ("Mn", "Mc") and prev_category[0] not in "LM":
+                bad += 1
+        elif 0xE000 <= code <= 0xF8FF or code in (0xFFFD, 0x25CC):
+            bad += 1
+        prev_category = category
+    return bad > max(2, PDF_TIER_INDIC_ERROR_RATIO * max(indic, 1))
+
+
+def _count_backtracks(rects: List[Tuple[float, float, float, float]]) -> int:
+    """Times the text runs jump back up the page by more than a line (left, bottom, right, top)."""
+    count = 0
+    prev_top = None
+    for _, bottom, _, top in rects:
+        if prev_top is not None and top - prev_top > max(top - bottom, 1.0):
+            count += 1
+        prev_top = top
+    return count
+
+
+def _page_count(pdf_file) -> Optional[int]:
+    """Page count from pdfium's page tree, without building pdfplumber's page objects."""
     try:
-        pdf_file = BytesIO(pdf_bytes)
-        text_parts = []
+        import pypdfium2
+
+        with _pdfium_lock:
+            document = pypdfium2.PdfDocument(_IndependentReader(pdf_file))
+            try:
+                return len(document)
+            finally:
+                document.close()
+    except Exception as e:
+        logger.warning(f"pdfium could not count pages, using pdfplumber: {str(e)}")
+        return None
+
+
+class _PageSource:
+    """
+    Per-page text for one open PDF, tier by tier.
 
-        with pdfplumber.open(pdf_file) as pdf:
-            total_pages = len(pdf.pages)
-            logger.info(f"Processing PDF with {total_pages} pages")
+    The pdfium text layer is read first. pdfplumber (opened lazily) handles
+    pages where that looks wrong: no text despite characters on the page,
+    broken Indic shaping, or runs jumping around the page. Its predicted
+    cost must fit within PDF_PAGE_BUDGET_SECONDS, and after one page overruns
+    it the remaining pages keep their fast text.
+    """
+
+    def __init__(self, pdf_file, mode: str = PDF_EXTRACTION_MODE, pages: Optional[List[int]] = None):
+        self.pdf_file = pdf_file
+        self.pages = pages
+        self.low_memory = False
+        self.over_budget = False
+        self._fast = None
+        self._plumber = None
+
+        if mode == "tiered":
+            try:
+                import pypdfium2
+
+                with _pdfium_lock:
+                    self._fast = pypdfium2.PdfDocument(_IndependentReader(pdf_file))
+            except Exception as e:
+                logger.warning(f"pdfium could not open PDF, using layout extraction for every page: {str(e)}")
+
+        if self._fast is not None:
+            with _pdfium_lock:
+                self.total_pages = len(self._fast)
+        elif pages is None:
+            self.total_pages = _page_count(pdf_file) or len(self.plumber.pages)
+        else:
+            self.total_pages = None
+
+    @property
+    def plumber(self):
+        if self._plumber is None:
+            import pdfplumber
+
+            self.pdf_file.seek(0)
+            self._plumber = pdfplumber.open(self.pdf_file, pages=self.pages)
+        return self._plumber
+
+    def close(self) -> None:
+        if self._plumber is not None:
+            self._plumber.close()
+        if self._fast is not None:
+            with _pdfium_lock:
+                self._fast.close()
 
-            for page_num, page in enumerate(pdf.pages, 1):
+    def _plumber_page(self, page_num: int):
+        index = page_num - 1 if self.pages is None else self.pages.index(page_num)
+        return self.plumber.pages[index]
+
+    def _layout_text(self, page_num: int) -> Optional[str]:
+        """pdfplumber text for a page, dropping its parsed objects and layout afterwards."""
+        page = self._plumber_page(page_num)
+        try:
+            return _extract_page(page, page_num)
+        finally:
+            page.flush_cache()
+            page.get_textmap.cache_clear()
+            if self.low_memory:
+                self.release()
+
+    def release(self) -> None:
+        """Drop pdfminer's per-document object caches (re-read from the file if needed again)."""
+        if self._plumber is not None:
+            for cache in ("_cached_objs", "_parsed_objs"):
+                getattr(self._plumber.doc, cache, {}).clear()
+
+    def _fast_page(self, page_num: int) -> Tuple[str, int, int]:
+        """(text, character count, backtracks) from the pdfium text layer."""
+        with _pdfium_lock:
+            page = self._fast[page_num - 1]
+            try:
+                textpage = page.get_textpage()
                 try:
-                    page_text = page.extract_text()
+                    chars = textpage.count_chars()
+                    text = textpage.get_text_bounded()
+                    rects = [textpage.get_rect(i) for i in range(textpage.count_rects())]
+                finally:
+                    textpage.close()
+            finally:
+                page.close()
+        return _normalise_fast_text(text), chars, _count_backtracks(rects)
+
+    def _layout_page(self, page_num: int, chars: int) -> Optional[str]:
+        started = time.perf_counter()
+        text = self._layout_text(page_num)
+        elapsed = time.perf_counter() - started
+        _layout_cost.observe(chars, elapsed)
+        if elapsed > PDF_PAGE_BUDGET_SECONDS:
+            self.over_budget = True
+            logger.warning(
+                f"Layout extraction of page {page_num} took {elapsed:.1f}s (budget {PDF_PAGE_BUDGET_SECONDS}s); "
+                f"remaining pages stay on the fast tier"
+            )
+        return text
+
+    def extract(self, page_num: int) -> Tuple[Optional[str], str, str]:
+        """(text, tier, reason) for a 1-based page number."""
+        if self._fast is None:
+            return self._layout_text(page_num), "layout", "mode"
+
+        try:
+            text, chars, backtracks = self._fast_page(page_num)
+        except Exception as e:
+            logger.warning(f"Fast text pass failed on page {page_num}: {str(e)}")
+            return self._layout_text(page_num), "layout", "error"
+
+        if chars == 0:
+            return None, "empty", ""
+
+        if not text.strip():
+            reason = "empty"
+        elif _indic_shaping_broken(text):
+            reason = "indic"
+        elif backtracks > PDF_TIER_MAX_BACKTRACKS:
+            reason = "columns"
+        else:
+            return text, "fast", ""
 
-                    if page_text and page_text.strip():
-                        text_parts.append(f"[Page {page_num}/{total_pages}]\n{page_text}")
+        if self.low_memory:
+            return text or None, "fast", "low_memory"
 
-                    # Log progress every 10 pages
-                    if page_num % 10 == 0:
-                        logger.info(f"Processed {page_num}/{total_pages} pages")
+        if self.over_budget or _layout_cost.estimate(chars) > PDF_PAGE_BUDGET_SECONDS:
+            logger.info(f"Page {page_num} needs layout ({reason}) but is over budget; keeping fast text")
+            return text or None, "fast", "over_budget"
 
+        logger.info(f"Page {page_num}: layout tier ({reason})")
+        layout_text = self._layout_page(page_num, chars)
+        if layout_text is None:
+            return text or None, "fast", "layout_failed"
+        return layout_text, "layout", reason
+
+
+def _extract_page_range(path: str, first_page: int, last_page: int, mode: str = PDF_EXTRACTION_MODE) -> List[Tuple[int, Optional[str], str, str]]:
+    """Pool task: open the shared temp file and extract pages first..last (1-based)."""
+    results = []
+    with open(path, "rb") as pdf_file:
+        source = _PageSource(pdf_file, mode, pages=list(range(first_page, last_page + 1)))
+        try:
+            for page_num in range(first_page, last_page + 1):
+                results.append((page_num,) + source.extract(page_num))
+        finally:
+            source.close()
+    return results
+
+
+def _page_ranges(total_pages: int, workers: int) -> List[Tuple[int, int]]:
+    count = min(total_pages, workers * PDF_RANGES_PER_WORKER)
+    size, extra = divmod(total_pages, count)
+    ranges = []
+    start = 1
+    for i in range(count):
+        end = start + size - 1 + (1 if i < extra else 0)
+        ranges.append((start, end))
+        start = end + 1
+    return ranges
+
+
+def _iter_parallel(pdf_file, total_pages: int, mode: str) -> Iterator[Tuple[int, Optional[str], str, str]]:
+    """Spread page ranges across the process pool; yields (page, text, tier, reason) in page order."""
+    ready: Dict[int, Tuple[Optional[str], str, str]] = {}
+    next_page = 1
+
+    # Workers open the PDF independently from one shared temp file
+    with tempfile.NamedTemporaryFile(suffix=".pdf") as shared:
+        pdf_file.seek(0)
+        shutil.copyfileobj(pdf_file, shared)
+        shared.flush()
+
+        pool = _get_pool()
+        futures = {
+            pool.submit(_extract_page_range, shared.name, first, last, mode): (first, last)
+            for first, last in _page_ranges(total_pages, PDF_PARALLEL_WORKERS)
+        }
+
+        done = 0
+        try:
+            for future in as_completed(futures):
+                first, last = futures[future]
+                try:
+                    ready.update((page_num, rest) for page_num, *rest in future.result())
+                except BrokenProcessPool:
+                    raise
                 except Exception as e:
-                    logger.warning(f"Failed to extract text from page {page_num}: {str(e)}")
-                    continue
+                    logger.warning(f"Failed to extract pages {first}-{last}: {str(e)}")
+                    ready.update((page_num, (None, "failed", "error")) for page_num in range(first, last + 1))
+
+                done += last - first + 1
+                report_progress(done, total_pages, "pages")
+                logger.info(f"Processed {done}/{total_pages} pages")
+
+                # Release the contiguous prefix so callers can start on it
+                while next_page in ready:
+                    yield (next_page,) + tuple(ready.pop(next_page))
+                    next_page += 1
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def iter_page_texts(
+    source: FileSource,
+    parallel: Optional[bool] = None,
+    mode: Optional[str] = None,
+) -> Iterator[Tuple[int, int, Optional[str]]]:
+    """
+    Yield (page_num, total_pages, text) for every page, in page order.
+
+    Text is None for pages that failed or had no text layer. The tier that
+    produced each page is counted in the pdf page-tier metric and logged.
 
-        full_text = "\n\n".join(text_parts)
+    With PDF_MEMORY_CEILING_MB set, crossing its soft limit stops the process
+    pool and finishes sequentially on the fast tier only, releasing parser
+    caches as it goes; staying above the ceiling raises PdfMemoryError.
+    """
+    pdf_file = open_stream(source)
+
+    if parallel is None:
+        parallel = PDF_PARALLEL
+    mode = mode or PDF_EXTRACTION_MODE
+    tiers: Dict[str, int] = {}
+
+    def record(tier: str, reason: str) -> None:
+        PDF_PAGE_TIERS.inc(tier=tier, reason=reason)
+        label = f"{tier}:{reason}" if reason else tier
+        tiers[label] = tiers.get(label, 0) + 1
+
+    guard = _MemoryGuard()
+    pages = _PageSource(pdf_file, mode)
+    try:
+        total_pages = pages.total_pages
+        logger.info(f"Processing PDF with {total_pages} pages")
+
+        next_page = 1
+        if parallel and PDF_PARALLEL_WORKERS > 1 and total_pages >= PDF_PARALLEL_MIN_PAGES and guard.check(_pool_pids()):
+            # Idle pool workers count against the ceiling too
+            _reset_pool()
+            _release_memory()
+        elif parallel and PDF_PARALLEL_WORKERS > 1 and total_pages >= PDF_PARALLEL_MIN_PAGES:
+            ranges = _iter_parallel(pdf_file, total_pages, mode)
+            try:
+                for page_num, page_text, tier, reason in ranges:
+                    record(tier, reason)
+                    yield page_num, total_pages, page_text
+                    next_page = page_num + 1
+                    if page_num % PDF_MEMORY_CHECK_PAGES == 0 and guard.check(_pool_pids()):
+                        logger.warning(f"Stopping PDF process pool at page {page_num} to stay under memory ceiling")
+                        ranges.close()
+                        _reset_pool()
+                        _release_memory()
+                        break
+            except BrokenProcessPool as e:
+                logger.warning(f"PDF process pool failed, continuing sequentially from page {next_page}: {str(e)}")
+                _reset_pool()
+
+        pages.low_memory = guard.low_memory
+        for page_num in range(next_page, total_pages + 1):
+            if guard.enabled and page_num % PDF_MEMORY_CHECK_PAGES == 0:
+                pages.low_memory = guard.check()
+                guard.enforce()
+            page_text, tier, reason = pages.extract(page_num)
+            record(tier, reason)
+            yield page_num, total_pages, page_text
+
+            report_progress(page_num, total_pages, "pages")
+
+            # Log progress every 10 pages
+            if page_num % 10 == 0:
+                logger.info(f"Processed {page_num}/{total_pages} pages")
+
+        PAGES.inc(total_pages, route="pdf")
+        logger.info(f"PDF page tiers: {tiers}")
+    finally:
+        pages.close()
+
+
+def iter_text_from_pdf(source: FileSource, parallel: Optional[bool] = None) -> Iterator[str]:
+    """
+    Stream extracted text as pages complete.
+
+    Concatenating the yielded pieces gives exactly extract_text_from_pdf's output.
+
+    Raises:
+        Exception: If extraction fails completely
+    """
+    try:
+        chars = 0
+        for page_num, total_pages, page_text in iter_page_texts(source, parallel):
+            if page_text and page_text.strip():
+                piece = f"[Page {page_num}/{total_pages}]\n{page_text}"
+                yield piece if not chars else f"\n\n{piece}"
+                chars += len(piece) + (2 if chars else 0)
 
-        if not full_text.strip():
+        if not chars:
             raise Exception("No text could be extracted from PDF")
 
-        logger.info(f"Successfully extracted {len(full_text)} characters")
-        return full_text
+        logger.info(f"Successfully extracted {chars} characters")
 
     except Exception as e:
         logger.error(f"PDF extraction error: {str(e)}")
-        raise Exception(f"Failed to extract text from PDF: {str(e)}")
\ No newline at end of file
+        raise Exception(f"Failed to extract text from PDF: {str(e)}")
+
+
+def extract_text_from_pdf(source: FileSource, parallel: Optional[bool] = None) -> str:
+    """
+    Extract text from PDF with pdfplumber layout analysis, or in tiered mode
+    from the pdfium text layer with layout only for pages that need it
+    (see PDF_EXTRACTION_MODE).
+    Handles Indic Unicode scripts gracefully.
+
+    Args:
+        source: Raw PDF bytes, a memoryview, or an open binary file
+        parallel: Split page ranges across a process pool (defaults to PDF_PARALLEL)
+
+    Returns:
+        Extracted text with page markers
+
+    Raises:
+        Exception: If extraction fails completely
+    """
+    with TextSpool(PDF_TEXT_SPOOL_BYTES) as spool:
+        for piece in iter_text_from_pdf(source, parallel):
+            spool.write(piece)
+        return spool.getvalue()
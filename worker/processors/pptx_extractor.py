@@ -1,17 +1,161 @@
-def extract(file_bytes: bytes) -> str:
-    from pptx import Presentation
-    import io
+"""
+PPTX text extraction from the slide and notes XML parts, read straight from the zip.
+
+Covers text in grouped shapes, tables and speaker notes. Pictures, video and
+other media parts are never read.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional
+
+from jobs import report_progress
+from metrics import PAGES
+from processors.ooxml import MC_NS, find_rel, main_part, open_package, read_rels
+from processors.sources import FileSource
+
+# Spread slides over a thread pool (zlib and lxml parsing release the GIL)
+PPTX_PARALLEL = os.getenv("PPTX_PARALLEL", "false").lower() in ("1", "true", "yes")
+PPTX_PARALLEL_WORKERS = int(os.getenv("PPTX_PARALLEL_WORKERS", "4"))
+PPTX_PARALLEL_MIN_SLIDES = int(os.getenv("PPTX_PARALLEL_MIN_SLIDES", "40"))
+
+A = "{http://schemas.openxmlformats.org/drawingml/2006/main}"
+P = "{http://schemas.openxmlformats.org/presentationml/2006/main}"
+R = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+MC = f"{{{MC_NS}}}"
+
+
+def _text_body(element) -> str:
+    """Text of a p:txBody / a:txBody: paragraphs joined by newlines, like python-pptx shape.text."""
+    paragraphs = []
+    for paragraph in element.iterchildren(f"{A}p"):
+        parts = []
+        for child in paragraph:
+            if child.tag in (f"{A}r", f"{A}fld"):
+                text = child.find(f"{A}t")
+                parts.append((text.text or "") if text is not None else "")
+            elif child.tag == f"{A}br":
+                parts.append("\n")
+        paragraphs.append("".join(parts))
+    return "\n".join(paragraphs)
+
+
+def _table_text(table) -> str:
+    """One ' | '-joined line per row; merged-over cells are skipped."""
+    lines = []
+    for row in table.iterchildren(f"{A}tr"):
+        cells = []
+        for cell in row.iterchildren(f"{A}tc"):
+            if cell.get("hMerge") in ("1", "true") or cell.get("vMerge") in ("1", "true"):
+                continue
+            body = cell.find(f"{A}txBody")
+            text = _text_body(body).strip() if body is not None else ""
+            if text:
+                cells.append(text)
+        if cells:
+            lines.append(" | ".join(cells))
+    return "\n".join(lines)
+
+
+def _shape_texts(tree) -> Iterator[str]:
+    """Non-empty text of every shape under a shape tree or group, in z-order."""
+    for shape in tree:
+        tag = shape.tag
+        if tag == f"{P}sp":
+            body = shape.find(f"{P}txBody")
+            text = _text_body(body).strip() if body is not None else ""
+        elif tag == f"{P}grpSp":
+            yield from _shape_texts(shape)
+            continue
+        elif tag == f"{P}graphicFrame":
+            table = shape.find(f"{A}graphic/{A}graphicData/{A}tbl")
+            text = _table_text(table) if table is not None else ""
+        elif tag == f"{MC}AlternateContent":
+            # The first choice is what PowerPoint renders; fallbacks repeat it
+            choice = shape.find(f"{MC}Choice")
+            if choice is not None:
+                yield from _shape_texts(choice)
+            continue
+        else:
+            continue
+        if text:
+            yield text
+
+
+def _notes_text(package, notes_part: Optional[str]) -> str:
+    """Speaker notes: the body placeholder of the slide's notes part."""
+    from lxml import etree
+
+    if not notes_part:
+        return ""
+    try:
+        root = etree.fromstring(package.read(notes_part))
+    except KeyError:
+        return ""
+    for shape in root.iter(f"{P}sp"):
+        placeholder = shape.find(f"{P}nvSpPr/{P}nvPr/{P}ph")
+        if placeholder is not None and placeholder.get("type") == "body":
+            body = shape.find(f"{P}txBody")
+            return _text_body(body).strip() if body is not None else ""
+    return ""
+
+
+def slide_parts(package) -> List[str]:
+    """Slide part paths in presentation order (p:sldIdLst), not zip or file-name order."""
+    from lxml import etree
+
+    presentation = main_part(package, "ppt/presentation.xml")
+    rels = read_rels(package, presentation)
+    root = etree.fromstring(package.read(presentation))
+    slide_ids = root.find(f"{P}sldIdLst")
+    return [
+        rels[slide_id.get(f"{R}id")][1]
+        for slide_id in (slide_ids if slide_ids is not None else ())
+        if slide_id.get(f"{R}id") in rels
+    ]
+
+
+def slide_text(package, part: str, number: int) -> Optional[str]:
+    """'Slide n:' block for one slide, or None when it has no text."""
+    from lxml import etree
+
+    root = etree.fromstring(package.read(part))
+    tree = root.find(f"{P}cSld/{P}spTree")
+    lines = [f"Slide {number}:"]
+    lines.extend(_shape_texts(tree if tree is not None else ()))
+
+    notes = _notes_text(package, find_rel(read_rels(package, part), "/notesSlide"))
+    if notes:
+        lines.append(f"Notes: {notes}")
+    return "\n".join(lines) if len(lines) > 1 else None
+
+
+def extract(source: FileSource, parallel: Optional[bool] = None) -> str:
+    if parallel is None:
+        parallel = PPTX_PARALLEL
 
     try:
-        prs = Presentation(io.BytesIO(file_bytes))
-        slides = []
-        for i, slide in enumerate(prs.slides, 1):
-            slide_lines = [f"Slide {i}:"]
-            for shape in slide.shapes:
-                if hasattr(shape, "text") and shape.text and shape.text.strip():
-                    slide_lines.append(shape.text.strip())
-            if len(slide_lines) > 1:
-                slides.append("\n".join(slide_lines))
+        with open_package(source) as package:
+            parts = slide_parts(package)
+            numbered = list(enumerate(parts, 1))
+
+            if parallel and PPTX_PARALLEL_WORKERS > 1 and len(parts) >= PPTX_PARALLEL_MIN_SLIDES:
+                pool = ThreadPoolExecutor(max_workers=PPTX_PARALLEL_WORKERS, thread_name_prefix="pptx")
+                results = pool.map(lambda item: slide_text(package, item[1], item[0]), numbered)
+            else:
+                pool = None
+                results = (slide_text(package, part, number) for number, part in numbered)
+
+            slides = []
+            try:
+                for number, text in enumerate(results, 1):
+                    if text:
+                        slides.append(text)
+                    report_progress(number, len(parts), "slides")
+            finally:
+                if pool is not None:
+                    pool.shutdown(cancel_futures=True)
+
+        PAGES.inc(len(parts), route="pptx")
         result = "\n\n".join(slides).strip()
         if not result:
             raise ValueError("No readable text found in PPTX")
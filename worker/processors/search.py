@@ -0,0 +1,305 @@
+"""Semantic search: cached query embeddings plus an optional in-memory per-owner vector index."""
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from jobs import stage
+from supabase_client import rest_request
+from processors.embedding_cache import EmbeddingCache
+from processors.embeddings import EMBEDDING_MODEL, get_voyage_client, vector_literal, voyage_embed
+
+logger = logging.getLogger(__name__)
+
+# The web app's search route embeds queries without an input_type; keep that by default
+SEARCH_INPUT_TYPE = os.getenv("SEARCH_INPUT_TYPE") or None
+SEARCH_QUERY_CACHE_SIZE = int(os.getenv("SEARCH_QUERY_CACHE_SIZE", "5000"))
+# Memory for in-process owner indexes (vectors + row data); 0 always uses the search_documents RPC
+SEARCH_INDEX_MAX_MB = int(os.getenv("SEARCH_INDEX_MAX_MB", "256"))
+# Reload an owner's index after this long, to pick up sections embedded by other processes
+SEARCH_INDEX_TTL_SECONDS = int(os.getenv("SEARCH_INDEX_TTL_SECONDS", "300"))
+SEARCH_INDEX_PAGE_SIZE = 1000
+
+SECTION_COLUMNS = "id,document_id,content,section_type,metadata,embedding"
+
+
+class IndexTooLarge(Exception):
+    """Raised when an owner's sections don't fit in the index budget."""
+
+
+def _parse_vector(value: Any):
+    import numpy as np
+
+    # PostgREST returns pgvector columns in their text form, '[0.1,0.2,...]'
+    if isinstance(value, str):
+        return np.fromstring(value.strip("[]"), dtype=np.float32, sep=",")
+    return np.asarray(value, dtype=np.float32)
+
+
+class OwnerIndex:
+    """Unit-normalised embedding matrix and row data for one owner's document_sections."""
+
+    def __init__(self, owner_id: str, rows: List[Dict[str, Any]], matrix):
+        self.owner_id = owner_id
+        self.rows = rows
+        self.matrix = matrix
+        self.loaded_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    @property
+    def nbytes(self) -> int:
+        return self.matrix.nbytes + sum(len(row.get("content") or "") for row in self.rows)
+
+    @property
+    def stale(self) -> bool:
+        return time.monotonic() - self.loaded_at > SEARCH_INDEX_TTL_SECONDS
+
+    @staticmethod
+    def normalise(vectors):
+        import numpy as np
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (vectors / norms).astype(np.float32, copy=False)
+
+    def search(self, query_vector, limit: int, threshold: float) -> List[Dict[str, Any]]:
+        """Exact cosine top-k, same scoring as search_documents (1 - cosine distance)."""
+        import numpy as np
+
+        with self.lock:
+            matrix, rows = self.matrix, self.rows
+        if not rows or limit < 1:
+            return []
+
+        similarities = matrix @ query_vector
+        candidates = np.flatnonzero(similarities > threshold)
+        if len(candidates) > limit:
+            top = np.argpartition(similarities[candidates], -limit)[-limit:]
+            candidates = candidates[top]
+        ordered = candidates[np.argsort(-similarities[candidates], kind="stable")]
+        return [dict(rows[i], similarity=float(similarities[i])) for i in ordered]
+
+    def replace_document(self, document_id: str, rows: List[Dict[str, Any]], vectors) -> None:
+        """Swap in a document's freshly embedded sections without reloading the owner."""
+        import numpy as np
+
+        with self.lock:
+            keep = [i for i, row in enumerate(self.rows) if row["document_id"] != document_id]
+            matrix = self.matrix[keep] if len(keep) != len(self.rows) else self.matrix
+            if len(rows):
+                matrix = np.vstack([matrix, self.normalise(vectors)]) if len(matrix) else self.normalise(vectors)
+            self.rows = [self.rows[i] for i in keep] + rows
+            self.matrix = matrix
+
+
+class SearchIndex:
+    """LRU of per-owner indexes within SEARCH_INDEX_MAX_MB, loaded lazily on first search."""
+
+    def __init__(self, max_bytes: int = SEARCH_INDEX_MAX_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._owners: "OrderedDict[str, OwnerIndex]" = OrderedDict()
+        self._too_large: Dict[str, float] = {}
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._counters = {"memorySearches": 0, "rpcSearches": 0, "loads": 0, "incrementalUpdates": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(
+                self._counters,
+                owners=len(self._owners),
+                rows=sum(len(index.rows) for index in self._owners.values()),
+                bytes=sum(index.nbytes for index in self._owners.values()),
+            )
+
+    def _fetch_sections(self, filters: str, budget: int):
+        """Page through sections matching the filters, giving up once they exceed budget bytes."""
+        import numpy as np
+
+        rows: List[Dict[str, Any]] = []
+        vectors = []
+        size = 0
+        offset = 0
+        while True:
+            page = rest_request(
+                "GET",
+                f"document_sections?select={SECTION_COLUMNS},documents!inner(title,owner_id)"
+                f"&{filters}&embedding=not.is.null&order=id&limit={SEARCH_INDEX_PAGE_SIZE}&offset={offset}",
+            ).json()
+            for row in page:
+                vector = _parse_vector(row.pop("embedding"))
+                document = row.pop("documents", None) or {}
+                row["document_title"] = document.get("title")
+                rows.append(row)
+                vectors.append(vector)
+                size += vector.nbytes + len(row.get("content") or "")
+            if size > budget:
+                raise IndexTooLarge(f"{len(rows)}+ sections exceed {budget} bytes")
+            if len(page) < SEARCH_INDEX_PAGE_SIZE:
+                break
+            offset += SEARCH_INDEX_PAGE_SIZE
+
+        matrix = np.vstack(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+        return rows, matrix
+
+    def get(self, owner_id: str) -> Optional[OwnerIndex]:
+        """The owner's index, loading it if needed; None when it can't be held in memory."""
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            index = self._owners.get(owner_id)
+            if index is not None and not index.stale:
+                self._owners.move_to_end(owner_id)
+                return index
+            if time.monotonic() < self._too_large.get(owner_id, 0):
+                return None
+            load_lock = self._load_locks.setdefault(owner_id, threading.Lock())
+
+        # One load per owner at a time; concurrent searches wait for it
+        with load_lock:
+            with self._lock:
+                index = self._owners.get(owner_id)
+            if index is not None and not index.stale:
+                return index
+
+            started = time.perf_counter()
+            try:
+                with stage("search_index_load"):
+                    rows, matrix = self._fetch_sections(f"documents.owner_id=eq.{owner_id}", self.max_bytes)
+            except IndexTooLarge as e:
+                logger.info(f"Search index for owner {owner_id} not cached: {str(e)}")
+                with self._lock:
+                    self._too_large[owner_id] = time.monotonic() + SEARCH_INDEX_TTL_SECONDS
+                    self._owners.pop(owner_id, None)
+                return None
+
+            index = OwnerIndex(owner_id, rows, OwnerIndex.normalise(matrix) if len(rows) else matrix)
+            with self._lock:
+                self._owners[owner_id] = index
+                self._owners.move_to_end(owner_id)
+                self._counters["loads"] += 1
+                self._evict()
+            logger.info(
+                f"Loaded search index for owner {owner_id}: {len(rows)} sections, "
+                f"{index.nbytes} bytes in {(time.perf_counter() - started) * 1000:.0f} ms"
+            )
+            return index
+
+    def _evict(self) -> None:
+        total = sum(index.nbytes for index in self._owners.values())
+        while total > self.max_bytes and len(self._owners) > 1:
+            _, evicted = self._owners.popitem(last=False)
+            total -= evicted.nbytes
+
+    def refresh_document(self, document_id: str) -> None:
+        """Update the owning index in place after a document is (re-)embedded, if it is loaded."""
+        with self._lock:
+            if not self._owners:
+                return
+
+        owners = rest_request("GET", f"documents?id=eq.{document_id}&select=owner_id").json()
+        owner_id = owners[0]["owner_id"] if owners else None
+        with self._lock:
+            index = self._owners.get(owner_id)
+        if index is None:
+            return
+
+        rows, matrix = self._fetch_sections(f"document_id=eq.{document_id}", self.max_bytes)
+        index.replace_document(document_id, rows, matrix)
+        self._count("incrementalUpdates")
+        logger.info(f"Search index for owner {owner_id} updated with {len(rows)} sections of {document_id}")
+
+
+_query_cache = EmbeddingCache(max_entries=SEARCH_QUERY_CACHE_SIZE, table="")
+_index: Optional[SearchIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_search_index() -> SearchIndex:
+    """Get the process-wide search index, creating it on first use."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = SearchIndex()
+        return _index
+
+
+def get_query_cache() -> EmbeddingCache:
+    return _query_cache
+
+
+def embed_query(query: str):
+    """Unit-normalised query embedding, served from the LRU for repeated queries."""
+    import numpy as np
+
+    normalised = " ".join(query.split())
+    vo = get_voyage_client()
+    with stage("search_embed"):
+        embedding = _query_cache.embed(
+            [normalised],
+            EMBEDDING_MODEL,
+            SEARCH_INPUT_TYPE,
+            lambda texts: voyage_embed(vo, texts, SEARCH_INPUT_TYPE),
+        )[0]
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def search_sections(user_id: str, query: str, limit: int = 5, threshold: float = 0.7) -> Dict[str, Any]:
+    """
+    Semantic search over a user's document sections.
+
+    Args:
+        user_id: Owner whose documents are searched
+        query: Natural-language query
+        limit: Maximum number of results
+        threshold: Minimum cosine similarity
+
+    Returns:
+        Rows shaped like search_documents results, plus where they came from
+    """
+    started = time.perf_counter()
+    query_vector = embed_query(query)
+    index = get_search_index()
+
+    owner_index = index.get(user_id)
+    if owner_index is not None:
+        with stage("search", "memory"):
+            results = owner_index.search(query_vector, limit, threshold)
+        index._count("memorySearches")
+        source = "memory"
+    else:
+        with stage("search", "rpc"):
+            results = rest_request(
+                "POST",
+                "rpc/search_documents",
+                {
+                    "query_embedding": vector_literal(query_vector.tolist()),
+                    "match_threshold": threshold,
+                    "match_count": limit,
+                    "filter_user_id": user_id,
+                },
+                retry_unsafe=True,
+            ).json()
+        index._count("rpcSearches")
+        source = "rpc"
+
+    return {
+        "results": results,
+        "query": query,
+        "count": len(results),
+        "source": source,
+        "tookMs": round((time.perf_counter() - started) * 1000, 2),
+    }
@@ -0,0 +1,108 @@
+"""Helpers that let extractors take bytes, memoryviews or open files without copying."""
+import io
+import hashlib
+import tempfile
+from typing import BinaryIO, Union
+
+FileSource = Union[bytes, bytearray, memoryview, BinaryIO]
+
+
+class _MemoryviewReader(io.RawIOBase):
+    """Seekable read-only stream over a memoryview (BytesIO would copy it)."""
+
+    def __init__(self, view: memoryview):
+        self._view = view.cast("B") if view.format != "B" or view.ndim != 1 else view
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        n = min(len(buffer), len(self._view) - self._pos)
+        if n <= 0:
+            return 0
+        buffer[:n] = self._view[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            self._pos = offset
+        elif whence == io.SEEK_CUR:
+            self._pos += offset
+        elif whence == io.SEEK_END:
+            self._pos = len(self._view) + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        self._pos = max(self._pos, 0)
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+
+def open_stream(source: FileSource) -> BinaryIO:
+    """Return a seekable binary stream positioned at the start of the file."""
+    if isinstance(source, bytes):
+        # BytesIO shares an immutable bytes buffer until written to
+        return io.BytesIO(source)
+    if isinstance(source, (bytearray, memoryview)):
+        return io.BufferedReader(_MemoryviewReader(memoryview(source)))
+
+    source.seek(0)
+    return source
+
+
+def read_bytes(source: FileSource) -> Union[bytes, memoryview]:
+    """Return the whole file as a bytes-like object (for extractors that need one)."""
+    if isinstance(source, (bytes, memoryview)):
+        return source
+    if isinstance(source, bytearray):
+        return memoryview(source)
+
+    source.seek(0)
+    return source.read()
+
+
+def sha256_hex(source: FileSource) -> str:
+    """SHA-256 of the file contents, streamed so open files are not read into memory."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return hashlib.sha256(source).hexdigest()
+
+    source.seek(0)
+    digest = hashlib.file_digest(source, "sha256").hexdigest()
+    source.seek(0)
+    return digest
+
+
+class TextSpool:
+    """
+    Accumulates extracted text in a spooled temp file instead of a list of pieces.
+
+    Text stays in memory up to max_size bytes and moves to disk past that, so
+    large documents aren't held as pieces *and* as the joined string.
+    """
+
+    def __init__(self, max_size: int):
+        self._file = tempfile.SpooledTemporaryFile(max_size=max_size, mode="w+", encoding="utf-8")
+        self.length = 0
+
+    def write(self, text: str) -> None:
+        self._file.write(text)
+        self.length += len(text)
+
+    def getvalue(self) -> str:
+        self._file.seek(0)
+        return self._file.read()
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> "TextSpool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
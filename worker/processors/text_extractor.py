@@ -1,10 +1,14 @@
-def extract(file_bytes: bytes) -> str:
+from processors.sources import FileSource, read_bytes
+
+
+def extract(source: FileSource) -> str:
     try:
+        data = read_bytes(source)
         for encoding in ["utf-8", "latin-1", "cp1252"]:
             try:
-                return file_bytes.decode(encoding)
+                return str(data, encoding)
             except UnicodeDecodeError:
                 continue
-        return file_bytes.decode("utf-8", errors="replace")
+        return str(data, "utf-8", errors="replace")
     except Exception as exc:
         raise Exception(f"Text extraction failed: {exc}") from exc
@@ -0,0 +1,225 @@
+"""Opt-in per-request profiling: cProfile + tracemalloc, kept in a small on-disk ring buffer."""
+import os
+import io
+import json
+import time
+import uuid
+import random
+import pstats
+import cProfile
+import logging
+import tempfile
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from jobs import current_job
+
+logger = logging.getLogger(__name__)
+
+# Fraction of extract/embed/process requests profiled without being asked (0 = only on X-Profile)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+# Profiles kept; the oldest are deleted past this
+PROFILE_RETENTION = int(os.getenv("PROFILE_RETENTION", "20"))
+PROFILE_TOP_N = int(os.getenv("PROFILE_TOP_N", "30"))
+PROFILE_TRACEMALLOC_FRAMES = int(os.getenv("PROFILE_TRACEMALLOC_FRAMES", "1"))
+# Profiles are written here so any gunicorn worker can serve /debug/profiles/<id>
+PROFILE_DIR = os.getenv("PROFILE_DIR") or os.path.join(tempfile.gettempdir(), "manthan-worker-profiles")
+
+PROFILE_HEADER = "X-Profile"
+
+# tracemalloc is process-wide: started by the first active profile, stopped by the last
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+
+
+def should_profile(header_value: Optional[str]) -> bool:
+    """Whether this request is profiled: explicitly via the header, or by sampling."""
+    if header_value is not None:
+        return header_value.lower() in ("1", "true", "yes")
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def new_profile_id() -> str:
+    return uuid.uuid4().hex
+
+
+def _start_tracing() -> None:
+    global _tracing_users
+    with _tracing_lock:
+        if _tracing_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(PROFILE_TRACEMALLOC_FRAMES)
+        _tracing_users += 1
+
+
+def _stop_tracing() -> None:
+    global _tracing_users
+    with _tracing_lock:
+        _tracing_users -= 1
+        if _tracing_users == 0:
+            tracemalloc.stop()
+
+
+def _short_path(filename: str) -> str:
+    if "site-packages/" in filename:
+        return filename.split("site-packages/", 1)[1]
+    return os.path.relpath(filename) if filename.startswith("/") else filename
+
+
+def _top_functions(profile: cProfile.Profile) -> List[Dict[str, Any]]:
+    stats = pstats.Stats(profile, stream=io.StringIO())
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:PROFILE_TOP_N]
+    return [
+        {
+            "function": f"{_short_path(filename)}:{line}({name})",
+            "calls": calls,
+            "primitiveCalls": primitive,
+            "totalSeconds": round(total, 4),
+            "cumulativeSeconds": round(cumulative, 4),
+        }
+        for (filename, line, name), (primitive, calls, total, cumulative, _) in rows
+    ]
+
+
+def _top_allocations(before: tracemalloc.Snapshot, after: tracemalloc.Snapshot) -> List[Dict[str, Any]]:
+    filters = [
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+    ]
+    diff = after.filter_traces(filters).compare_to(before.filter_traces(filters), "lineno")
+    return [
+        {
+            "location": _short_path(str(stat.traceback)),
+            "sizeDiffBytes": stat.size_diff,
+            "sizeBytes": stat.size,
+            "countDiff": stat.count_diff,
+        }
+        for stat in diff[:PROFILE_TOP_N]
+    ]
+
+
+def _write(profile_id: str, record: Dict[str, Any], profile: cProfile.Profile) -> None:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    base = os.path.join(PROFILE_DIR, os.path.basename(profile_id))
+    profile.dump_stats(f"{base}.pstats")
+    tmp_path = f"{base}.json.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(record, f)
+    os.replace(tmp_path, f"{base}.json")
+    _prune()
+
+
+def _prune() -> None:
+    """Keep only the newest PROFILE_RETENTION profiles."""
+    try:
+        records = sorted(
+            (entry for entry in os.scandir(PROFILE_DIR) if entry.name.endswith(".json")),
+            key=lambda entry: entry.stat().st_mtime,
+        )
+        for entry in records[:max(0, len(records) - PROFILE_RETENTION)]:
+            for path in (entry.path, entry.path[:-len(".json")] + ".pstats"):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+    except OSError:
+        pass
+
+
+@contextmanager
+def profiled(kind: str, document_id: Optional[str], profile_id: Optional[str] = None) -> Iterator[str]:
+    """
+    Profile the block on this thread and store the result; yields the profile id.
+
+    cProfile sees only the calling thread (embedding/insert pool threads show up
+    as waits); tracemalloc covers the whole process, so concurrent requests
+    contribute to the allocation figures.
+    """
+    job = current_job()
+    profile_id = profile_id or (job.id if job is not None else new_profile_id())
+    _start_tracing()
+    tracemalloc.reset_peak()
+    before = tracemalloc.take_snapshot()
+    profile = cProfile.Profile()
+    started_at = time.time()
+    wall = time.perf_counter()
+    cpu = time.thread_time()
+    error = None
+
+    profile.enable()
+    try:
+        yield profile_id
+    except BaseException as e:
+        error = str(e)
+        raise
+    finally:
+        profile.disable()
+        wall = time.perf_counter() - wall
+        cpu = time.thread_time() - cpu
+        try:
+            after = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            with _tracing_lock:
+                concurrent = _tracing_users - 1
+            record = {
+                "profileId": profile_id,
+                "kind": kind,
+                "documentId": document_id,
+                "pid": os.getpid(),
+                "startedAt": started_at,
+                "wallSeconds": round(wall, 4),
+                "threadCpuSeconds": round(cpu, 4),
+                "peakTracedBytes": peak,
+                "concurrentProfiles": concurrent,
+                "stageTimings": job.to_dict()["timings"] if job is not None else {},
+                "error": error,
+                "topFunctions": _top_functions(profile),
+                "topAllocations": _top_allocations(before, after),
+            }
+            del before, after
+            _write(profile_id, record, profile)
+            logger.info(f"Stored profile {profile_id} for {kind} {document_id} ({wall:.2f}s, peak {peak // 1024} KiB traced)")
+        except Exception as e:
+            logger.warning(f"Failed to store profile {profile_id}: {str(e)}")
+        finally:
+            _stop_tracing()
+
+
+def wrap(fn: Callable[..., Dict[str, Any]], kind: str, document_id: Optional[str]) -> Callable[..., Dict[str, Any]]:
+    """Profile fn when it runs (on a job thread, the profile takes the job's id)."""
+    def run(*args, **kwargs):
+        with profiled(kind, document_id):
+            return fn(*args, **kwargs)
+    return run
+
+
+def list_profiles() -> List[Dict[str, Any]]:
+    """Summaries of the stored profiles, newest first."""
+    summaries = []
+    try:
+        entries = [entry for entry in os.scandir(PROFILE_DIR) if entry.name.endswith(".json")]
+    except OSError:
+        return []
+    for entry in sorted(entries, key=lambda entry: entry.stat().st_mtime, reverse=True):
+        record = get_profile(entry.name[:-len(".json")])
+        if record is not None:
+            summaries.append({
+                key: record.get(key)
+                for key in ("profileId", "kind", "documentId", "startedAt", "wallSeconds", "peakTracedBytes", "error")
+            })
+    return summaries
+
+
+def get_profile(profile_id: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(os.path.join(PROFILE_DIR, f"{os.path.basename(profile_id)}.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def pstats_path(profile_id: str) -> Optional[str]:
+    """Raw cProfile dump for `python -m pstats` / snakeviz, if it is still retained."""
+    path = os.path.join(PROFILE_DIR, f"{os.path.basename(profile_id)}.pstats")
+    return path if os.path.exists(path) else None
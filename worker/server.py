@@ -1,64 +1,57 @@
 import sys
 import os
+import time
+import logging
+from contextlib import nullcontext
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
 
-print("=" * 60)
-print("MANTHAN WORKER STARTUP DIAGNOSTICS")
-print("=" * 60)
-
-# Check environment variables first
-print("\n1. CHECKING ENVIRONMENT VARIABLES:")
-required_vars = ["SUPABASE_URL", "SUPABASE_SERVICE_ROLE_KEY", "VOYAGE_API_KEY", "WORKER_SECRET", "PORT"]
-for var in required_vars:
-    value = os.getenv(var)
-    if value:
-        # Mask secrets but show they exist
-        if "KEY" in var or "SECRET" in var:
-            print(f"   ✓ {var}: ***{value[-4:]} (length: {len(value)})")
-        else:
-            print(f"   ✓ {var}: {value}")
-    else:
-        print(f"   ✗ {var}: MISSING!")
-
-# Test imports one by one
-print("\n2. TESTING IMPORTS:")
-try:
-    print("   Importing flask...")
-    from flask import Flask, request, jsonify
-    print("   ✓ Flask imported")
-except Exception as e:
-    print(f"   ✗ Flask import failed: {e}")
-    sys.exit(1)
+_import_started = time.perf_counter()
+from flask import Flask, Response, g, request, jsonify, send_file
 
-try:
-    print("   Importing logging...")
-    import logging
-    logging.basicConfig(level=logging.INFO)
-    logger = logging.getLogger(__name__)
-    print("   ✓ Logging configured")
-except Exception as e:
-    print(f"   ✗ Logging failed: {e}")
-    sys.exit(1)
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+import startup
 
+startup.record_import_time("flask", time.perf_counter() - _import_started)
+
+# Extractor and client libraries (pdfplumber, voyageai, anthropic, ...) are
+# imported by their routes on first use, or up front with WORKER_PRELOAD
+_import_started = time.perf_counter()
 try:
-    print("   Importing main module...")
-    from main import extract_document_text, generate_document_embeddings
-    print("   ✓ Main module imported")
+    from main import (
+        BATCH_FILTER_IDS, BATCH_MAX_DOCUMENTS, extract_document_text, extract_documents_text, generate_document_embeddings,
+        generate_documents_embeddings, process_document, resolve_route,
+    )
+    from jobs import get_job_manager, QueueFullError
+    from admission import Overloaded, estimate_cost, get_admission_controller
+    from supabase_client import rest_request
+    import profiling
+    import outbound
+    from extraction_cache import get_extraction_cache
+    from processors.embedding_cache import get_embedding_cache
+    from processors.image_extractor import get_image_cache
+    from processors.search import get_query_cache, get_search_index, search_sections
+    import metrics
 except Exception as e:
-    print(f"   ✗ Main module import failed: {e}")
-    import traceback
-    traceback.print_exc()
+    logger.error(f"Main module import failed: {str(e)}", exc_info=True)
     sys.exit(1)
+startup.record_import_time("main", time.perf_counter() - _import_started)
+logger.info(f"Worker modules imported (ms): {startup.import_times()}")
 
-print("\n3. INITIALIZING FLASK APP:")
 app = Flask(__name__)
-print("   ✓ Flask app created")
 
 # Security check
 WORKER_SECRET = os.getenv("WORKER_SECRET")
 if not WORKER_SECRET:
-    print("   ✗ WORKER_SECRET not set!")
+    logger.error("WORKER_SECRET not set!")
     sys.exit(1)
-print(f"   ✓ Worker secret configured")
+
+# Async mode: endpoints return 202 + job id and run work on the job pool
+ASYNC_DEFAULT = os.getenv("WORKER_ASYNC_DEFAULT", "false").lower() in ("1", "true", "yes")
+# Most results a single /search may ask for
+SEARCH_MAX_LIMIT = int(os.getenv("SEARCH_MAX_LIMIT", "50"))
 
 def verify_auth():
     """Verify Authorization header."""
@@ -68,10 +61,210 @@ def verify_auth():
     token = auth_header.split("Bearer ")[1]
     return token == WORKER_SECRET
 
+def wants_async(data: dict) -> bool:
+    """Whether the caller opted into async (202 + polling) mode."""
+    flag = request.args.get("async")
+    if flag is None:
+        flag = data.get("async")
+    if flag is None:
+        return ASYNC_DEFAULT
+    return str(flag).lower() in ("1", "true", "yes")
+
+def search_params(data: dict):
+    """(limit, threshold) from a /search body; raises ValueError when either is out of range."""
+    limit = data.get("limit", 5)
+    if isinstance(limit, bool) or not isinstance(limit, int) or limit < 1:
+        raise ValueError("limit must be a positive integer")
+    threshold = data.get("threshold", 0.7)
+    if isinstance(threshold, bool) or not isinstance(threshold, (int, float)) or not -1 <= threshold <= 1:
+        raise ValueError("threshold must be a number between -1 and 1")
+    return min(limit, SEARCH_MAX_LIMIT), float(threshold)
+
+def wants_profile() -> bool:
+    """X-Profile header, or PROFILE_SAMPLE_RATE sampling; off costs one header lookup."""
+    return profiling.should_profile(request.headers.get(profiling.PROFILE_HEADER))
+
+def profile_request(kind: str, document_id: str):
+    """Profile a synchronous request if asked to; the id is returned in X-Profile-Id."""
+    if not wants_profile():
+        return nullcontext()
+    g.profile_id = profiling.new_profile_id()
+    return profiling.profiled(kind, document_id, g.profile_id)
+
+def submit_job(kind: str, document_id: str, fn, *args, endpoint: str, cost: float = 1.0):
+    """
+    Queue work on the job pool and answer 202 with the job id.
+
+    The job holds cost units of the endpoint's admission budget until it
+    finishes, so async and synchronous requests share one limit.
+
+    Raises:
+        Overloaded: If the endpoint is at capacity
+    """
+    profile = wants_profile()
+    if profile:
+        fn = profiling.wrap(fn, kind, document_id)
+    release = get_admission_controller().reserve(endpoint, cost)
+
+    def run(*args, **kwargs):
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            release()
+
+    try:
+        job = get_job_manager().submit(kind, document_id, run, *args)
+    except QueueFullError as e:
+        release()
+        response = jsonify({"error": str(e)})
+        response.headers["Retry-After"] = "5"
+        return response, 429
+
+    if profile:
+        # The profile is stored under the job id once the job finishes
+        g.profile_id = job.id
+    return jsonify({
+        "success": True,
+        "jobId": job.id,
+        "status": job.status,
+        "statusUrl": f"/jobs/{job.id}",
+    }), 202
+
+def stored_file_sizes(document_ids: List[str]) -> Dict[str, int]:
+    """documents.file_size_bytes by id; empty if the lookup fails, so cost falls back to the route alone."""
+    sizes: Dict[str, int] = {}
+    document_ids = [document_id for document_id in document_ids if document_id]
+    try:
+        for i in range(0, len(document_ids), BATCH_FILTER_IDS):
+            batch = document_ids[i:i + BATCH_FILTER_IDS]
+            rows = rest_request("GET", f"documents?id=in.({','.join(batch)})&select=id,file_size_bytes").json()
+            sizes.update({row["id"]: row["file_size_bytes"] for row in rows if row.get("file_size_bytes")})
+    except Exception as e:
+        logger.warning(f"File size lookup failed, admitting by route only: {str(e)}")
+    return sizes
+
+def request_cost(data: dict, stored_sizes: Optional[Dict[str, int]] = None) -> float:
+    """
+    Admission cost of an extraction request from its route and file size.
+
+    Callers don't usually send the size, so it is read from the documents row
+    (one lookup, or stored_sizes for a batch); fileSize in the body overrides it.
+    """
+    filename = data.get("filename") or urlparse(data.get("storageUrl") or "").path
+    route = resolve_route(data.get("mime_type") or data.get("mimeType"), filename)
+    size = data.get("fileSize") or data.get("file_size_bytes")
+    if not size:
+        document_id = data.get("documentId")
+        if stored_sizes is None:
+            stored_sizes = stored_file_sizes([document_id])
+        size = stored_sizes.get(document_id)
+    try:
+        return estimate_cost(route, int(size) if size else None)
+    except (TypeError, ValueError):
+        return estimate_cost(route)
+
+def batch_documents(data: dict, required: tuple):
+    """
+    Documents of a batch request, normalised, or an error message.
+
+    Accepts {"documents": [{...}, ...]}, or {"documentIds": [...]} when only ids are needed.
+    """
+    documents = data.get("documents")
+    if documents is None and required == ("documentId",):
+        documents = [{"documentId": document_id} for document_id in data.get("documentIds") or []]
+    if not isinstance(documents, list) or not documents:
+        return None, "Missing documents"
+    if len(documents) > BATCH_MAX_DOCUMENTS:
+        return None, f"Too many documents ({len(documents)}, limit {BATCH_MAX_DOCUMENTS})"
+
+    normalised = []
+    for document in documents:
+        if not isinstance(document, dict):
+            return None, "Each document must be an object"
+        document = {
+            "documentId": str(document.get("documentId") or "").strip(),
+            "storageUrl": document.get("storageUrl"),
+            "mimeType": document.get("mime_type") or document.get("mimeType"),
+            "filename": document.get("filename"),
+            "fileSize": document.get("fileSize") or document.get("file_size_bytes"),
+        }
+        missing = [key for key in required if not document[key]]
+        if missing:
+            return None, f"Missing {' or '.join(missing)} in documents"
+        normalised.append(document)
+
+    if len({document["documentId"] for document in normalised}) != len(normalised):
+        return None, "Duplicate documentId in documents"
+    return normalised, None
+
+def result_response(result: dict):
+    """200 on success, 503 + Retry-After when a provider's circuit was open, else 500."""
+    if result.get("success"):
+        return jsonify(result), 200
+    if "retryAfter" in result:
+        response = jsonify(result)
+        response.headers["Retry-After"] = str(result["retryAfter"])
+        return response, 503
+    return jsonify(result), 500
+
+def batch_status_code(result: dict) -> int:
+    """200 when every document succeeded, 500 when none did, 207 for a mix."""
+    if result["failed"] == 0:
+        return 200
+    return 500 if result["succeeded"] == 0 else 207
+
+def overloaded(e: Overloaded):
+    """429 with the controller's Retry-After estimate."""
+    response = jsonify({"error": str(e), "retryAfter": e.retry_after})
+    response.headers["Retry-After"] = str(e.retry_after)
+    return response, 429
+
+@app.before_request
+def track_request_start():
+    g.metrics_endpoint = request.endpoint or "unknown"
+    metrics.REQUESTS_INFLIGHT.inc(endpoint=g.metrics_endpoint)
+
+@app.before_request
+def start_deadline():
+    # Synchronous work must finish inside gunicorn's timeout; async jobs get their own budget
+    g.deadline_token = outbound.set_deadline(outbound.REQUEST_DEADLINE_SECONDS)
+
+@app.after_request
+def add_profile_header(response):
+    profile_id = g.pop("profile_id", None)
+    if profile_id is not None:
+        response.headers["X-Profile-Id"] = profile_id
+    return response
+
+@app.teardown_request
+def track_request_end(exc=None):
+    token = g.pop("deadline_token", None)
+    if token is not None:
+        outbound.reset_deadline(token)
+    endpoint = g.pop("metrics_endpoint", None)
+    if endpoint is not None:
+        metrics.REQUESTS_INFLIGHT.dec(endpoint=endpoint)
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """Per-stage latency and throughput in Prometheus text format."""
+    if not verify_auth():
+        return jsonify({"error": "Unauthorized"}), 401
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
 @app.route("/health", methods=["GET"])
 def health():
     """Health check."""
-    return jsonify({"status": "ok"})
+    return jsonify({
+        "status": "ok",
+        "extractionCache": get_extraction_cache().stats(),
+        "embeddingCache": get_embedding_cache().stats(),
+        "imageCache": get_image_cache().stats(),
+        "queryCache": get_query_cache().stats(),
+        "searchIndex": get_search_index().stats(),
+        "admission": get_admission_controller().stats(),
+        "outbound": outbound.stats(),
+    })
 
 @app.route("/extract", methods=["POST"])
 def extract():
@@ -90,11 +283,21 @@ def extract():
             return jsonify({"error": "Missing documentId or storageUrl"}), 400
 
         logger.info(f"Extraction request for document {document_id}")
-        result = extract_document_text(document_id, storage_url, mime_type, filename)
+        cost = request_cost(data)
+        if wants_async(data):
+            return submit_job(
+                "extract", document_id, extract_document_text,
+                document_id, storage_url, mime_type, filename, endpoint="extract", cost=cost,
+            )
+
+        with get_admission_controller().admit("extract", cost):
+            with profile_request("extract", document_id):
+                result = extract_document_text(document_id, storage_url, mime_type, filename)
 
-        status_code = 200 if result.get("success") else 500
-        return jsonify(result), status_code
+        return result_response(result)
 
+    except Overloaded as e:
+        return overloaded(e)
     except Exception as e:
         logger.error(f"Extract endpoint error: {str(e)}")
         return jsonify({"error": str(e)}), 500
@@ -108,23 +311,199 @@ def embed():
     try:
         data = request.json
         document_id = data.get("documentId")
+        incremental = data.get("incremental")
 
         if not document_id:
             return jsonify({"error": "Missing documentId"}), 400
 
         logger.info(f"Embedding request for document {document_id}")
-        result = generate_document_embeddings(document_id)
+        if wants_async(data):
+            return submit_job("embed", document_id, generate_document_embeddings, document_id, incremental, endpoint="embed")
 
-        status_code = 200 if result.get("success") else 500
-        return jsonify(result), status_code
+        with get_admission_controller().admit("embed"):
+            with profile_request("embed", document_id):
+                result = generate_document_embeddings(document_id, incremental)
 
+        return result_response(result)
+
+    except Overloaded as e:
+        return overloaded(e)
     except Exception as e:
         logger.error(f"Embed endpoint error: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@app.route("/extract/batch", methods=["POST"])
+def extract_batch():
+    """Extract text from many documents in one call, with per-document results."""
+    if not verify_auth():
+        return jsonify({"error": "Unauthorized"}), 401
+
+    try:
+        data = request.json
+        documents, error = batch_documents(data, ("documentId", "storageUrl"))
+        if error:
+            return jsonify({"error": error}), 400
+
+        logger.info(f"Batch extraction request for {len(documents)} documents")
+        sizes = stored_file_sizes([document["documentId"] for document in documents if not document["fileSize"]])
+        cost = sum(request_cost(document, sizes) for document in documents)
+        if wants_async(data):
+            return submit_job("extract_batch", None, extract_documents_text, documents, endpoint="extract", cost=cost)
+
+        with get_admission_controller().admit("extract", cost):
+            with profile_request("extract_batch", None):
+                result = extract_documents_text(documents)
+
+        return jsonify(result), batch_status_code(result)
+
+    except Overloaded as e:
+        return overloaded(e)
+    except Exception as e:
+        logger.error(f"Batch extract endpoint error: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/embed/batch", methods=["POST"])
+def embed_batch():
+    """Generate embeddings for many documents, packing their chunks into shared embed calls."""
+    if not verify_auth():
+        return jsonify({"error": "Unauthorized"}), 401
+
+    try:
+        data = request.json
+        documents, error = batch_documents(data, ("documentId",))
+        if error:
+            return jsonify({"error": error}), 400
+
+        document_ids = [document["documentId"] for document in documents]
+        incremental = data.get("incremental")
+        logger.info(f"Batch embedding request for {len(document_ids)} documents")
+        if wants_async(data):
+            return submit_job(
+                "embed_batch", None, generate_documents_embeddings,
+                document_ids, incremental, endpoint="embed", cost=len(document_ids),
+            )
+
+        with get_admission_controller().admit("embed", len(document_ids)):
+            with profile_request("embed_batch", None):
+                result = generate_documents_embeddings(document_ids, incremental)
+
+        return jsonify(result), batch_status_code(result)
+
+    except Overloaded as e:
+        return overloaded(e)
+    except Exception as e:
+        logger.error(f"Batch embed endpoint error: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/process", methods=["POST"])
+def process():
+    """Extract, chunk and embed a document in one pass."""
+    if not verify_auth():
+        return jsonify({"error": "Unauthorized"}), 401
+
+    try:
+        data = request.json
+        document_id = data.get("documentId")
+        storage_url = data.get("storageUrl")
+        mime_type = data.get("mime_type") or data.get("mimeType")
+        filename = data.get("filename")
+
+        if not document_id or not storage_url:
+            return jsonify({"error": "Missing documentId or storageUrl"}), 400
+
+        logger.info(f"Processing request for document {document_id}")
+        cost = request_cost(data)
+        if wants_async(data):
+            return submit_job(
+                "process", document_id, process_document,
+                document_id, storage_url, mime_type, filename, data.get("incremental"), endpoint="process", cost=cost,
+            )
+
+        with get_admission_controller().admit("process", cost):
+            with profile_request("process", document_id):
+                result = process_document(document_id, storage_url, mime_type, filename, data.get("incremental"))
+
+        return result_response(result)
+
+    except Overloaded as e:
+        return overloaded(e)
+    except Exception as e:
+        logger.error(f"Process endpoint error: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/search", methods=["POST"])
+def search():
+    """Semantic search over a user's document sections."""
+    if not verify_auth():
+        return jsonify({"error": "Unauthorized"}), 401
+
+    try:
+        data = request.json
+        user_id = data.get("userId")
+        query = data.get("query")
+
+        if not user_id or not query or not isinstance(query, str):
+            return jsonify({"error": "Missing userId or query"}), 400
+        try:
+            limit, threshold = search_params(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        with get_admission_controller().admit("search"):
+            return jsonify(search_sections(user_id, query, limit, threshold))
+
+    except Overloaded as e:
+        return overloaded(e)
+    except outbound.CircuitOpen as e:
+        response = jsonify({"error": str(e), "retryAfter": e.retry_after})
+        response.headers["Retry-After"] = str(e.retry_after)
+        return response, 503
+    except Exception as e:
+        logger.error(f"Search endpoint error: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    """Report stage, progress and timings of an async job."""
+    if not verify_auth():
+        return jsonify({"error": "Unauthorized"}), 401
+
+    job = get_job_manager().get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+@app.route("/debug/profiles", methods=["GET"])
+def list_profiles():
+    """Stored request profiles, newest first."""
+    if not verify_auth():
+        return jsonify({"error": "Unauthorized"}), 401
+    return jsonify({"profiles": profiling.list_profiles(), "retention": profiling.PROFILE_RETENTION})
+
+@app.route("/debug/profiles/<profile_id>", methods=["GET"])
+def get_profile(profile_id):
+    """Top functions (cProfile) and allocation growth (tracemalloc) for one request or job."""
+    if not verify_auth():
+        return jsonify({"error": "Unauthorized"}), 401
+
+    profile = profiling.get_profile(profile_id)
+    if profile is None:
+        return jsonify({"error": "Profile not found (still running, or no longer retained)"}), 404
+    return jsonify(profile)
+
+@app.route("/debug/profiles/<profile_id>/pstats", methods=["GET"])
+def get_profile_pstats(profile_id):
+    """Raw cProfile dump, for pstats or snakeviz."""
+    if not verify_auth():
+        return jsonify({"error": "Unauthorized"}), 401
+
+    path = profiling.pstats_path(profile_id)
+    if path is None:
+        return jsonify({"error": "Profile not found"}), 404
+    return send_file(path, mimetype="application/octet-stream", as_attachment=True, download_name=f"{profile_id}.pstats")
+
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 8000))
-    print(f"\n4. STARTING SERVER ON PORT {port}")
-    print("=" * 60)
+    startup.log_diagnostics()
     logger.info(f"Manthan Worker starting on port {port}")
     app.run(host="0.0.0.0", port=port)
\ No newline at end of file
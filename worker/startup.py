@@ -0,0 +1,77 @@
+"""Startup diagnostics, import timing and optional pre-fork warm-up for the worker."""
+import os
+import time
+import logging
+import importlib
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_VARS = ["SUPABASE_URL", "SUPABASE_SERVICE_ROLE_KEY", "VOYAGE_API_KEY", "WORKER_SECRET", "PORT"]
+
+# Third-party modules the extractor routes and clients import on first use
+HEAVY_MODULES = {
+    "pdf": ["pdfplumber"],
+    "docx": ["lxml.etree"],
+    "pptx": ["lxml.etree"],
+    "image": ["anthropic"],
+    "embed": ["voyageai"],
+    "search": ["numpy"],
+}
+
+_import_times: Dict[str, float] = {}
+
+
+def record_import_time(name: str, seconds: float) -> None:
+    _import_times[name] = seconds
+
+
+def import_times() -> Dict[str, float]:
+    """Milliseconds spent importing each measured module in this process."""
+    return {name: round(seconds * 1000, 1) for name, seconds in _import_times.items()}
+
+
+def log_diagnostics(required: List[str] = REQUIRED_VARS) -> None:
+    """Log which required environment variables are set, with secrets masked."""
+    for var in required:
+        value = os.getenv(var)
+        if not value:
+            logger.warning(f"Startup check: {var} is MISSING")
+        elif "KEY" in var or "SECRET" in var:
+            logger.info(f"Startup check: {var} = ***{value[-4:]} (length: {len(value)})")
+        else:
+            logger.info(f"Startup check: {var} = {value}")
+
+
+def preload_modules() -> Dict[str, float]:
+    """
+    Import every route's heavy dependencies now instead of on first request.
+
+    Run in the gunicorn master before forking so workers share the imported
+    code pages instead of each importing them again.
+    """
+    for route, modules in HEAVY_MODULES.items():
+        for module in modules:
+            started = time.perf_counter()
+            try:
+                importlib.import_module(module)
+            except ImportError as e:
+                logger.warning(f"Preload of {module} ({route}) failed: {str(e)}")
+                continue
+            record_import_time(module, time.perf_counter() - started)
+    logger.info(f"Preloaded modules (ms): {import_times()}")
+    return import_times()
+
+
+def init_clients() -> None:
+    """Create this process's pooled clients so the first request doesn't pay for them."""
+    from supabase_client import get_session
+    from processors.embeddings import get_voyage_client
+    from processors.image_extractor import get_anthropic_client
+
+    started = time.perf_counter()
+    get_session()
+    get_voyage_client()
+    if os.getenv("ANTHROPIC_API_KEY"):
+        get_anthropic_client()
+    logger.info(f"Initialised clients in {(time.perf_counter() - started) * 1000:.1f} ms (pid {os.getpid()})")
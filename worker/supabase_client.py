@@ -0,0 +1,160 @@
+"""Shared, pooled HTTP session for Supabase REST calls."""
+import os
+import gzip
+import json
+import time
+import random
+import logging
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Supabase configuration
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+
+# Connection pool configuration
+SUPABASE_POOL_SIZE = int(os.getenv("SUPABASE_POOL_SIZE", "10"))
+SUPABASE_CONNECT_TIMEOUT = float(os.getenv("SUPABASE_CONNECT_TIMEOUT", "5"))
+SUPABASE_READ_TIMEOUT = float(os.getenv("SUPABASE_READ_TIMEOUT", "60"))
+SUPABASE_MAX_RETRIES = int(os.getenv("SUPABASE_MAX_RETRIES", "3"))
+SUPABASE_BACKOFF_BASE = float(os.getenv("SUPABASE_BACKOFF_BASE", "0.5"))
+SUPABASE_BACKOFF_MAX = float(os.getenv("SUPABASE_BACKOFF_MAX", "10"))
+# Gzip request bodies above this size; 0 disables (the gateway must accept Content-Encoding: gzip)
+SUPABASE_GZIP_MIN_BYTES = int(os.getenv("SUPABASE_GZIP_MIN_BYTES", "0"))
+
+# 429/503 mean the request was not processed, so any method may be retried.
+# Other 5xx and dropped connections are only retried for idempotent methods
+# (or POSTs the caller marks retry_unsafe, such as upserts); a POST whose
+# connection failed before anything was sent is always retried.
+ALWAYS_RETRY_STATUSES = {429, 503}
+IDEMPOTENT_RETRY_STATUSES = {500, 502, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "PATCH", "PUT", "DELETE"}
+
+_session: Optional[requests.Session] = None
+_session_pid: Optional[int] = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Get this process's keep-alive session (rebuilt after a fork)."""
+    global _session, _session_pid
+    with _session_lock:
+        if _session is None or _session_pid != os.getpid():
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=SUPABASE_POOL_SIZE, pool_maxsize=SUPABASE_POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update({
+                "apikey": SUPABASE_KEY or "",
+                "Authorization": f"Bearer {SUPABASE_KEY}",
+                "Content-Type": "application/json",
+            })
+            _session = session
+            _session_pid = os.getpid()
+        return _session
+
+
+def encode_json(json_data: Any) -> bytes:
+    """Compact UTF-8 JSON (non-ASCII text such as Devanagari stays 3 bytes per char, not 6)."""
+    return json.dumps(json_data, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _compress_body(body: Optional[bytes]) -> Tuple[Optional[bytes], Dict[str, str]]:
+    if body is not None and SUPABASE_GZIP_MIN_BYTES and len(body) >= SUPABASE_GZIP_MIN_BYTES:
+        return gzip.compress(body, compresslevel=5), {"Content-Encoding": "gzip"}
+    return body, {}
+
+
+def _backoff_delay(attempt: int, response: Optional[requests.Response]) -> float:
+    """Full-jitter exponential backoff, honouring Retry-After when present."""
+    if response is not None:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after:
+            try:
+                return min(float(retry_after), SUPABASE_BACKOFF_MAX)
+            except ValueError:
+                pass
+    return random.uniform(0, min(SUPABASE_BACKOFF_MAX, SUPABASE_BACKOFF_BASE * (2 ** attempt)))
+
+
+def _never_sent(exc: requests.ConnectionError) -> bool:
+    """Whether the connection failed before the request could reach the server."""
+    if isinstance(exc, requests.ConnectTimeout):
+        return True
+    reason = exc.args[0] if exc.args else None
+    return isinstance(getattr(reason, "reason", reason), NewConnectionError)
+
+
+def rest_request(
+    method: str,
+    endpoint: str,
+    json_data: Any = None,
+    headers: Optional[Dict[str, str]] = None,
+    timeout: Optional[float] = None,
+    body: Optional[bytes] = None,
+    retry_unsafe: bool = False,
+) -> requests.Response:
+    """
+    Make an authenticated request to the Supabase REST API.
+
+    Args:
+        method: HTTP method
+        endpoint: Path under /rest/v1/, including any query string
+        json_data: JSON-serialisable request body
+        headers: Extra headers for this call (e.g. Prefer)
+        timeout: Read timeout in seconds (defaults to SUPABASE_READ_TIMEOUT)
+        body: Pre-encoded JSON body (see encode_json); used instead of json_data when given
+        retry_unsafe: Repeating this POST is harmless (upsert, read-only RPC), so retry it like a PATCH
+
+    Returns:
+        The successful response
+
+    Raises:
+        requests.HTTPError: If the final attempt returns an error status
+    """
+    method = method.upper()
+    url = f"{SUPABASE_URL}/rest/v1/{endpoint}"
+
+    if body is None and json_data is not None:
+        body = encode_json(json_data)
+    body, extra_headers = _compress_body(body)
+    if headers:
+        extra_headers.update(headers)
+
+    idempotent = method in IDEMPOTENT_METHODS or retry_unsafe
+    retry_statuses = ALWAYS_RETRY_STATUSES
+    if idempotent:
+        retry_statuses = ALWAYS_RETRY_STATUSES | IDEMPOTENT_RETRY_STATUSES
+
+    session = get_session()
+    attempt = 0
+    while True:
+        response = None
+        try:
+            response = session.request(
+                method,
+                url,
+                data=body,
+                headers=extra_headers,
+                timeout=(SUPABASE_CONNECT_TIMEOUT, timeout or SUPABASE_READ_TIMEOUT),
+            )
+            if response.status_code not in retry_statuses or attempt >= SUPABASE_MAX_RETRIES:
+                response.raise_for_status()
+                return response
+            reason = f"HTTP {response.status_code}"
+        except requests.ConnectionError as e:
+            # A connection that dropped mid-request may have delivered it (an insert
+            # or claim could be applied twice); only one never established is always safe
+            if attempt >= SUPABASE_MAX_RETRIES or not (idempotent or _never_sent(e)):
+                raise
+            reason = str(e)
+
+        delay = _backoff_delay(attempt, response)
+        attempt += 1
+        logger.warning(f"Supabase {method} {endpoint.split('?', 1)[0]} failed ({reason}), retry {attempt} in {delay:.2f}s")
+        time.sleep(delay)
@@ -0,0 +1,54 @@
+import os
+import sys
+
+import pytest
+
+# Worker modules are imported as top-level modules (see Procfile)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("WORKER_SECRET", "test-secret")
+
+
+@pytest.fixture
+def stubs(tmp_path, monkeypatch):
+    """Local Supabase stand-in (bench/stubs.py) with the worker's REST client pointed at it."""
+    import supabase_client
+    from bench.stubs import Latency, StubConfig, StubServer
+
+    server = StubServer(str(tmp_path), StubConfig(supabase=Latency(0), storage=Latency(0))).start()
+    monkeypatch.setattr(supabase_client, "SUPABASE_URL", server.base_url)
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def worker(stubs, tmp_path, monkeypatch):
+    """Stub services plus fresh, empty worker caches; Voyage and Anthropic calls go to the stubs too."""
+    import extraction_cache
+    import outbound
+    from processors import embedding_cache, embeddings, image_extractor
+
+    for name, value in stubs.environment().items():
+        monkeypatch.setenv(name, value)
+    stubs.point_voyage_client()
+    monkeypatch.setattr(embeddings, "_voyage_client", None)
+    monkeypatch.setattr(extraction_cache, "EXTRACTION_CACHE_DIR", str(tmp_path / "extraction-cache"))
+    monkeypatch.setattr(extraction_cache, "_cache", None)
+    monkeypatch.setattr(embedding_cache, "_cache", embedding_cache.EmbeddingCache(table=""))
+    monkeypatch.setattr(image_extractor, "_cache", image_extractor.ImageAnalysisCache())
+    monkeypatch.setattr(image_extractor, "_client", None)
+    for provider in outbound._providers.values():
+        monkeypatch.setattr(provider, "breaker", outbound.CircuitBreaker(provider.name))
+    return stubs
+
+
+@pytest.fixture
+def seed_document(worker):
+    """Put a file in stub storage plus a documents row for it; returns its storage URL."""
+    def seed(document_id, filename, data, **fields):
+        with open(os.path.join(worker.files_dir, filename), "wb") as f:
+            f.write(data)
+        with worker.state.lock:
+            worker.state.documents[document_id] = dict({"id": document_id, "title": filename}, **fields)
+        return worker.storage_url(filename)
+    return seed
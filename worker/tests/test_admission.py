@@ -0,0 +1,117 @@
+import threading
+import time
+
+import pytest
+
+import admission
+import server
+from admission import AdmissionController, Overloaded
+
+AUTH = {"Authorization": "Bearer test-secret"}
+DOCUMENT = {"documentId": "doc-1", "storageUrl": "https://example.test/a.txt", "mimeType": "text/plain"}
+
+
+@pytest.fixture
+def controller(monkeypatch):
+    controller = AdmissionController({"extract": 0.5})
+    monkeypatch.setattr(admission, "_controller", controller)
+    monkeypatch.setattr(admission, "ADMISSION_QUEUE_DEPTH", 0)
+    return controller
+
+
+@pytest.fixture
+def blocked_extract(monkeypatch):
+    """Make extraction block until the returned event is set."""
+    release = threading.Event()
+    started = threading.Event()
+
+    def extract_document_text(*args):
+        started.set()
+        release.wait(5)
+        return {"success": True}
+
+    monkeypatch.setattr(server, "extract_document_text", extract_document_text)
+    yield started, release
+    release.set()
+
+
+def test_concurrent_request_gets_429(controller, blocked_extract):
+    started, release = blocked_extract
+    client = server.app.test_client()
+    first = {}
+    thread = threading.Thread(target=lambda: first.update(response=client.post("/extract", json=DOCUMENT, headers=AUTH)))
+    thread.start()
+    assert started.wait(5)
+
+    response = client.post("/extract", json=DOCUMENT, headers=AUTH)
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+
+    release.set()
+    thread.join(5)
+    assert first["response"].status_code == 200
+    assert controller.stats()["extract"]["inUse"] == 0
+
+
+def test_async_submission_shares_the_gate(controller, blocked_extract):
+    started, release = blocked_extract
+    client = server.app.test_client()
+    response = client.post("/extract?async=true", json=DOCUMENT, headers=AUTH)
+    assert response.status_code == 202
+    assert started.wait(5)
+
+    # Both sync and async requests are turned away while the job holds the budget
+    assert client.post("/extract", json=DOCUMENT, headers=AUTH).status_code == 429
+    assert client.post("/extract?async=true", json=DOCUMENT, headers=AUTH).status_code == 429
+
+    release.set()
+    deadline = time.monotonic() + 5
+    while controller.stats()["extract"]["running"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert controller.stats()["extract"]["inUse"] == 0
+    assert client.post("/extract", json=DOCUMENT, headers=AUTH).status_code == 200
+
+
+def test_waiter_times_out(monkeypatch):
+    monkeypatch.setattr(admission, "ADMISSION_MAX_WAIT_SECONDS", 0.05)
+    controller = AdmissionController({"search": 1.0})
+    with controller.admit("search"):
+        with pytest.raises(Overloaded) as error:
+            with controller.admit("search"):
+                pass
+    assert error.value.reason == "wait timed out"
+    assert controller.stats()["search"]["queued"] == 0
+
+
+def test_cost_uses_the_stored_file_size_when_none_is_declared(stubs):
+    stubs.state.documents["big"] = {"id": "big", "file_size_bytes": 64 * 1024 * 1024}
+    data = {"documentId": "big", "storageUrl": "https://example.test/big.pdf"}
+
+    assert server.request_cost(data) == admission.estimate_cost("pdf", 64 * 1024 * 1024)
+    assert server.request_cost(data) > admission.estimate_cost("pdf")
+    # A declared size wins, without a lookup
+    stubs.state.reset_counters()
+    assert server.request_cost(dict(data, fileSize=1024)) == admission.estimate_cost("pdf", 1024)
+    assert stubs.state.reset_counters()["requests"] == {}
+
+
+def test_batch_sizes_are_looked_up_together(stubs):
+    for i in range(3):
+        stubs.state.documents[f"d{i}"] = {"id": f"d{i}", "file_size_bytes": (i + 1) * 1024 * 1024}
+    documents = [{"documentId": f"d{i}", "storageUrl": f"https://example.test/{i}.pdf", "fileSize": None} for i in range(3)]
+
+    sizes = server.stored_file_sizes([document["documentId"] for document in documents])
+    assert sizes == {"d0": 1024 * 1024, "d1": 2 * 1024 * 1024, "d2": 3 * 1024 * 1024}
+    assert stubs.state.reset_counters()["requests"] == {"GET documents": 1}
+    assert sum(server.request_cost(document, sizes) for document in documents) == sum(
+        admission.estimate_cost("pdf", size) for size in sizes.values()
+    )
+
+
+def test_failed_size_lookup_costs_the_route_alone(stubs, monkeypatch):
+    import supabase_client
+
+    monkeypatch.setattr(supabase_client, "SUPABASE_MAX_RETRIES", 0)
+    stubs.config.error_rate = 1.0
+    data = {"documentId": "doc", "storageUrl": "https://example.test/a.pdf"}
+    assert server.request_cost(data) == admission.estimate_cost("pdf")
@@ -0,0 +1,108 @@
+import pytest
+
+import server
+from main import BATCH_MAX_DOCUMENTS
+
+AUTH = {"Authorization": "Bearer test-secret"}
+
+
+def statuses(stubs, *document_ids):
+    with stubs.state.lock:
+        return [stubs.state.documents[document_id]["processing_status"] for document_id in document_ids]
+
+
+def store_text(stubs, document_id, text):
+    with stubs.state.lock:
+        stubs.state.documents[document_id] = {"id": document_id, "title": f"{document_id}.txt", "mime_type": "text/plain", "extracted_text": text}
+
+
+@pytest.mark.parametrize("body, error", [
+    ({}, "Missing documents"),
+    ({"documents": []}, "Missing documents"),
+    ({"documents": ["doc"]}, "Each document must be an object"),
+    ({"documents": [{"documentId": "doc"}]}, "Missing storageUrl in documents"),
+    ({"documents": [{"documentId": " ", "storageUrl": "u"}]}, "Missing documentId in documents"),
+    ({"documents": [{"documentId": "doc", "storageUrl": "u"}, {"documentId": "doc ", "storageUrl": "v"}]}, "Duplicate documentId in documents"),
+    ({"documents": [{"documentId": f"doc-{i}", "storageUrl": "u"} for i in range(BATCH_MAX_DOCUMENTS + 1)]}, "Too many documents"),
+])
+def test_invalid_extract_batches_are_rejected(worker, body, error):
+    response = server.app.test_client().post("/extract/batch", json=body, headers=AUTH)
+    assert response.status_code == 400
+    assert response.get_json()["error"].startswith(error)
+
+
+def test_embed_batch_accepts_bare_ids_but_extract_batch_does_not():
+    assert server.batch_documents({"documentIds": ["a", "b"]}, ("documentId",))[0] == [
+        {"documentId": document_id, "storageUrl": None, "mimeType": None, "filename": None, "fileSize": None}
+        for document_id in ("a", "b")
+    ]
+    assert server.batch_documents({"documentIds": ["a"]}, ("documentId", "storageUrl")) == (None, "Missing documents")
+
+
+@pytest.mark.parametrize("succeeded, failed, status_code", [(3, 0, 200), (2, 1, 207), (0, 3, 500)])
+def test_batch_status_code(succeeded, failed, status_code):
+    assert server.batch_status_code({"succeeded": succeeded, "failed": failed}) == status_code
+
+
+def test_extract_batch_reports_each_document(worker, seed_document):
+    documents = []
+    for name in ("one", "two"):
+        url = seed_document(name, f"{name}.txt", f"Scene 1. The {name} script.".encode())
+        documents.append({"documentId": name, "storageUrl": url, "mimeType": "text/plain", "filename": f"{name}.txt"})
+    with worker.state.lock:
+        worker.state.documents["missing"] = {"id": "missing"}
+    documents.insert(1, {"documentId": "missing", "storageUrl": worker.storage_url("missing.txt"), "filename": "missing.txt"})
+
+    worker.state.reset_counters()
+    response = server.app.test_client().post("/extract/batch", json={"documents": documents}, headers=AUTH)
+    body = response.get_json()
+
+    assert response.status_code == 207
+    assert (body["succeeded"], body["failed"], body["error"]) == (2, 1, "1 of 3 documents failed")
+    assert [(result["documentId"], result["success"]) for result in body["results"]] == [
+        ("one", True), ("missing", False), ("two", True),
+    ]
+    assert statuses(worker, "one", "missing", "two") == ["EXTRACTED", "EXTRACTION_FAILED", "EXTRACTED"]
+    with worker.state.lock:
+        assert worker.state.documents["one"]["extracted_text"] == "Scene 1. The one script."
+
+
+def test_embed_batch_shares_embed_calls(worker):
+    for name in ("one", "two", "three"):
+        store_text(worker, name, f"Scene 1. A short {name} scene in the rain.")
+
+    worker.state.reset_counters()
+    response = server.app.test_client().post("/embed/batch", json={"documentIds": ["one", "two", "three"]}, headers=AUTH)
+    body = response.get_json()
+
+    assert response.status_code == 200
+    assert body["success"] and [result["numChunks"] for result in body["results"]] == [1, 1, 1]
+    # Three one-chunk documents fit one Voyage call and one bulk text fetch
+    requests = worker.state.reset_counters()["requests"]
+    assert requests["voyage"] == 1
+    assert requests["GET documents"] == 1
+    assert statuses(worker, "one", "two", "three") == ["READY"] * 3
+
+
+def test_embed_batch_fails_documents_without_text_alone(worker):
+    store_text(worker, "one", "Scene 1. Rain on the roof.")
+    store_text(worker, "empty", "")
+
+    response = server.app.test_client().post("/embed/batch", json={"documentIds": ["one", "empty"]}, headers=AUTH)
+    body = response.get_json()
+
+    assert response.status_code == 207
+    assert body["results"][1] == {"documentId": "empty", "success": False, "error": "No extracted text found"}
+    assert statuses(worker, "one", "empty") == ["READY", "EMBEDDING_FAILED"]
+
+
+def test_embed_batch_fails_every_document_when_embedding_fails(worker):
+    for name in ("one", "two"):
+        store_text(worker, name, f"Scene 1. The {name} scene.")
+    worker.config.provider_error_rate = 1.0
+
+    response = server.app.test_client().post("/embed/batch", json={"documentIds": ["one", "two"]}, headers=AUTH)
+
+    assert response.status_code == 500
+    assert response.get_json()["failed"] == 2
+    assert statuses(worker, "one", "two") == ["EMBEDDING_FAILED"] * 2
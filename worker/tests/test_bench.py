@@ -0,0 +1,59 @@
+import random
+
+import requests
+
+from bench.corpus import PROFILES, build_corpus, make_pdf
+from bench.run import compare, percentile
+from bench.stubs import _id_filter
+from main import resolve_route
+
+
+def test_corpus_is_deterministic(tmp_path):
+    first = build_corpus(str(tmp_path / "a"), "smoke", seed=7)
+    second = build_corpus(str(tmp_path / "b"), "smoke", seed=7)
+
+    assert first == second
+    assert len(first) == len(PROFILES["smoke"])
+    for entry in first:
+        assert (tmp_path / "a" / entry["filename"]).read_bytes() == (tmp_path / "b" / entry["filename"]).read_bytes()
+    assert make_pdf(random.Random(1), 2) != make_pdf(random.Random(2), 2)
+
+
+def test_corpus_covers_every_route(tmp_path):
+    manifest = build_corpus(str(tmp_path), "smoke")
+    routes = {resolve_route(entry["mimeType"], entry["filename"]) for entry in manifest}
+    assert {"pdf", "docx", "pptx", "text", "image"} <= routes
+
+
+def test_percentile_is_nearest_rank():
+    values = [float(i) for i in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([3.0], 99) == 3.0
+    assert percentile([], 50) == 0.0
+
+
+def test_compare_flags_regressions_over_threshold():
+    baseline = {"stages": {"extract": {"p50": 1.0, "p99": 2.0, "peakRssMb": 100.0}, "status": {"p50": 0.001}}, "documents": {}}
+    current = {"stages": {"extract": {"p50": 1.05, "p99": 3.0, "peakRssMb": 100.0}, "status": {"p50": 0.005}}, "documents": {}}
+
+    # p99 grew 50%; p50's 5% is inside the threshold and sub-10ms stages are noise
+    assert compare(current, baseline, 0.1) == ["stage extract p99: 2.0 -> 3.0 (+50%)"]
+
+
+def test_id_filter_parses_postgrest_filters():
+    assert _id_filter("id=eq.doc%201&select=*") == ["doc 1"]
+    assert _id_filter("select=id&document_id=in.(a,b)", "document_id") == ["a", "b"]
+    assert _id_filter("select=*") == []
+
+
+def test_stub_patch_honours_claimed_by_filter(stubs):
+    stubs.state.documents["doc"] = {"id": "doc", "claimed_by": "w1", "processing_status": "EXTRACTING", "lease_expires_at": 1.0}
+    url = f"{stubs.base_url}/rest/v1/documents"
+
+    requests.patch(f"{url}?id=eq.doc&claimed_by=eq.w2", json={"processing_status": "READY"}).raise_for_status()
+    assert stubs.state.documents["doc"]["processing_status"] == "EXTRACTING"
+
+    requests.patch(f"{url}?id=eq.doc&claimed_by=eq.w1", json={"processing_status": "READY"}).raise_for_status()
+    # Final statuses clear the lease, like the documents_clear_lease trigger
+    assert stubs.state.documents["doc"] == {"id": "doc", "claimed_by": None, "processing_status": "READY", "lease_expires_at": None}
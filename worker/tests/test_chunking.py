@@ -0,0 +1,85 @@
+import itertools
+import random
+import types
+
+import pytest
+
+import metrics
+from bench.corpus import HINDI_WORDS, WORDS
+from processors import chunking, embeddings
+from processors.chunking import iter_structured_chunks
+from processors.embedding_pipeline import estimate_tokens
+from processors.embeddings import chunk_text, iter_chunks
+
+
+def screenplay(rng, pages=6):
+    lines = []
+    for page in range(1, pages + 1):
+        lines.append(f"[Page {page}/{pages}]")
+        if page % 2:
+            lines.append(f"## Scene {page}")
+        for _ in range(rng.randint(4, 12)):
+            words = HINDI_WORDS if rng.random() < 0.3 else WORDS
+            lines.append(" ".join(rng.choice(words) for _ in range(rng.randint(5, 60))) + ".")
+            if rng.random() < 0.3:
+                lines.append("")
+    return "\n".join(lines)
+
+
+def split_randomly(rng, text):
+    cuts = sorted(rng.sample(range(1, len(text)), 25))
+    return [text[a:b] for a, b in zip([0] + cuts, cuts + [len(text)])]
+
+
+@pytest.mark.parametrize("chunker", ["structured", "window"])
+def test_streamed_chunks_equal_whole_text_chunks(chunker, monkeypatch):
+    monkeypatch.setattr(embeddings, "CHUNKER", chunker)
+    rng = random.Random(9)
+    text = screenplay(rng)
+
+    assert list(iter_chunks(split_randomly(rng, text))) == chunk_text(text)
+
+
+def test_chunks_respect_the_token_limit_and_carry_markers():
+    text = screenplay(random.Random(4), pages=8)
+    chunks = list(iter_structured_chunks([text], max_tokens=120, min_tokens=40, overlap_tokens=16))
+
+    assert all(chunk["metadata"]["token_estimate"] <= 120 for chunk in chunks)
+    assert [chunk["metadata"]["chunk_index"] for chunk in chunks] == list(range(len(chunks)))
+    for chunk in chunks:
+        assert "[Page" not in chunk["text"]
+        assert not chunk["text"].startswith("## ")
+        metadata = chunk["metadata"]
+        assert 1 <= metadata["page"] <= metadata.get("page_end", metadata["page"]) <= 8
+        # Positions point back into the full text
+        assert text[metadata["start_position"]:metadata["end_position"]].startswith(chunk["text"][:20])
+    assert {chunk["metadata"].get("heading") for chunk in chunks} >= {"Scene 1", "Scene 3"}
+
+
+def test_short_pages_merge_and_slides_are_tracked():
+    text = "\n".join(f"Slide {i}:\nTitle {i}\nNotes: short" for i in range(1, 5))
+    [chunk] = list(iter_structured_chunks([text], max_tokens=200, min_tokens=100))
+    assert chunk["metadata"]["slide"] == 1 and chunk["metadata"]["slide_end"] == 4
+    assert "Slide 2:" not in chunk["text"]
+
+
+def test_long_lines_split_on_sentences_then_words():
+    sentence = "The train screams past the chawl at night. "
+    chunks = list(iter_structured_chunks([sentence * 40 + "x" * 50 + " tail " + "word " * 200], max_tokens=64, overlap_tokens=0))
+    assert len(chunks) > 3
+    assert all(estimate_tokens(chunk["text"]) <= 64 for chunk in chunks)
+    assert chunks[0]["text"].startswith("The train") and chunks[0]["text"].endswith(".")
+
+
+def test_chunking_time_includes_marker_and_blank_lines(monkeypatch):
+    # One tick per clock read, so each line's bookkeeping adds up to at least one
+    clock = itertools.count()
+    monkeypatch.setattr(chunking, "time", types.SimpleNamespace(perf_counter=lambda: next(clock)))
+    metrics.STAGE_SECONDS.reset()
+
+    lines = ["", "[Page 1/2]", "", "[Page 2/2]"] * 25
+    assert list(iter_structured_chunks(["\n".join(lines)], route="pdf")) == []
+
+    [(labels, histogram)] = metrics.STAGE_SECONDS.snapshot()
+    assert labels == ["chunking", "pdf"]
+    assert histogram[-1] >= len(lines)
@@ -0,0 +1,113 @@
+"""
+claim_documents / renew_document_leases / documents_clear_lease against a real Postgres.
+
+Runs only when TEST_DATABASE_URL points at a scratch database (and psycopg is
+installed). Everything happens in one transaction that is rolled back.
+"""
+import os
+
+import pytest
+
+psycopg = pytest.importorskip("psycopg")
+
+DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+MIGRATION = os.path.join(os.path.dirname(__file__), "..", "..", "db", "migrations", "015_document_claims.sql")
+
+pytestmark = pytest.mark.skipif(not DATABASE_URL, reason="TEST_DATABASE_URL is not set")
+
+# Supabase's API roles, which the migration revokes from, plus just the
+# documents columns the migration and the consumer use
+SCHEMA = """
+DO $$
+BEGIN
+  IF NOT EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'anon') THEN CREATE ROLE anon; END IF;
+  IF NOT EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'authenticated') THEN CREATE ROLE authenticated; END IF;
+END $$;
+
+CREATE TABLE IF NOT EXISTS public.documents (
+  id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+  title text,
+  storage_url text,
+  mime_type text,
+  file_size_bytes bigint,
+  processing_status text NOT NULL DEFAULT 'UPLOADED',
+  created_at timestamptz NOT NULL DEFAULT now()
+);
+"""
+
+
+@pytest.fixture
+def db():
+    with psycopg.connect(DATABASE_URL) as connection:
+        with connection.cursor() as cursor:
+            cursor.execute(SCHEMA)
+            with open(MIGRATION) as f:
+                cursor.execute(f.read())
+            cursor.execute("DELETE FROM public.documents")
+            yield cursor
+        connection.rollback()
+
+
+def insert(cursor, status, **fields):
+    columns = ["processing_status", "title", *fields]
+    cursor.execute(
+        f"INSERT INTO public.documents ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))}) RETURNING id",
+        [status, f"{status.lower()}.txt", *fields.values()],
+    )
+    return cursor.fetchone()[0]
+
+
+def claim(cursor, worker_id, batch_size=10, lease_seconds=300, max_attempts=3):
+    cursor.execute(
+        "SELECT id, title, claim_attempts FROM public.claim_documents(%s, %s, %s, ARRAY['QUEUED'], %s)",
+        [worker_id, batch_size, lease_seconds, max_attempts],
+    )
+    return cursor.fetchall()
+
+
+def status_of(cursor, document_id):
+    cursor.execute("SELECT processing_status, claimed_by, error_message FROM public.documents WHERE id = %s", [document_id])
+    return cursor.fetchone()
+
+
+def test_only_queued_documents_are_claimed_once(db):
+    queued = insert(db, "QUEUED")
+    insert(db, "UPLOADED")
+
+    assert claim(db, "a") == [(queued, "queued.txt", 1)]
+    assert claim(db, "b") == []
+    assert status_of(db, queued)[1] == "a"
+
+
+def test_expired_leases_are_reclaimed_and_renewals_need_ownership(db):
+    document_id = insert(db, "QUEUED")
+    claim(db, "a", lease_seconds=0)
+
+    [(reclaimed, _, attempts)] = claim(db, "b")
+    assert (reclaimed, attempts) == (document_id, 2)
+
+    db.execute("SELECT * FROM public.renew_document_leases('a', ARRAY[%s]::uuid[], 300)", [document_id])
+    assert db.fetchall() == []
+    db.execute("SELECT * FROM public.renew_document_leases('b', ARRAY[%s]::uuid[], 300)", [document_id])
+    assert db.fetchall() == [(document_id,)]
+
+
+def test_exhausted_leases_fail_the_phase_the_document_was_in(db):
+    extracting = insert(db, "EXTRACTING", claimed_by="gone", lease_expires_at="2000-01-01", claim_attempts=3)
+    embedding = insert(db, "EMBEDDING", claimed_by="gone", lease_expires_at="2000-01-01", claim_attempts=3)
+    finished = insert(db, "READY", claimed_by="gone", lease_expires_at="2000-01-01", claim_attempts=5)
+
+    assert claim(db, "a") == []
+    assert status_of(db, extracting) == ("EXTRACTION_FAILED", None, "Processing lease expired 3 times")
+    assert status_of(db, embedding)[:2] == ("EMBEDDING_FAILED", None)
+    assert status_of(db, finished)[0] == "READY"
+
+
+def test_final_status_clears_the_lease(db):
+    document_id = insert(db, "QUEUED")
+    claim(db, "a")
+
+    db.execute("UPDATE public.documents SET processing_status = 'EXTRACTING' WHERE id = %s", [document_id])
+    assert status_of(db, document_id)[1] == "a"
+    db.execute("UPDATE public.documents SET processing_status = 'READY' WHERE id = %s", [document_id])
+    assert status_of(db, document_id)[1] is None
@@ -0,0 +1,142 @@
+import threading
+import time
+
+import pytest
+
+import consumer
+import main
+from consumer import Consumer
+
+main_iter_chunks = main.iter_chunks
+
+
+def seed(stubs, count, status="QUEUED", **fields):
+    ids = [f"doc-{status.lower()}-{i}" for i in range(count)]
+    with stubs.state.lock:
+        for i, document_id in enumerate(ids):
+            stubs.state.documents[document_id] = dict(
+                {"id": document_id, "processing_status": status, "storage_url": stubs.storage_url(f"{document_id}.txt"), "created_at": i},
+                **fields,
+            )
+    return ids
+
+
+@pytest.fixture
+def expiring_leases(monkeypatch):
+    # Leases lapse as soon as they are granted
+    monkeypatch.setattr(consumer, "CONSUMER_LEASE_SECONDS", 0)
+
+
+def test_consumers_never_claim_the_same_document(stubs):
+    ids = seed(stubs, 40)
+    seed(stubs, 5, status="UPLOADED")
+    claims = {"a": [], "b": []}
+
+    def drain(worker_id):
+        node = Consumer(worker_id, concurrency=3)
+        while True:
+            documents = node.claim(3)
+            if not documents:
+                return
+            claims[worker_id].extend(document["id"] for document in documents)
+
+    threads = [threading.Thread(target=drain, args=(worker_id,)) for worker_id in claims]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    assert not set(claims["a"]) & set(claims["b"])
+    # Every queued document is claimed exactly once; UPLOADED ones are left to the push path
+    assert sorted(claims["a"] + claims["b"]) == sorted(ids)
+    for document_id in ids:
+        assert stubs.state.documents[document_id]["claimed_by"] in claims
+
+
+def test_expired_lease_is_reclaimed(stubs, expiring_leases):
+    [document_id] = seed(stubs, 1)
+    first, second = Consumer("a"), Consumer("b")
+    assert [document["id"] for document in first.claim(1)] == [document_id]
+
+    time.sleep(0.01)
+    [reclaimed] = second.claim(1)
+    assert reclaimed["id"] == document_id
+    assert reclaimed["claim_attempts"] == 2
+    assert stubs.state.documents[document_id]["claimed_by"] == "b"
+
+    # The first node's late release must not drop the new owner's lease
+    first.release(document_id)
+    assert stubs.state.documents[document_id]["claimed_by"] == "b"
+
+
+def test_max_attempts_marks_document_failed(stubs, expiring_leases, monkeypatch):
+    monkeypatch.setattr(consumer, "CONSUMER_MAX_ATTEMPTS", 2)
+    [document_id] = seed(stubs, 1)
+    # Finished documents with a stale lease must not be swept
+    [finished_id] = seed(stubs, 1, status="READY", claimed_by="gone", lease_expires_at=0, claim_attempts=5)
+    node = Consumer("a")
+
+    for _ in range(2):
+        assert len(node.claim(1)) == 1
+        time.sleep(0.01)
+    assert node.claim(1) == []
+
+    document = stubs.state.documents[document_id]
+    assert document["processing_status"] == "EXTRACTION_FAILED"
+    assert document["lease_expires_at"] is None
+    assert stubs.state.documents[finished_id]["processing_status"] == "READY"
+
+
+def test_final_status_clears_the_lease(stubs):
+    [document_id] = seed(stubs, 1)
+    node = Consumer("a")
+    node.claim(1)
+
+    main.set_status(document_id, "READY")
+    document = stubs.state.documents[document_id]
+    assert document["claimed_by"] is None
+    assert document["lease_expires_at"] is None
+
+
+def test_exhausted_leases_fail_the_phase_the_document_was_in(stubs, expiring_leases, monkeypatch):
+    monkeypatch.setattr(consumer, "CONSUMER_MAX_ATTEMPTS", 1)
+    [extracting] = seed(stubs, 1, status="EXTRACTING", claimed_by="gone", lease_expires_at=0, claim_attempts=1)
+    [embedding] = seed(stubs, 1, status="EMBEDDING", claimed_by="gone", lease_expires_at=0, claim_attempts=1)
+
+    assert Consumer("a").claim(4) == []
+    assert stubs.state.documents[extracting]["processing_status"] == "EXTRACTION_FAILED"
+    assert stubs.state.documents[embedding]["processing_status"] == "EMBEDDING_FAILED"
+    assert stubs.state.documents[embedding]["error_message"] == "Processing lease expired 1 times"
+
+
+def test_claimed_documents_are_routed_by_their_title(worker, monkeypatch):
+    # Storage paths carry no extension; only the title says this is a text file
+    with open(f"{worker.files_dir}/upload-1", "wb") as f:
+        f.write(("Scene 1. The monsoon breaks. " * 40).encode())
+    [document_id] = seed(worker, 1, storage_url=worker.storage_url("upload-1"), title="notes.txt")
+    routes = []
+    monkeypatch.setattr(main, "iter_chunks", lambda pieces, route="": routes.append(route) or main_iter_chunks(pieces, route))
+    node = Consumer("a")
+
+    [document] = node.claim(1)
+    node._active[document_id] = None
+    node._process(document)
+
+    stored = worker.state.documents[document_id]
+    assert stored["processing_status"] == "READY", stored
+    assert stored["claimed_by"] is None
+    assert routes == ["text"]
+    assert node.stats()["succeeded"] == 1
+
+
+def test_deferred_documents_keep_their_lease(stubs, monkeypatch):
+    monkeypatch.setattr(consumer, "process_document", lambda *args: {"success": False, "error": "circuit open", "retryAfter": 30})
+    [document_id] = seed(stubs, 1)
+    node = Consumer("a")
+
+    [document] = node.claim(1)
+    node._process(document)
+
+    # Left to lapse, so another claim picks it up once the provider has had time to recover
+    assert stubs.state.documents[document_id]["claimed_by"] == "a"
+    assert node.stats()["deferred"] == 1
@@ -0,0 +1,96 @@
+import io
+
+import pytest
+from docx import Document
+from docx.oxml import parse_xml
+
+from processors.docx_extractor import extract, iter_lines
+
+W_NS = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+
+
+def save(doc):
+    out = io.BytesIO()
+    doc.save(out)
+    return out.getvalue()
+
+
+def sdt(*paragraphs):
+    body = "".join(f"<w:p><w:r><w:t>{text}</w:t></w:r></w:p>" for text in paragraphs)
+    return parse_xml(f"<w:sdt {W_NS}><w:sdtPr/><w:sdtContent>{body}</w:sdtContent></w:sdt>")
+
+
+def text_box(outer, inner):
+    # A run holding a text box: its paragraphs belong to the box, not the paragraph around it
+    return parse_xml(
+        f'<w:p {W_NS} xmlns:wps="http://schemas.microsoft.com/office/word/2010/wordprocessingShape">'
+        f"<w:r><w:t>{outer}</w:t></w:r>"
+        f"<w:r><w:pict><w:txbxContent><w:p><w:r><w:t>{inner}</w:t></w:r></w:p></w:txbxContent></w:pict></w:r>"
+        f"</w:p>"
+    )
+
+
+def test_blocks_come_out_in_body_order():
+    doc = Document()
+    doc.add_heading("INT. CHAWL - NIGHT", level=2)
+    doc.add_paragraph("Rain hammers the tin roof.")
+    table = doc.add_table(rows=1, cols=2)
+    table.cell(0, 0).text = "RAJ"
+    table.cell(0, 1).text = "Where were you?"
+    doc.element.body.insert(len(doc.element.body) - 1, sdt("Inside a content control"))
+    doc.add_paragraph("MEERA walks out.")
+
+    assert list(iter_lines(save(doc))) == [
+        "\n## INT. CHAWL - NIGHT\n",
+        "Rain hammers the tin roof.",
+        "RAJ | Where were you?",
+        "Inside a content control",
+        "MEERA walks out.",
+    ]
+
+
+def test_merged_cells_are_read_once():
+    doc = Document()
+    table = doc.add_table(rows=2, cols=3)
+    table.cell(0, 0).merge(table.cell(0, 1)).text = "wide"
+    table.cell(0, 2).text = "right"
+    table.cell(0, 2).merge(table.cell(1, 2))
+    table.cell(1, 0).text = "a"
+    table.cell(1, 1).text = "b"
+
+    assert list(iter_lines(save(doc))) == ["wide | right", "a | b"]
+
+
+def test_cells_only_take_their_own_paragraphs():
+    doc = Document()
+    table = doc.add_table(rows=1, cols=2)
+    cell = table.cell(0, 0)
+    cell.text = "outer"
+    inner = cell.add_table(rows=1, cols=2)
+    inner.cell(0, 0).text = "inner 1"
+    inner.cell(0, 1).text = "inner 2"
+    cell._tc.append(sdt("controlled"))
+    other = table.cell(0, 1)
+    other._tc.remove(other.paragraphs[0]._p)
+    other._tc.append(text_box("beside", "boxed"))
+
+    # Nested table text appears once, on its own line after the row, and text boxes are skipped.
+    # add_table leaves the empty paragraph Word requires after a nested table.
+    assert list(iter_lines(save(doc))) == ["outer\n\ncontrolled | beside", "inner 1 | inner 2"]
+
+
+def test_runs_keep_tabs_and_breaks():
+    doc = Document()
+    paragraph = doc.add_paragraph("SCENE")
+    run = paragraph.add_run()
+    run.add_tab()
+    run.add_text("ONE")
+    run.add_break()
+    run.add_text("next line")
+
+    assert extract(save(doc)) == "SCENE\tONE\nnext line"
+
+
+def test_empty_document_fails():
+    with pytest.raises(Exception, match="No readable text"):
+        extract(save(Document()))
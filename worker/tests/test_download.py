@@ -0,0 +1,57 @@
+import hashlib
+import io
+import os
+
+import pytest
+
+import main
+from processors.sources import open_stream, read_bytes, sha256_hex
+
+
+@pytest.fixture
+def stored_file(stubs, tmp_path):
+    data = os.urandom(300_000)
+    (tmp_path / "upload.bin").write_bytes(data)
+    return stubs.storage_url("upload.bin"), data
+
+
+def test_download_streams_into_a_spool(stored_file, monkeypatch):
+    url, data = stored_file
+    monkeypatch.setattr(main, "DOWNLOAD_SPOOL_THRESHOLD", 64 * 1024)
+    monkeypatch.setattr(main, "DOWNLOAD_CHUNK_SIZE", 16 * 1024)
+
+    with main.download_from_signed_url(url) as spool:
+        # Past the threshold the body went to disk rather than memory
+        assert spool._rolled
+        assert spool.read() == data
+
+
+def test_small_download_stays_in_memory(stored_file):
+    url, data = stored_file
+    with main.download_from_signed_url(url) as spool:
+        assert not spool._rolled
+        assert spool.read() == data
+
+
+def test_download_over_the_limit_fails(stored_file, monkeypatch):
+    url, _ = stored_file
+    monkeypatch.setattr(main, "DOWNLOAD_MAX_BYTES", 100_000)
+    with pytest.raises(ValueError, match="too large"):
+        main.download_from_signed_url(url)
+
+
+def test_missing_file_raises(stubs):
+    with pytest.raises(Exception):
+        main.download_from_signed_url(stubs.storage_url("missing.bin"))
+
+
+@pytest.mark.parametrize("wrap", [bytes, bytearray, memoryview, io.BytesIO])
+def test_sources_read_the_same_bytes(wrap):
+    data = b"manthan " * 1000
+    source = wrap(data)
+    assert bytes(read_bytes(source)) == data
+    assert open_stream(source).read() == data
+    assert sha256_hex(source) == hashlib.sha256(data).hexdigest()
+    # Hashing leaves open files rewound for the extractor
+    assert open_stream(source).read(7) == b"manthan"
+
@@ -0,0 +1,59 @@
+from processors.embedding_cache import EmbeddingCache, chunk_key
+
+
+class FakeEmbedder:
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, texts):
+        self.batches.append(list(texts))
+        return [[float(len(text)), 0.5] for text in texts]
+
+
+def test_repeated_chunks_are_embedded_once():
+    cache = EmbeddingCache(max_entries=100, table="")
+    embed = FakeEmbedder()
+
+    vectors = cache.embed(["a", "bb", "a", "ccc"], "voyage-3-lite", "document", embed)
+    assert vectors == [[1.0, 0.5], [2.0, 0.5], [1.0, 0.5], [3.0, 0.5]]
+    assert embed.batches == [["a", "bb", "ccc"]]
+
+    # A later batch only embeds what the cache hasn't seen
+    cache.embed(["bb", "dddd"], "voyage-3-lite", "document", embed)
+    assert embed.batches[-1] == ["dddd"]
+    stats = cache.stats()
+    assert stats["deduplicated"] == 1
+    assert stats["hits"] == 1
+    assert stats["misses"] == 4
+
+
+def test_key_covers_model_and_input_type():
+    key = chunk_key("text", "voyage-3-lite", "document")
+    assert chunk_key("text", "voyage-3", "document") != key
+    assert chunk_key("text", "voyage-3-lite", "query") != key
+
+    cache = EmbeddingCache(max_entries=100, table="")
+    embed = FakeEmbedder()
+    cache.embed(["text"], "voyage-3-lite", "document", embed)
+    cache.embed(["text"], "voyage-3-lite", "query", embed)
+    assert len(embed.batches) == 2
+
+
+def test_lru_is_bounded():
+    cache = EmbeddingCache(max_entries=2, table="")
+    embed = FakeEmbedder()
+    cache.embed(["a", "b", "c"], "m", "document", embed)
+    assert cache.stats()["entries"] == 2
+    cache.embed(["a"], "m", "document", embed)
+    assert embed.batches[-1] == ["a"]
+
+
+def test_shared_table_is_consulted_before_embedding(stubs):
+    key = chunk_key("shared", "m", "document")
+    cache = EmbeddingCache(max_entries=100, table="embedding_cache")
+    cache._get_shared = lambda keys: {key: [9.0, 9.0]} if key in keys else {}
+    embed = FakeEmbedder()
+
+    assert cache.embed(["shared", "new"], "m", "document", embed) == [[9.0, 9.0], [3.0, 0.5]]
+    assert embed.batches == [["new"]]
+    assert cache.stats()["sharedHits"] == 1
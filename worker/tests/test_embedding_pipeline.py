@@ -0,0 +1,78 @@
+import threading
+import time
+
+import pytest
+
+from processors.embedding_pipeline import EmbeddingPipeline, RateLimiter, estimate_tokens, iter_batches
+
+
+def make_chunks(lengths):
+    return [{"document_id": "doc", "text": "x" * n, "metadata": {"chunk_index": i}} for i, n in enumerate(lengths)]
+
+
+def test_batches_respect_token_and_size_bounds():
+    chunks = make_chunks([300, 600, 900, 30, 30, 30, 30, 1500])
+    batches = list(iter_batches(chunks, max_tokens=400, max_size=3))
+
+    assert [chunk for batch in batches for chunk in batch] == chunks
+    for batch in batches:
+        assert len(batch) <= 3
+        # A chunk over the budget on its own still gets a batch
+        assert len(batch) == 1 or sum(estimate_tokens(chunk["text"]) for chunk in batch) <= 400
+    assert [len(batch) for batch in batches] == [2, 3, 2, 1]
+
+
+def test_empty_input_has_no_batches():
+    assert list(iter_batches([])) == []
+
+
+class Recorder:
+    def __init__(self, delay=0.02):
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.inserted = []
+        self._lock = threading.Lock()
+
+    def embed(self, texts):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.delay)
+        with self._lock:
+            self.in_flight -= 1
+        return [[float(len(text))] for text in texts]
+
+    def insert(self, records):
+        with self._lock:
+            self.inserted.extend(records)
+
+
+def test_pipeline_embeds_and_inserts_every_chunk_with_bounded_concurrency():
+    recorder = Recorder()
+    chunks = make_chunks([10] * 40)
+    pipeline = EmbeddingPipeline(recorder.embed, recorder.insert, concurrency=3, insert_concurrency=1)
+
+    stored = pipeline.run(iter_batches(chunks, max_size=4), total_chunks=40)
+
+    assert stored == 40
+    assert sorted(record["metadata"]["chunk_index"] for record in recorder.inserted) == list(range(40))
+    assert all(record["embedding"] == [10.0] and record["content"] == "x" * 10 for record in recorder.inserted)
+    assert 1 < recorder.max_in_flight <= 3
+
+
+def test_pipeline_surfaces_embed_failures():
+    def embed(texts):
+        raise RuntimeError("voyage down")
+
+    pipeline = EmbeddingPipeline(embed, lambda records: None, concurrency=2)
+    with pytest.raises(RuntimeError, match="voyage down"):
+        pipeline.run(iter_batches(make_chunks([10] * 8), max_size=2))
+
+
+def test_rate_limiter_spaces_calls():
+    limiter = RateLimiter(per_minute=1200)  # one every 50 ms
+    started = time.monotonic()
+    for _ in range(4):
+        limiter.acquire()
+    assert time.monotonic() - started >= 0.14
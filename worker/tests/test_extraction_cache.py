@@ -0,0 +1,72 @@
+import os
+import time
+
+import pytest
+
+import extraction_cache
+from extraction_cache import DiskLRU, ExtractionCache
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(extraction_cache, "EXTRACTION_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(extraction_cache, "EXTRACTION_CACHE_MAX_BYTES", 1024 * 1024)
+    monkeypatch.setattr(extraction_cache, "EXTRACTION_CACHE_TABLE", "")
+    return ExtractionCache()
+
+
+def extractor(text):
+    calls = []
+
+    def extract():
+        calls.append(1)
+        return text
+    return extract, calls
+
+
+def test_identical_files_are_extracted_once(cache):
+    extract, calls = extractor("नमस्ते script text")
+    assert cache.get_or_extract(b"%PDF same bytes", "pdf:layout", extract) == "नमस्ते script text"
+    # Same content arriving as a different object (e.g. a re-upload) hits the cache
+    assert cache.get_or_extract(bytearray(b"%PDF same bytes"), "pdf:layout", extract) == "नमस्ते script text"
+    assert len(calls) == 1
+    assert cache.stats()["diskHits"] == 1
+
+
+def test_key_depends_on_content_route_and_version(cache, monkeypatch):
+    key = cache.key_for(b"file", "pdf:layout")
+    assert cache.key_for(b"other file", "pdf:layout") != key
+    assert cache.key_for(b"file", "pdf:tiered") != key
+    assert cache.key_for(b"file", "image:image/png") != cache.key_for(b"file", "image:image/jpeg")
+
+    monkeypatch.setitem(extraction_cache.EXTRACTOR_VERSIONS, "pdf", 99)
+    assert cache.key_for(b"file", "pdf:layout") != key
+    assert "/" not in cache.key_for(b"file", "image:image/png")
+
+
+def test_disabled_cache_always_extracts(tmp_path, monkeypatch):
+    monkeypatch.setattr(extraction_cache, "EXTRACTION_CACHE_MAX_BYTES", 0)
+    monkeypatch.setattr(extraction_cache, "EXTRACTION_CACHE_TABLE", "")
+    cache = ExtractionCache()
+    extract, calls = extractor("text")
+    cache.get_or_extract(b"file", "text", extract)
+    cache.get_or_extract(b"file", "text", extract)
+    assert len(calls) == 2
+    assert cache.key_for(b"file", "text") is None
+
+
+def test_disk_lru_evicts_least_recently_used(tmp_path):
+    lru = DiskLRU(str(tmp_path), max_bytes=1024 * 1024)
+    for i in range(3):
+        lru.put(f"k{i}", os.urandom(600).hex())
+        past = time.time() - 100 + i
+        os.utime(lru._path(f"k{i}"), (past, past))
+    # Room for three and a half entries
+    lru.max_bytes = int(os.path.getsize(lru._path("k0")) * 3.5)
+    # Reading k0 makes it the most recently used
+    assert lru.get("k0") is not None
+
+    lru.put("k3", os.urandom(600).hex())
+    assert lru.get("k1") is None
+    assert lru.get("k0") is not None
+    assert lru.get("k3") is not None
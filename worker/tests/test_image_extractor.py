@@ -0,0 +1,93 @@
+import io
+
+import pytest
+
+import outbound
+import server
+from main import extract_document_text, process_document
+from processors import image_extractor
+from processors.image_extractor import ImageAnalysisCache, dhash
+
+AUTH = {"Authorization": "Bearer test-secret"}
+
+
+def make_image(color=(200, 40, 40), size=(320, 240), fmt="PNG"):
+    from PIL import Image, ImageDraw
+
+    image = Image.new("RGB", size, color)
+    ImageDraw.Draw(image).rectangle([40, 40, 160, 120], fill=(20, 20, 20))
+    out = io.BytesIO()
+    image.save(out, format=fmt)
+    return out.getvalue()
+
+
+def open_circuit(provider="anthropic"):
+    breaker = outbound._providers[provider].breaker
+    for _ in range(breaker.threshold):
+        breaker.record_failure()
+
+
+def test_identical_images_are_analysed_once(worker):
+    data = make_image()
+    first = image_extractor.extract(data, "image/png")
+    assert image_extractor.extract(bytearray(data), "image/png") == first
+    assert worker.state.requests["anthropic"] == 1
+    assert image_extractor.get_image_cache().stats()["hits"] == 1
+
+
+def test_near_matches_only_when_distance_is_enabled():
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(make_image()))
+    image_hash = dhash(image)
+    close_hash = image_hash ^ 0b11
+
+    exact = ImageAnalysisCache(max_entries=10, max_distance=0)
+    exact.put(b"a", image_hash, "analysis")
+    assert exact.get(b"b", close_hash) is None
+
+    near = ImageAnalysisCache(max_entries=10, max_distance=2)
+    near.put(b"a", image_hash, "analysis")
+    assert near.get(b"b", close_hash) == "analysis"
+    assert near.get(b"c", image_hash ^ 0b111) is None
+    assert near.stats() == {"hits": 0, "nearHits": 1, "misses": 1, "entries": 1}
+
+
+def test_dhash_survives_reencoding():
+    from PIL import Image
+
+    png = dhash(Image.open(io.BytesIO(make_image())))
+    jpeg = dhash(Image.open(io.BytesIO(make_image(fmt="JPEG"))))
+    assert (png ^ jpeg).bit_count() <= 4
+
+
+def test_circuit_open_propagates_unwrapped(worker):
+    open_circuit()
+    with pytest.raises(outbound.CircuitOpen):
+        image_extractor.extract(make_image(), "image/png")
+    assert "anthropic" not in worker.state.requests
+
+
+def test_circuit_open_defers_instead_of_failing(worker, seed_document):
+    open_circuit()
+    url = seed_document("doc", "still.png", make_image())
+
+    result = extract_document_text("doc", url, "image/png", "still.png")
+    assert not result["success"] and result["retryAfter"] >= 1
+    assert worker.state.documents["doc"]["processing_status"] == "QUEUED"
+
+    result = process_document("doc", url, "image/png", "still.png")
+    assert "retryAfter" in result
+    assert worker.state.documents["doc"]["processing_status"] == "QUEUED"
+
+
+def test_extract_endpoint_returns_503_when_circuit_is_open(worker, seed_document):
+    open_circuit()
+    url = seed_document("doc", "still.png", make_image())
+
+    response = server.app.test_client().post(
+        "/extract", headers=AUTH, json={"documentId": "doc", "storageUrl": url, "mimeType": "image/png"}
+    )
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) >= 1
+    assert worker.state.documents["doc"]["processing_status"] == "QUEUED"
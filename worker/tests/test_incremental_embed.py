@@ -0,0 +1,69 @@
+from main import generate_document_embeddings
+from processors import embedding_cache
+from processors.embedding_cache import EmbeddingCache, chunk_key
+from processors.embeddings import EMBEDDING_INPUT_TYPE, EMBEDDING_MODEL, chunk_text
+
+SCENES = [f"Scene {i}. " + f"Monsoon scene number {i} in the village. " * 30 for i in range(8)]
+
+
+def store_text(stubs, document_id, text):
+    with stubs.state.lock:
+        stubs.state.documents.setdefault(document_id, {"id": document_id}).update(extracted_text=text, mime_type="text/plain")
+
+
+def rows_by_hash(stubs, document_id):
+    with stubs.state.lock:
+        return {
+            row["metadata"]["content_hash"]: row["id"]
+            for row in stubs.state.sections.values()
+            if row["document_id"] == document_id
+        }
+
+
+def test_reembed_reuses_unchanged_chunks_and_drops_stale_rows(worker):
+    text = "\n\n".join(SCENES)
+    store_text(worker, "doc", text)
+    assert generate_document_embeddings("doc", True)["success"]
+    before = rows_by_hash(worker, "doc")
+
+    edited = "\n\n".join(SCENES[:5] + ["A brand new ending. " * 40])
+    store_text(worker, "doc", edited)
+    worker.state.reset_counters()
+    assert generate_document_embeddings("doc", True)["success"]
+    after = rows_by_hash(worker, "doc")
+
+    hashes = {chunk_key(chunk["text"], EMBEDDING_MODEL, EMBEDDING_INPUT_TYPE) for chunk in chunk_text(edited)}
+    assert set(after) == hashes
+    # Unchanged chunks keep their rows (and embeddings); changed ones were replaced
+    kept = hashes & set(before)
+    assert kept and all(after[content_hash] == before[content_hash] for content_hash in kept)
+    assert len(worker.state.sections) == len(hashes)
+    requests = worker.state.reset_counters()["requests"]
+    assert hashes - set(before) and requests["POST document_sections"] >= 1
+    assert requests["DELETE document_sections"] >= 1
+
+
+def test_identical_reembed_writes_nothing(worker):
+    text = "\n\n".join(SCENES)
+    store_text(worker, "doc", text)
+    generate_document_embeddings("doc", True)
+    before = rows_by_hash(worker, "doc")
+
+    # A cold embedding cache, so only the diff can keep chunks away from Voyage
+    embedding_cache._cache = EmbeddingCache(table="")
+    worker.state.reset_counters()
+    assert generate_document_embeddings("doc", True)["success"]
+    requests = worker.state.reset_counters()["requests"]
+
+    assert rows_by_hash(worker, "doc") == before
+    assert "POST document_sections" not in requests
+    assert "DELETE document_sections" not in requests
+    assert "voyage" not in requests
+
+
+def test_reembed_appends_unless_incremental_is_enabled(worker):
+    store_text(worker, "doc", "\n\n".join(SCENES))
+    generate_document_embeddings("doc")
+    count = len(worker.state.sections)
+    generate_document_embeddings("doc")
+    assert len(worker.state.sections) == 2 * count
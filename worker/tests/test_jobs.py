@@ -0,0 +1,78 @@
+import os
+import threading
+import time
+
+import pytest
+
+import jobs
+from jobs import JobManager, QueueFullError, report_progress, stage
+
+
+@pytest.fixture(autouse=True)
+def state_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_STATE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def wait_for(manager, job_id, status="succeeded"):
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        job = manager.get(job_id)
+        if job["status"] == status:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} never reached {status}: {manager.get(job_id)}")
+
+
+def test_job_reports_stages_progress_and_result(state_dir):
+    def work(document_id):
+        with stage("extract"):
+            report_progress(3, 4, "pages")
+        return {"success": True, "documentId": document_id}
+
+    manager = JobManager(workers=1, queue_depth=1)
+    job = manager.submit("extract", "doc-1", work, "doc-1")
+    result = wait_for(manager, job.id)
+
+    assert result["result"] == {"success": True, "documentId": "doc-1"}
+    assert result["progress"] == {"done": 3, "total": 4, "unit": "pages"}
+    assert "extract" in result["timings"]
+    # The snapshot on disk lets other worker processes answer /jobs/<id>
+    assert os.path.exists(state_dir / f"{job.id}.json")
+
+
+def test_failed_result_and_crash_mark_the_job_failed():
+    manager = JobManager(workers=1, queue_depth=2)
+    failed = manager.submit("embed", "doc-1", lambda: {"success": False, "error": "no text"})
+    crashed = manager.submit("embed", "doc-2", lambda: 1 / 0)
+
+    assert wait_for(manager, failed.id, "failed")["error"] == "no text"
+    assert "division by zero" in wait_for(manager, crashed.id, "failed")["error"]
+
+
+def test_queue_full_is_rejected():
+    release = threading.Event()
+    manager = JobManager(workers=1, queue_depth=1)
+    try:
+        manager.submit("extract", "doc-1", lambda: release.wait(5) and {"success": True})
+        queued = manager.submit("extract", "doc-2", lambda: {"success": True})
+        with pytest.raises(QueueFullError):
+            manager.submit("extract", "doc-3", lambda: {"success": True})
+    finally:
+        release.set()
+    wait_for(manager, queued.id)
+
+
+def test_job_the_executor_refuses_is_forgotten(state_dir):
+    manager = JobManager(workers=1, queue_depth=0)
+    manager._executor.shutdown()
+
+    with pytest.raises(RuntimeError):
+        manager.submit("extract", "refused", lambda: {"success": True})
+
+    assert manager._jobs == {}
+    assert not [name for name in os.listdir(state_dir) if "refused" in (state_dir / name).read_text()]
+    # The slot was released as well
+    manager._executor = jobs.ThreadPoolExecutor(max_workers=1)
+    job = manager.submit("extract", "doc-1", lambda: {"success": True})
+    wait_for(manager, job.id)
@@ -0,0 +1,79 @@
+import json
+import os
+
+import pytest
+
+import metrics
+import server
+from main import process_document
+
+AUTH = {"Authorization": "Bearer test-secret"}
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_DIR", str(tmp_path))
+    for metric in metrics._registry:
+        metric.reset()
+    yield
+    for metric in metrics._registry:
+        metric.reset()
+
+
+def test_histogram_buckets_are_cumulative(registry):
+    histogram = metrics.STAGE_SECONDS
+    for value in (0.003, 0.02, 0.02, 400):
+        histogram.observe(value, stage="extract", route="pdf")
+    lines = metrics.render().splitlines()
+
+    def sample(suffix, le=None):
+        labels = 'stage="extract",route="pdf"' + (f',le="{le}"' if le else "")
+        return next(line.split()[-1] for line in lines if line.startswith(f"{histogram.name}_{suffix}{{{labels}}}"))
+
+    assert sample("bucket", "0.005") == "1"
+    assert sample("bucket", "0.025") == "3"
+    assert sample("bucket", "300.0") == "3"
+    assert sample("bucket", "+Inf") == "4"
+    assert sample("count") == "4"
+    assert float(sample("sum")) == pytest.approx(400.043)
+
+
+def test_empty_labels_are_omitted_and_values_escaped(registry):
+    metrics.STAGE_SECONDS.observe(0.1, stage="fetch")
+    metrics.OUTBOUND_CALLS.inc(provider='voy"age', outcome="ok")
+    text = metrics.render()
+
+    assert 'manthan_worker_stage_seconds_count{stage="fetch"} 1' in text
+    assert 'manthan_worker_outbound_calls_total{provider="voy\\"age",outcome="ok"} 1' in text
+    assert "# TYPE manthan_worker_chunks_total counter" in text
+
+
+def test_other_live_processes_are_merged_and_dead_ones_dropped(registry, tmp_path):
+    metrics.CHUNKS.inc(3, outcome="embedded")
+    # The test runner's parent is alive; pid 2**22 + 1 is past the kernel's pid limit
+    live, dead = os.getppid(), 2 ** 22 + 1
+    for pid in (live, dead):
+        with open(tmp_path / f"{pid}.json", "w") as f:
+            json.dump({metrics.CHUNKS.name: [[["embedded"], 4]]}, f)
+
+    assert 'manthan_worker_chunks_total{outcome="embedded"} 7' in metrics.render()
+    assert not (tmp_path / f"{dead}.json").exists()
+
+
+def test_pipeline_stages_are_labelled_by_route(registry, worker, seed_document):
+    url = seed_document("doc", "script.txt", ("Scene 1. " * 300).encode())
+    assert process_document("doc", url, "text/plain", "script.txt")["success"]
+
+    stages = {tuple(key) for key, _ in metrics.STAGE_SECONDS.snapshot()}
+    assert {("download", "text"), ("extract_embed", "text"), ("status", "")} <= stages
+    assert metrics.DOWNLOADED_BYTES.snapshot() == [[["text"], 2700]]
+
+
+def test_metrics_endpoint_requires_auth(registry):
+    client = server.app.test_client()
+    assert client.get("/metrics").status_code == 401
+
+    response = client.get("/metrics", headers=AUTH)
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    assert "# HELP manthan_worker_stage_seconds" in response.get_data(as_text=True)
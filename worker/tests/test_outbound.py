@@ -0,0 +1,150 @@
+import threading
+import time
+
+import pytest
+
+import outbound
+
+
+class HTTPError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class FakeProvider:
+    """fn(timeout) stand-in: runs the scripted behaviour for each call in turn, then repeats the last."""
+
+    def __init__(self, *script):
+        self.script = list(script)
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, timeout):
+        with self._lock:
+            self.calls.append((time.monotonic(), timeout))
+            step = self.script[min(len(self.calls), len(self.script)) - 1]
+        return step()
+
+
+def fail(exc, after=0.0):
+    def step():
+        time.sleep(after)
+        raise exc
+    return step
+
+
+def succeed(value, after=0.0):
+    def step():
+        time.sleep(after)
+        return value
+    return step
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    provider = outbound.Provider("fake", timeout=2.0, hedge_after=0.0)
+    provider.breaker = outbound.CircuitBreaker("fake", threshold=2, reset_seconds=0.2)
+    monkeypatch.setitem(outbound._providers, "fake", provider)
+    monkeypatch.setattr(outbound, "OUTBOUND_BACKOFF_BASE", 0.02)
+    return provider
+
+
+def test_retries_stop_at_the_deadline(provider, monkeypatch):
+    monkeypatch.setattr(outbound, "OUTBOUND_MAX_RETRIES", 100)
+    provider.breaker.threshold = 1000
+    fake = FakeProvider(fail(ConnectionError("reset"), after=0.05))
+
+    started = time.monotonic()
+    with outbound.deadline(0.3):
+        with pytest.raises((ConnectionError, outbound.DeadlineExceeded)):
+            outbound.call("fake", fake)
+
+    assert 1 < len(fake.calls) < 100
+    assert time.monotonic() - started < 0.6
+    for called_at, timeout in fake.calls:
+        # No attempt starts after the deadline, and none may run past it
+        assert called_at < started + 0.3
+        assert called_at + timeout <= started + 0.3 + 0.01
+
+
+def test_no_call_once_the_deadline_has_passed(provider):
+    fake = FakeProvider(succeed("ok"))
+    with outbound.deadline(0.01):
+        time.sleep(0.02)
+        with pytest.raises(outbound.DeadlineExceeded):
+            outbound.call("fake", fake)
+    assert fake.calls == []
+
+
+def test_breaker_opens_then_half_opens(provider, monkeypatch):
+    monkeypatch.setattr(outbound, "OUTBOUND_MAX_RETRIES", 0)
+    failing = FakeProvider(fail(HTTPError(503)))
+    for _ in range(2):
+        with pytest.raises(HTTPError):
+            outbound.call("fake", failing)
+    assert provider.breaker.state == "open"
+
+    # Open: rejected without calling the provider
+    with pytest.raises(outbound.CircuitOpen):
+        outbound.call("fake", failing)
+    assert len(failing.calls) == 2
+
+    # After the reset time one probe goes through; a failure re-opens the breaker
+    time.sleep(0.25)
+    with pytest.raises(HTTPError):
+        outbound.call("fake", failing)
+    assert provider.breaker.state == "open"
+    assert len(failing.calls) == 3
+
+    time.sleep(0.25)
+    assert outbound.call("fake", FakeProvider(succeed("ok"))) == "ok"
+    assert provider.breaker.state == "closed"
+
+
+def test_half_open_allows_a_single_probe(provider):
+    provider.breaker.record_failure()
+    provider.breaker.record_failure()
+    time.sleep(0.25)
+    provider.breaker.allow()
+    assert provider.breaker.state == "half_open"
+    with pytest.raises(outbound.CircuitOpen):
+        provider.breaker.allow()
+
+
+def test_hedge_wins_and_slow_result_is_dropped(provider):
+    provider.hedge_after = 0.05
+    fake = FakeProvider(succeed("slow", after=0.5), succeed("fast"))
+
+    started = time.monotonic()
+    assert outbound.call("fake", fake) == "fast"
+    assert time.monotonic() - started < 0.4
+    assert len(fake.calls) == 2
+    assert provider.hedges == 1
+    assert provider.hedge_wins == 1
+    assert provider.breaker.calls == 1
+
+
+def test_no_hedge_for_fast_calls(provider):
+    provider.hedge_after = 0.2
+    fake = FakeProvider(succeed("ok"))
+    assert outbound.call("fake", fake) == "ok"
+    assert len(fake.calls) == 1
+    assert provider.hedges == 0
+
+
+@pytest.mark.parametrize("error", [HTTPError(400), HTTPError(401), ValueError("bad input")])
+def test_non_retryable_errors_are_not_retried(provider, error):
+    fake = FakeProvider(fail(error))
+    with pytest.raises(type(error)):
+        outbound.call("fake", fake)
+    assert len(fake.calls) == 1
+    # Client errors say nothing about the provider's health
+    assert provider.breaker.consecutive_failures == 0
+
+
+def test_rate_limits_are_retried_without_opening_the_breaker(provider):
+    fake = FakeProvider(fail(HTTPError(429)), fail(HTTPError(429)), succeed("ok"))
+    assert outbound.call("fake", fake) == "ok"
+    assert len(fake.calls) == 3
+    assert provider.breaker.failures == 0
@@ -0,0 +1,121 @@
+import io
+import random
+import time
+
+import pytest
+
+from bench.corpus import make_pdf
+from processors import pdf_extractor
+from processors.pdf_extractor import (
+    _PageSource, _count_backtracks, _indic_shaping_broken, _page_ranges, extract_text_from_pdf, iter_page_texts,
+)
+
+
+@pytest.fixture(scope="module")
+def pdf():
+    return make_pdf(random.Random(7), 12)
+
+
+@pytest.mark.parametrize("total,workers", [(1, 4), (12, 2), (60, 3), (7, 8)])
+def test_page_ranges_cover_every_page_once(total, workers):
+    ranges = _page_ranges(total, workers)
+    pages = [page for first, last in ranges for page in range(first, last + 1)]
+    assert pages == list(range(1, total + 1))
+    assert len(ranges) <= workers * pdf_extractor.PDF_RANGES_PER_WORKER
+
+
+def test_layout_mode_counts_pages_without_pdfplumber(pdf):
+    source = _PageSource(io.BytesIO(pdf), "layout")
+    try:
+        assert source.total_pages == 12
+        assert source._plumber is None
+    finally:
+        source.close()
+
+
+@pytest.mark.parametrize("mode", ["layout", "tiered"])
+def test_parallel_output_matches_sequential(pdf, mode, monkeypatch):
+    monkeypatch.setattr(pdf_extractor, "PDF_PARALLEL_WORKERS", 2)
+    monkeypatch.setattr(pdf_extractor, "PDF_PARALLEL_MIN_PAGES", 4)
+    try:
+        sequential = list(iter_page_texts(pdf, parallel=False, mode=mode))
+        parallel = list(iter_page_texts(pdf, parallel=True, mode=mode))
+    finally:
+        pdf_extractor._reset_pool()
+    assert parallel == sequential
+    assert [page for page, _, _ in parallel] == list(range(1, 13))
+
+
+def test_single_worker_stays_sequential(pdf, monkeypatch):
+    monkeypatch.setattr(pdf_extractor, "PDF_PARALLEL_WORKERS", 1)
+    monkeypatch.setattr(pdf_extractor, "PDF_PARALLEL_MIN_PAGES", 1)
+    monkeypatch.setattr(pdf_extractor, "_get_pool", lambda: pytest.fail("pool used with one worker"))
+    text = extract_text_from_pdf(pdf, parallel=True)
+    assert text.startswith("[Page 1/12]\n")
+
+
+def test_layout_is_the_default_mode(pdf):
+    source = _PageSource(io.BytesIO(pdf))
+    try:
+        assert source._fast is None
+        assert source.extract(1)[1:] == ("layout", "mode")
+    finally:
+        source.close()
+
+
+def test_tiered_mode_keeps_clean_pages_on_the_fast_tier(pdf):
+    source = _PageSource(io.BytesIO(pdf), "tiered")
+    try:
+        text, tier, reason = source.extract(1)
+        assert (tier, reason) == ("fast", "")
+        layout = _PageSource(io.BytesIO(pdf), "layout")
+        try:
+            # Same words as the layout tier, just not necessarily the same spacing
+            assert text.split() == layout.extract(1)[0].split()
+        finally:
+            layout.close()
+        assert source._plumber is None
+    finally:
+        source.close()
+
+
+def test_suspect_pages_fall_back_to_layout_within_budget(pdf, monkeypatch):
+    monkeypatch.setattr(pdf_extractor, "_indic_shaping_broken", lambda text: True)
+    monkeypatch.setattr(pdf_extractor, "_layout_cost", pdf_extractor._LayoutCostModel(seconds_per_char=0))
+    source = _PageSource(io.BytesIO(pdf), "tiered")
+    try:
+        assert source.extract(1)[1:] == ("layout", "indic")
+
+        monkeypatch.setattr(pdf_extractor, "PDF_PAGE_BUDGET_SECONDS", 0)
+        assert source.extract(2)[1:] == ("fast", "over_budget")
+    finally:
+        source.close()
+
+
+def test_a_layout_overrun_stops_the_layout_tier(pdf, monkeypatch):
+    monkeypatch.setattr(pdf_extractor, "_indic_shaping_broken", lambda text: True)
+    monkeypatch.setattr(pdf_extractor, "_layout_cost", pdf_extractor._LayoutCostModel(seconds_per_char=0))
+    monkeypatch.setattr(pdf_extractor, "PDF_PAGE_BUDGET_SECONDS", 0.05)
+    source = _PageSource(io.BytesIO(pdf), "tiered")
+    monkeypatch.setattr(source, "_layout_text", lambda page_num: time.sleep(0.1) or "slow layout text")
+    try:
+        assert source.extract(1) == ("slow layout text", "layout", "indic")
+        assert source.over_budget
+        assert source.extract(2)[1:] == ("fast", "over_budget")
+    finally:
+        source.close()
+
+
+def test_indic_shaping_check():
+    assert not _indic_shaping_broken("बारिश छत पर गिरती है")
+    # Vowel signs with no consonant before them, as broken ToUnicode maps produce
+    assert _indic_shaping_broken("ि ि ि ि बारिश")
+    assert _indic_shaping_broken("��� text")
+    assert not _indic_shaping_broken("plain latin text")
+
+
+def test_backtracks_count_jumps_up_the_page():
+    # (left, bottom, right, top), reading down one column then jumping back to the top of the next
+    column = [(0, 700 - 14 * i, 100, 712 - 14 * i) for i in range(5)]
+    assert _count_backtracks(column) == 0
+    assert _count_backtracks(column * 3) == 2
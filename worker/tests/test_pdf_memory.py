@@ -0,0 +1,79 @@
+import io
+import random
+
+import pytest
+
+import metrics
+from bench.corpus import make_pdf
+from processors import pdf_extractor
+from processors.pdf_extractor import PdfMemoryError, _MemoryGuard, iter_page_texts
+from processors.sources import TextSpool
+
+MB = 1024 * 1024
+
+
+@pytest.fixture(scope="module")
+def pdf():
+    return make_pdf(random.Random(11), 12)
+
+
+def test_text_spool_moves_to_disk_past_its_limit():
+    pieces = ["rain " * 50, "नमस्ते " * 100, "end"]
+    with TextSpool(max_size=512) as spool:
+        spool.write(pieces[0])
+        assert not spool._file._rolled
+        for piece in pieces[1:]:
+            spool.write(piece)
+        assert spool._file._rolled
+        assert spool.getvalue() == "".join(pieces)
+        assert spool.length == len("".join(pieces))
+
+
+def test_guard_is_off_without_a_ceiling(monkeypatch):
+    monkeypatch.setattr(pdf_extractor, "_rss_bytes", lambda pids=(): 10 ** 12)
+    guard = _MemoryGuard(ceiling_mb=0)
+    assert not guard.check()
+    guard.enforce()
+
+
+def test_guard_degrades_at_the_soft_limit_and_fails_above_the_ceiling(monkeypatch):
+    rss = {"bytes": 70 * MB}
+    monkeypatch.setattr(pdf_extractor, "_rss_bytes", lambda pids=(): rss["bytes"])
+    guard = _MemoryGuard(ceiling_mb=100)
+
+    assert not guard.check()
+    rss["bytes"] = 90 * MB
+    assert guard.check()
+    guard.enforce()
+
+    rss["bytes"] = 120 * MB
+    with pytest.raises(PdfMemoryError):
+        guard.enforce()
+
+
+def page_tiers():
+    return {tuple(labels): count for labels, count in metrics.PDF_PAGE_TIERS.snapshot()}
+
+
+def test_low_memory_mode_keeps_fast_text_for_the_remaining_pages(pdf, monkeypatch):
+    monkeypatch.setattr(pdf_extractor, "_MemoryGuard", lambda: _MemoryGuard(ceiling_mb=100))
+    monkeypatch.setattr(pdf_extractor, "_rss_bytes", lambda pids=(): 90 * MB)
+    monkeypatch.setattr(pdf_extractor, "_indic_shaping_broken", lambda text: True)
+    monkeypatch.setattr(pdf_extractor, "_layout_cost", pdf_extractor._LayoutCostModel(seconds_per_char=0))
+    metrics.PDF_PAGE_TIERS.reset()
+
+    pages = list(iter_page_texts(io.BytesIO(pdf), parallel=False, mode="tiered"))
+
+    assert [page for page, _, _ in pages] == list(range(1, 13))
+    assert all(text for _, _, text in pages)
+    # Memory is checked every PDF_MEMORY_CHECK_PAGES pages
+    assert page_tiers() == {("layout", "indic"): 4, ("fast", "low_memory"): 8}
+
+
+def test_staying_above_the_ceiling_fails_the_extraction(pdf, monkeypatch):
+    monkeypatch.setattr(pdf_extractor, "_MemoryGuard", lambda: _MemoryGuard(ceiling_mb=100))
+    monkeypatch.setattr(pdf_extractor, "_rss_bytes", lambda pids=(): 150 * MB)
+
+    pages = iter_page_texts(io.BytesIO(pdf), parallel=False, mode="layout")
+    with pytest.raises(PdfMemoryError):
+        list(pages)
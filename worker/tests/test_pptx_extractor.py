@@ -0,0 +1,66 @@
+import io
+import random
+
+from pptx import Presentation
+from pptx.util import Inches
+
+from bench.corpus import make_pptx
+from processors import pptx_extractor
+from processors.pptx_extractor import extract
+
+
+def save(prs):
+    out = io.BytesIO()
+    prs.save(out)
+    return out.getvalue()
+
+
+def titled(prs, title, body=None):
+    slide = prs.slides.add_slide(prs.slide_layouts[1])
+    slide.shapes.title.text = title
+    if body is not None:
+        slide.placeholders[1].text = body
+    return slide
+
+
+def test_tables_groups_and_notes():
+    prs = Presentation()
+    slide = titled(prs, "Act One", "Raj arrives\nMeera waits")
+    table = slide.shapes.add_table(2, 3, Inches(1), Inches(4), Inches(6), Inches(1)).table
+    table.cell(0, 0).merge(table.cell(0, 1))
+    table.cell(0, 0).text = "Scene"
+    table.cell(0, 2).text = "Pages"
+    for col, text in enumerate(["1", "Chawl", "3"]):
+        table.cell(1, col).text = text
+    group = slide.shapes.add_group_shape()
+    group.shapes.add_textbox(Inches(6), Inches(1), Inches(2), Inches(1)).text_frame.text = "grouped"
+    inner = group.shapes.add_group_shape()
+    inner.shapes.add_textbox(Inches(6), Inches(2), Inches(2), Inches(1)).text_frame.text = "nested"
+    slide.notes_slide.notes_text_frame.text = "Keep the rain loud"
+
+    assert extract(save(prs)) == (
+        "Slide 1:\nAct One\nRaj arrives\nMeera waits\nScene | Pages\n1 | Chawl | 3\ngrouped\nnested\n"
+        "Notes: Keep the rain loud"
+    )
+
+
+def test_slides_follow_presentation_order_and_skip_empty_ones():
+    prs = Presentation()
+    titled(prs, "first")
+    prs.slides.add_slide(prs.slide_layouts[6])
+    titled(prs, "third")
+    # Move the last slide to the front; part names stay slide1..slide3
+    slide_ids = prs.slides._sldIdLst
+    slide_ids.insert(0, slide_ids[-1])
+
+    assert extract(save(prs)) == "Slide 1:\nthird\n\nSlide 2:\nfirst"
+
+
+def test_parallel_matches_sequential(monkeypatch):
+    data = make_pptx(random.Random(3), 12)
+    monkeypatch.setattr(pptx_extractor, "PPTX_PARALLEL_WORKERS", 3)
+    monkeypatch.setattr(pptx_extractor, "PPTX_PARALLEL_MIN_SLIDES", 2)
+
+    sequential = extract(data, parallel=False)
+    assert extract(data, parallel=True) == sequential
+    assert sequential.count("Notes: ") == 12
@@ -0,0 +1,49 @@
+import outbound
+from main import extract_document_text, generate_document_embeddings, process_document
+from processors.embeddings import chunk_text
+
+TEXT = "\n\n".join(f"Scene {i}. " + "The monsoon breaks over the village. " * 12 for i in range(12))
+
+
+def sections_of(stubs, document_id):
+    with stubs.state.lock:
+        return sorted(
+            (row for row in stubs.state.sections.values() if row["document_id"] == document_id),
+            key=lambda row: row["metadata"]["chunk_index"],
+        )
+
+
+def test_fused_pipeline_matches_extract_then_embed(worker, seed_document):
+    url = seed_document("fused", "script.txt", TEXT.encode())
+    result = process_document("fused", url, "text/plain", "script.txt")
+
+    assert result["success"], result
+    document = worker.state.documents["fused"]
+    assert document["processing_status"] == "READY"
+    assert document["extracted_text"] == TEXT
+
+    url = seed_document("staged", "script.txt", TEXT.encode(), mime_type="text/plain")
+    assert extract_document_text("staged", url, "text/plain", "script.txt")["success"]
+    assert generate_document_embeddings("staged")["success"]
+
+    fused, staged = sections_of(worker, "fused"), sections_of(worker, "staged")
+    assert result["numChunks"] == len(chunk_text(TEXT)) == len(fused) == len(staged)
+    assert [row["metadata"] for row in fused] == [row["metadata"] for row in staged]
+
+
+def test_embedding_failure_is_reported_as_embedding_failed(worker, seed_document, monkeypatch):
+    monkeypatch.setattr(outbound, "OUTBOUND_MAX_RETRIES", 0)
+    worker.config.provider_error_rate = 1.0
+    url = seed_document("doc", "script.txt", TEXT.encode())
+
+    result = process_document("doc", url, "text/plain", "script.txt")
+
+    assert not result["success"]
+    assert worker.state.documents["doc"]["processing_status"] == "EMBEDDING_FAILED"
+
+
+def test_download_failure_is_reported_as_extraction_failed(worker):
+    result = process_document("doc", worker.storage_url("missing.txt"), "text/plain", "missing.txt")
+
+    assert not result["success"]
+    assert worker.state.documents["doc"]["processing_status"] == "EXTRACTION_FAILED"
@@ -0,0 +1,93 @@
+import io
+import pstats
+
+import pytest
+
+import profiling
+import server
+
+AUTH = {"Authorization": "Bearer test-secret"}
+
+
+@pytest.fixture
+def profile_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path / "profiles"))
+    return tmp_path / "profiles"
+
+
+def extract(client, document_id, storage_url, headers=None):
+    body = {"documentId": document_id, "storageUrl": storage_url, "mimeType": "text/plain", "filename": "script.txt"}
+    return client.post("/extract", json=body, headers=dict(AUTH, **(headers or {})))
+
+
+def test_header_wins_over_sampling(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_SAMPLE_RATE", 1.0)
+    assert profiling.should_profile("1") and profiling.should_profile("TRUE")
+    assert not profiling.should_profile("0")
+    assert profiling.should_profile(None)
+
+    monkeypatch.setattr(profiling, "PROFILE_SAMPLE_RATE", 0.0)
+    assert not profiling.should_profile(None)
+
+
+def test_profiled_request_is_stored_and_served(profile_dir, seed_document):
+    url = seed_document("doc", "script.txt", ("Scene 1. " * 300).encode())
+    client = server.app.test_client()
+
+    response = extract(client, "doc", url, {profiling.PROFILE_HEADER: "1"})
+    assert response.status_code == 200
+    profile_id = response.headers["X-Profile-Id"]
+
+    listed = client.get("/debug/profiles", headers=AUTH).get_json()
+    assert [summary["profileId"] for summary in listed["profiles"]] == [profile_id]
+    assert listed["profiles"][0]["kind"] == "extract" and listed["profiles"][0]["documentId"] == "doc"
+
+    record = client.get(f"/debug/profiles/{profile_id}", headers=AUTH).get_json()
+    assert record["error"] is None and record["wallSeconds"] >= 0
+    assert any("extract_document_text" in row["function"] for row in record["topFunctions"])
+
+    dump = client.get(f"/debug/profiles/{profile_id}/pstats", headers=AUTH)
+    assert dump.status_code == 200
+    path = profile_dir / "copy.pstats"
+    path.write_bytes(dump.data)
+    assert pstats.Stats(str(path), stream=io.StringIO()).total_calls > 0
+
+
+def test_unprofiled_request_stores_nothing(profile_dir, seed_document):
+    url = seed_document("doc", "script.txt", b"Scene 1. Rain.")
+    client = server.app.test_client()
+
+    response = extract(client, "doc", url)
+    assert response.status_code == 200
+    assert "X-Profile-Id" not in response.headers
+    assert client.get("/debug/profiles", headers=AUTH).get_json()["profiles"] == []
+
+
+def test_missing_profiles_and_auth(profile_dir):
+    client = server.app.test_client()
+    assert client.get("/debug/profiles").status_code == 401
+    assert client.get("/debug/profiles/nope", headers=AUTH).status_code == 404
+    assert client.get("/debug/profiles/nope/pstats", headers=AUTH).status_code == 404
+    # Ids are used as file names; path components are stripped
+    assert profiling.get_profile("../../etc/passwd") is None
+
+
+def test_only_the_newest_profiles_are_retained(profile_dir, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_RETENTION", 2)
+    for profile_id in ("first", "second", "third"):
+        with profiling.profiled("embed", "doc", profile_id):
+            sum(range(1000))
+
+    assert {summary["profileId"] for summary in profiling.list_profiles()} <= {"second", "third"}
+    assert len(profiling.list_profiles()) == 2
+    assert profiling.pstats_path("first") is None
+
+
+def test_failed_block_is_recorded_and_reraised(profile_dir):
+    with pytest.raises(ValueError):
+        with profiling.profiled("process", "doc", "boom"):
+            raise ValueError("bad page")
+
+    assert profiling.get_profile("boom")["error"] == "bad page"
+    # tracemalloc is stopped once the last profile ends
+    assert profiling._tracing_users == 0
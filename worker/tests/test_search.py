@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+import server
+from processors import search
+from processors.embedding_cache import EmbeddingCache
+from processors.search import OwnerIndex, SearchIndex, embed_query
+
+AUTH = {"Authorization": "Bearer test-secret"}
+
+
+def make_index(count=200, dims=16, seed=5):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(count, dims)).astype(np.float32)
+    rows = [{"id": f"s{i}", "document_id": f"d{i % 4}", "content": f"section {i}"} for i in range(count)]
+    return OwnerIndex("owner", rows, OwnerIndex.normalise(vectors)), vectors
+
+
+def brute_force(vectors, query, limit, threshold):
+    normalised = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = normalised @ query
+    ranked = sorted(range(len(scores)), key=lambda i: -scores[i])
+    return [f"s{i}" for i in ranked if scores[i] > threshold][:limit]
+
+
+def test_owner_index_returns_exact_top_k():
+    index, vectors = make_index()
+    query = OwnerIndex.normalise(vectors[:1] + 0.1)[0]
+
+    results = index.search(query, 5, 0.0)
+    assert [row["id"] for row in results] == brute_force(vectors, query, 5, 0.0)
+    assert results[0]["id"] == "s0"
+    similarities = [row["similarity"] for row in results]
+    assert similarities == sorted(similarities, reverse=True)
+
+    # The threshold applies before the limit
+    assert all(row["similarity"] > 0.5 for row in index.search(query, 100, 0.5))
+    assert index.search(query, 0, 0.0) == []
+
+
+def test_replace_document_swaps_only_that_documents_sections():
+    index, _ = make_index(count=8, dims=4)
+    index.replace_document("d1", [{"id": "new", "document_id": "d1", "content": "new"}], np.ones((1, 4), dtype=np.float32))
+
+    assert [row["id"] for row in index.rows if row["document_id"] == "d1"] == ["new"]
+    assert len(index.rows) == 7 and index.matrix.shape == (7, 4)
+    assert index.search(np.full(4, 0.5, dtype=np.float32), 1, 0.0)[0]["id"] == "new"
+
+
+def test_disabled_index_falls_back_to_rpc():
+    assert SearchIndex(max_bytes=0).get("owner") is None
+
+
+def test_repeated_queries_are_embedded_once(worker, monkeypatch):
+    monkeypatch.setattr(search, "_query_cache", EmbeddingCache(max_entries=10, table=""))
+    first = embed_query("rain  on the\nroof")
+    second = embed_query("rain on the roof")
+
+    assert worker.state.requests["voyage"] == 1
+    assert np.allclose(first, second) and np.isclose(np.linalg.norm(first), 1.0)
+
+
+@pytest.mark.parametrize("body", [
+    {"userId": "u"},
+    {"userId": "u", "query": 5},
+    {"userId": "u", "query": "rain", "limit": 0},
+    {"userId": "u", "query": "rain", "limit": "10"},
+    {"userId": "u", "query": "rain", "limit": True},
+    {"userId": "u", "query": "rain", "threshold": 2},
+])
+def test_invalid_search_requests_are_rejected(body):
+    response = server.app.test_client().post("/search", headers=AUTH, json=body)
+    assert response.status_code == 400
+
+
+def test_limit_is_capped():
+    assert server.search_params({"limit": 10 ** 6}) == (server.SEARCH_MAX_LIMIT, 0.7)
+    assert server.search_params({"limit": 3, "threshold": 0}) == (3, 0.0)
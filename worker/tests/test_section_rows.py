@@ -0,0 +1,76 @@
+import gzip
+import json
+import random
+import struct
+
+import supabase_client
+from processors import embeddings
+from processors.embeddings import encode_section_rows, insert_embeddings, split_bodies, vector_literal
+
+
+def float4(value):
+    return struct.unpack("f", struct.pack("f", value))[0]
+
+
+def test_vector_literal_round_trips_within_float4_precision():
+    rng = random.Random(3)
+    vector = [rng.uniform(-1, 1) for _ in range(512)] + [1e-9, -0.5, 0.0]
+    literal = vector_literal(vector)
+
+    assert literal.startswith("[") and literal.endswith("]") and " " not in literal
+    parsed = json.loads(literal)
+    assert len(parsed) == len(vector)
+    assert all(abs(float4(a) - float4(b)) <= 1e-7 * max(1.0, abs(a)) for a, b in zip(parsed, vector))
+    assert len(literal) < len(json.dumps(vector)) * 0.6
+
+
+def test_rows_keep_non_ascii_text_unescaped():
+    row = {"document_id": "doc", "content": "बारिश", "embedding": [0.25, -0.5], "metadata": {"chunk_index": 0}}
+    (encoded,) = encode_section_rows([row])
+
+    assert "बारिश".encode() in encoded
+    assert json.loads(encoded)["embedding"] == "[0.25,-0.5]"
+    # The caller's record is left alone
+    assert row["embedding"] == [0.25, -0.5]
+
+
+def test_json_vectors_when_precision_is_zero(monkeypatch):
+    monkeypatch.setattr(embeddings, "EMBED_VECTOR_PRECISION", 0)
+    (encoded,) = encode_section_rows([{"embedding": [0.25, -0.5]}])
+    assert json.loads(encoded)["embedding"] == [0.25, -0.5]
+
+
+def test_bodies_are_bounded_and_keep_every_row():
+    rows = [json.dumps({"i": i, "pad": "x" * (i * 7 % 90)}).encode() for i in range(200)]
+    bodies = split_bodies(rows, max_bytes=1000)
+
+    assert len(bodies) > 1
+    assert all(len(body) <= 1000 for body in bodies)
+    assert [row["i"] for body in bodies for row in json.loads(body)] == list(range(200))
+
+
+def test_oversized_row_gets_its_own_body():
+    rows = [b'{"a":1}', b'{"big":"' + b"x" * 50 + b'"}', b'{"b":2}']
+    bodies = split_bodies(rows, max_bytes=30)
+    assert [len(json.loads(body)) for body in bodies] == [1, 1, 1]
+    assert split_bodies([]) == []
+
+
+def test_large_batches_are_posted_in_parts(worker):
+    records = [
+        {"document_id": "doc", "content": "ऋ" * 30000, "embedding": [0.1] * 8, "metadata": {"chunk_index": i}}
+        for i in range(40)
+    ]
+    insert_embeddings(records)
+
+    assert worker.state.requests["POST document_sections"] == 2
+    assert len(worker.state.sections) == 40
+
+
+def test_pre_encoded_bodies_are_gzipped_above_the_threshold(monkeypatch):
+    monkeypatch.setattr(supabase_client, "SUPABASE_GZIP_MIN_BYTES", 100)
+    body, headers = supabase_client._compress_body(b"[" + b"0," * 200 + b"0]")
+    assert headers == {"Content-Encoding": "gzip"}
+    assert gzip.decompress(body).startswith(b"[0,0,")
+
+    assert supabase_client._compress_body(b"[]") == (b"[]", {})
@@ -0,0 +1,57 @@
+import json
+import logging
+import os
+import subprocess
+import sys
+
+import startup
+from processors import embeddings
+
+WORKER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_importing_the_app_does_not_import_route_libraries():
+    code = (
+        "import json, sys, server; "
+        "print(json.dumps([m for m in ('pdfplumber', 'anthropic', 'voyageai', 'docx', 'pptx') if m in sys.modules]))"
+    )
+    env = dict(os.environ, SUPABASE_URL="http://localhost", SUPABASE_SERVICE_ROLE_KEY="key")
+    output = subprocess.run([sys.executable, "-c", code], cwd=WORKER_DIR, env=env, capture_output=True, text=True, check=True)
+    assert json.loads(output.stdout.strip().splitlines()[-1]) == []
+
+
+def test_preload_records_import_times_and_skips_missing_modules(monkeypatch, caplog):
+    monkeypatch.setattr(startup, "_import_times", {})
+    monkeypatch.setattr(startup, "HEAVY_MODULES", {"text": ["json"], "broken": ["no_such_module_xyz"]})
+
+    with caplog.at_level(logging.WARNING):
+        times = startup.preload_modules()
+
+    assert list(times) == ["json"] and times["json"] >= 0
+    assert "no_such_module_xyz" in caplog.text
+
+
+def test_diagnostics_mask_secrets(monkeypatch, caplog):
+    monkeypatch.setenv("WORKER_SECRET", "supersecretvalue")
+    monkeypatch.setenv("PORT", "8000")
+    monkeypatch.delenv("VOYAGE_API_KEY", raising=False)
+
+    with caplog.at_level(logging.INFO):
+        startup.log_diagnostics(["WORKER_SECRET", "PORT", "VOYAGE_API_KEY"])
+
+    assert "supersecretvalue" not in caplog.text
+    assert "WORKER_SECRET = ***alue (length: 16)" in caplog.text
+    assert "PORT = 8000" in caplog.text
+    assert "VOYAGE_API_KEY is MISSING" in caplog.text
+
+
+def test_voyage_client_is_per_process(monkeypatch):
+    monkeypatch.setenv("VOYAGE_API_KEY", "key")
+    monkeypatch.setattr(embeddings, "_voyage_client", None)
+
+    client = embeddings.get_voyage_client()
+    assert embeddings.get_voyage_client() is client
+
+    # As seen from a forked child
+    monkeypatch.setattr(embeddings, "_voyage_client_pid", -1)
+    assert embeddings.get_voyage_client() is not client
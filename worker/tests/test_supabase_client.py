@@ -0,0 +1,92 @@
+import pytest
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError, ProtocolError
+
+import supabase_client
+from supabase_client import rest_request
+
+
+class FakeSession:
+    """Session stand-in: each request takes the next scripted exception or status code."""
+
+    def __init__(self, *script):
+        self.script = list(script)
+        self.calls = 0
+
+    def request(self, method, url, **kwargs):
+        step = self.script[min(self.calls, len(self.script) - 1)]
+        self.calls += 1
+        if isinstance(step, Exception):
+            raise step
+        response = requests.Response()
+        response.status_code = step
+        response.url = url
+        return response
+
+
+def refused():
+    reason = NewConnectionError(None, "Failed to establish a new connection: [Errno 111] Connection refused")
+    return requests.ConnectionError(MaxRetryError(None, "/rest/v1/x", reason=reason))
+
+
+def dropped():
+    return requests.ConnectionError(ProtocolError("Connection aborted.", ConnectionResetError(104, "reset")))
+
+
+@pytest.fixture
+def session(monkeypatch):
+    monkeypatch.setattr(supabase_client, "SUPABASE_BACKOFF_BASE", 0)
+
+    def install(*script):
+        fake = FakeSession(*script)
+        monkeypatch.setattr(supabase_client, "get_session", lambda: fake)
+        return fake
+    return install
+
+
+@pytest.mark.parametrize("failure", [refused, requests.ConnectTimeout])
+def test_post_retried_when_nothing_was_sent(session, failure):
+    fake = session(failure(), 201)
+    assert rest_request("POST", "document_sections", [{"id": 1}]).status_code == 201
+    assert fake.calls == 2
+
+
+def test_post_not_retried_after_connection_drops(session):
+    fake = session(dropped(), 201)
+    with pytest.raises(requests.ConnectionError):
+        rest_request("POST", "document_sections", [{"id": 1}])
+    assert fake.calls == 1
+
+
+def test_dropped_connection_retried_for_idempotent_requests(session):
+    fake = session(dropped(), 204)
+    assert rest_request("PATCH", "documents?id=eq.1", {"processing_status": "READY"}).status_code == 204
+    assert fake.calls == 2
+
+    fake = session(dropped(), 201)
+    assert rest_request("POST", "cache?on_conflict=k", {"k": 1}, retry_unsafe=True).status_code == 201
+    assert fake.calls == 2
+
+
+def test_server_errors_retried_only_when_safe(session):
+    fake = session(500, 201)
+    with pytest.raises(requests.HTTPError):
+        rest_request("POST", "document_sections", [{"id": 1}])
+    assert fake.calls == 1
+
+    # 503 means the request was not processed
+    fake = session(503, 201)
+    assert rest_request("POST", "document_sections", [{"id": 1}]).status_code == 201
+    assert fake.calls == 2
+
+
+def test_retries_give_up_after_the_limit(session, monkeypatch):
+    monkeypatch.setattr(supabase_client, "SUPABASE_MAX_RETRIES", 2)
+    fake = session(503)
+    with pytest.raises(requests.HTTPError):
+        rest_request("GET", "documents")
+    assert fake.calls == 3
+
+
+def test_session_is_reused():
+    assert supabase_client.get_session() is supabase_client.get_session()